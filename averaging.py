@@ -22,10 +22,26 @@
 #                           timeKMモジュールの仕様変更に対応
 #                           数値に、符号が入ってきてもOKなように変更
 #                           NumBuffの中で、valが非値であるかどうか検査しきれていないのはかなり問題だ。
+#               2026/10/19  時刻の取得にtimeKM.getTimes()を使い、大量の行をまとめて処理するようにした。
+#                           createAverageListを、各行を1回だけ解析して移動窓の和と個数を更新するSlidingAveragerによる逐次処理に置き換えた。
+#                           NumBuffをNumPyの配列で保持するように改め、ブロック単位の加算と最小・最大・標準偏差の計算に対応した。
+#                           meanを呼んでも内部の値が変わらないようにした。
+#                           複数のファイル（ワイルドカード可）を並列に平均化して合成するaverageFilesとコマンドラインオプションを追加した。
+#                           出力はまとめて書き込むようにし、.npz形式も選べるようにした。
+#                           正常なデータの抽出にchunkReaderを使い、ファイルをブロックごとに処理できるiterHealthyDataを追加した。
+#                           データのないファイルでSlidingAverager.finish()が例外を出していたのを修正した。--selftestオプションを追加した。
 #-------------------------------------------------------------------------------
+import argparse
+import collections
 import datetime
+import glob
+import heapq
+import math
+import multiprocessing
+import os
 import re
-import sys
+import numpy as np
+import chunkReader
 import timeKM
 
 delta = 60              # 平均化する間隔[sec]
@@ -33,97 +49,184 @@ term = 60               # 平均化する期間[sec]
 samplingRate = 0.5      # 観測データのサンプリング速度[SPS]又は[Hz], 欠損率の計算に使用しているだけなので、クリティカルな設定値ではない
 missingThreshold = 0.8  # 欠損値の許容割合
 
+_missingValues = ("", "NA", "na", "NaN")             # 欠損値として扱う文字列
 reValuePattern       = re.compile(r'((?:-|\+)?\d+\.?\d*|NA|na|NaN)')
 reDataPattern        = re.compile(r'(?P<all>{0}(?P<values>((?: |,|\t){1})+))'.format(timeKM.reDateGroupedPattern.pattern, reValuePattern.pattern))
 
 class NumBuff:
     """ リストを渡すことで平均を計算するためのクラスです
+    列ごとの個数・平均・偏差平方和・最小値・最大値をfloat64の配列で保持し、行をまとめて（2次元配列で）加算できます。
+    列数が増えると配列の容量を倍々で確保し直します。
+    欠損値（"", "NA", "na", "NaN", NaN）は列ごとに除外して数えます。
     """
-    def __init__(self):
-        self.buffer = []
+    def __init__(self, capacity = 8):
         self.errorMsg = ""
-        self.count = []                                         # 加算数
+        self._length = 0                                        # これまでに受け取った最大の列数
+        self._capacity = 0
+        self._count = np.zeros(0, dtype=np.int64)               # 加算数
+        self._mean  = np.zeros(0)
+        self._m2    = np.zeros(0)                               # 偏差平方和
+        self._min   = np.zeros(0)
+        self._max   = np.zeros(0)
+        self._reserve(capacity)
         return
 
+    def _reserve(self, n):
+        """ 少なくともn列を格納できるように、配列の容量を確保する """
+        if n <= self._capacity:
+            return
+        capacity = max(n, 2 * self._capacity)
+        def grow(array, fill):
+            ans = np.full(capacity, fill, dtype=array.dtype)
+            ans[:len(array)] = array
+            return ans
+        self._count = grow(self._count, 0)
+        self._mean  = grow(self._mean, 0.0)
+        self._m2    = grow(self._m2, 0.0)
+        self._min   = grow(self._min, np.inf)
+        self._max   = grow(self._max, -np.inf)
+        self._capacity = capacity
+        return
+
+    @staticmethod
+    def _toFloat(val):
+        """ 値をfloatにする. 欠損値はNaNとする """
+        if isinstance(val, str):
+            return float("nan") if val in _missingValues else float(val)
+        return float("nan") if val == None else float(val)
+
+    def _toBlock(self, rows):
+        """ 行のリスト（列数が揃っていなくても良い）をNaNで埋めた2次元配列にする """
+        if isinstance(rows, np.ndarray) and rows.dtype.kind == "f":
+            return rows.reshape(len(rows), -1) if rows.ndim != 2 else rows
+        width = max([len(row) for row in rows] + [0])
+        ans = np.full((len(rows), width), np.nan)
+        for k, row in enumerate(rows):
+            ans[k, :len(row)] = [self._toFloat(val) for val in row]
+        return ans
+
     def len(self):
         """ バッファに格納されているデータ長を返す
         """
-        return len(self.buffer)
+        return self._length
 
     def addForMean(self, addList):
         """ 後で平均化するために値（リスト）を受け取り、内部変数を加算する
-        リストの中身は数値であること。
+        リストの中身は数値（又は数値の文字列）であること。
         非値や欠損値にも対応しています。
         途中で入力されるデータ数が増えても、それに対応してカウントを続けます。
-        この関数を呼び出すと、meanを呼び出すまで内部変数が加算されます。
         """
-        if type(addList) == list:
-            if len(self.buffer) == 0:                           # 初回時の処理
-                for member in addList:
-                    if member != "" and member != "NA":
-                        self.buffer.append(float(member))       # リストが空であれば、代入するだけ
-                        self.count.append(1.0)                  # カウント数を初期化
-                    else:
-                        self.buffer.append(0.0)                 # 非値なので0.0で初期化
-                        self.count.append(0.0)                  # カウント数を初期化
-            else:
-                for _i in range(len(self.buffer)):              # とりあえず、現時点で保有するリストのサイズ分だけ格納する
-                    val = addList[_i]
-                    if _i < len(addList) and val != "" and val != "NA": # 渡されたリストの要素数が少ないor非値の場合へ対処
-                        self.buffer[_i] += float(val)
-                        self.count[_i] += 1.0
-                if len(self.buffer) < len(addList):                 # 既にあるバッファサイズを超えた場合
-                    for _i in range(len(self.buffer), len(addList)):
-                        val = addList[_i]
-                        if val != "" and val != "NA":
-                            self.buffer.append(float(val))  # リストが空であれば、代入するだけ
-                            self.count.append(1.0)                  # カウント数を初期化
-                        else:
-                            self.buffer.append(0.0)                 # 非値なので0.0で初期化
-                            self.count.append(0.0)                  # カウント数を初期化
-            return
-        else:
+        if isinstance(addList, (list, tuple, np.ndarray)):
+            self.addBlock([addList])
+        return
+
+    def addBlock(self, rows):
+        """ 複数の行をまとめて加算する
+        Args:
+            rows: 2次元のfloat配列（欠損値はNaN）か、行のリスト
+        """
+        block = self._toBlock(rows)
+        width = block.shape[1]
+        if len(block) == 0 or width == 0:
             return
+        self._reserve(width)
+        if self._length < width:
+            self._length = width
+        valid = ~np.isnan(block)
+        nb = valid.sum(axis=0)
+        has = nb > 0
+        filled = np.where(valid, block, 0.0)
+        mb = np.divide(filled.sum(axis=0), nb, out=np.zeros(width), where=has)
+        m2b = (np.where(valid, block - mb, 0.0) ** 2).sum(axis=0)
+        with np.errstate(all="ignore"):
+            minb = np.fmin.reduce(block, axis=0)
+            maxb = np.fmax.reduce(block, axis=0)
+        na = self._count[:width]
+        n = na + nb
+        delta = mb - self._mean[:width]
+        ratio = np.divide(nb, n, out=np.zeros(width), where=has)
+        self._mean[:width] += np.where(has, delta * ratio, 0.0)            # 並列に計算した統計量の合成（Chanらの方法）
+        self._m2[:width]   += np.where(has, m2b + delta ** 2 * na * ratio, 0.0)
+        self._min[:width] = np.fmin(self._min[:width], minb)
+        self._max[:width] = np.fmax(self._max[:width], maxb)
+        self._count[:width] = n
+        return
+
+    def merge(self, other):
+        """ 別のNumBuffの統計量を合成する """
+        width = other._length
+        self._reserve(width)
+        if self._length < width:
+            self._length = width
+        nb = other._count[:width]
+        has = nb > 0
+        na = self._count[:width]
+        n = na + nb
+        delta = other._mean[:width] - self._mean[:width]
+        ratio = np.divide(nb, n, out=np.zeros(width), where=has)
+        self._mean[:width] += np.where(has, delta * ratio, 0.0)
+        self._m2[:width]   += np.where(has, other._m2[:width] + delta ** 2 * na * ratio, 0.0)
+        self._min[:width] = np.fmin(self._min[:width], other._min[:width])
+        self._max[:width] = np.fmax(self._max[:width], other._max[:width])
+        self._count[:width] = n
+        return
+
+    def _toList(self, values):
+        """ 配列をリストにする. 加算数が0の列は欠損値として""にする """
+        return [float(val) if count > 0 else "" for val, count in zip(values, self._count[:self._length])]
+
+    @property
+    def count(self):
+        """ 列ごとの加算数のリスト """
+        return self._count[:self._length].tolist()
+
+    @property
+    def buffer(self):
+        """ 列ごとの合計値のリスト """
+        return self._toList(self._mean[:self._length] * self._count[:self._length])
 
     def mean(self):
         """ 平均する
-        平均化したものをリストで返します。
+        平均化したものをリストで返します。欠損値は""です。
+        内部の値は変更しないので、続けて加算することもできます。
         """
-        for _i in range(len(self.buffer)):
-            if self.count[_i] != 0.0:
-                self.buffer[_i] /= self.count[_i]
-            else:
-                self.buffer[_i] = ""        # 欠損値
-            self.count[_i] = 1.0
-        return self.buffer
+        return self._toList(self._mean[:self._length])
 
-    def toString(self):
-        """ 現時点で保持しているメンバーを文字列化して返す
-        """
-        ans = ""
-        count = 0
-        for member in self.buffer:
-            if member != "" and member != "NA":
-                ans += "{0:.5f}".format(member)
-            else:
-                ans += ""                   # 将来、NAにするかも
-            count += 1
-            if count != len(self.buffer):   # 最後の要素でなければ、カンマの区切り記号を入れる
-                ans += ","
-        return ans
+    def min(self):
+        """ 列ごとの最小値をリストで返す """
+        return self._toList(self._min[:self._length])
 
+    def max(self):
+        """ 列ごとの最大値をリストで返す """
+        return self._toList(self._max[:self._length])
 
+    def std(self, ddof = 1):
+        """ 列ごとの標準偏差をリストで返す
+        Args:
+            ddof: 自由度の補正. 1なら不偏分散から求めます（mathKM.sdと同じ）。
+        """
+        count = self._count[:self._length]
+        n = count - ddof
+        var = np.divide(self._m2[:self._length], n, out=np.full(self._length, np.nan), where=n > 0)
+        return self._toList(np.sqrt(var))
+
+    def toString(self):
+        """ 現時点で保持している平均値を文字列化して返す
+        """
+        return ",".join(["{0:.5f}".format(member) if member != "" else "" for member in self.mean()])   # 欠損値は将来、NAにするかも
 
 
 
 def getHealthyDataList(txt):
     """ テキストデータの実験ログから正常なデータのみを抽出してリストとして返す
     """
-    helthy = reDataPattern.finditer(txt)
-    ans = []
-    for men in helthy:
-        ans.append(men.group('all'))
-    return ans
+    return list(chunkReader.iterText(txt, reDataPattern, 'all'))
+
+def iterHealthyData(fname, blockSize = chunkReader.BLOCK_SIZE):
+    """ 実験ログのファイルをブロックごとに読み込みながら、正常なデータのみを1行ずつ返すジェネレータ
+    ファイル全体を読み込まないので、巨大なファイルでもメモリを消費しません。
+    """
+    return chunkReader.iterMatches(fname, reDataPattern, 'all', blockSize)
 
 def getClockDict(txt):
     """ テキストデータの実験ログから、時刻をキーとした辞書を作成して返す
@@ -135,10 +238,8 @@ def getClockDict(txt):
     if len(dataList) == 0:
         return None
     #print(dataList[0])
-    for one in dataList:                            # リストを走査しながら時刻をキーとした辞書を作成
-        #print(one)
-        time = timeKM.getTime(one)                  # 時刻を取得
-        #print(time)
+    times = timeKM.getTimes(dataList).tolist()      # 時刻をまとめて取得
+    for time, one in zip(times, dataList):          # リストを走査しながら時刻をキーとした辞書を作成
         ans.update(dict({time:one}))
     return ans
 
@@ -147,16 +248,10 @@ def getClockList(txt):
     return:
         None: 正常な実験データが得られなかった場合
     """
-    ans  = []
     dataList = getHealthyDataList(txt)              # 実験データからリストを作る
     if len(dataList) == 0:
         return None
-    #print(dataList[0])
-    for one in dataList:                            # リストを走査しながら時刻をキーとした辞書を作成
-        #print(one)
-        time = timeKM.getTime(one)                  # 時刻を取得
-        #print(time)
-        ans.append(time)
+    ans = timeKM.getTimes(dataList).tolist()        # 時刻をまとめて取得
     return ans
 
 def getDataList(line):
@@ -174,10 +269,202 @@ def getDataList(line):
         return reValuePattern.findall(values)
 
 
+def parseLine(line):
+    """ 時刻に続いてデータが格納されている文字列を1回の正規表現で解析して、時刻とデータを返す
+    return:
+        None:   時刻とデータが文字列に含まれていない場合
+        tapple: (datetime.datetime, 数値のリスト)  欠損値はNaNになります
+    """
+    match = reDataPattern.search(line)
+    if match == None:
+        return None
+    _microsecond = match.group('microsecond')
+    if _microsecond != None:
+        microsecond = int(int(_microsecond) * 10**(6 - len(_microsecond)))
+    else:
+        microsecond = 0
+    try:
+        time = datetime.datetime(int(match.group('year')), int(match.group('month')), int(match.group('day')),
+                                 int(match.group('hour')), int(match.group('minute')), int(match.group('sec')), microsecond)
+    except ValueError:
+        return None
+    values = [float("nan") if val in _missingValues else float(val) for val in reValuePattern.findall(match.group('values'))]
+    return (time, values)
+
+
+class SlidingAverager:
+    """ 時系列データを1行ずつ受け取り、移動窓の平均を逐次出力するクラスです
+    窓に入っているデータの和と個数を保持し、窓の先頭と末尾の2つのポインタを進めるだけで平均を更新するので、
+    各データは1回ずつしか加算・減算されません（span > step で窓が重なっていても同じです）。
+    平均化する期間は、エポック-span <= t <= エポック です。
+
+    時刻の順序が多少前後していても、reorderSize行まで並べ替えバッファで整列させてから処理します。
+    バッファから溢れた時点で既に処理済みの時刻より古いデータは捨てて、lateCountに数えます。
+    同じ時刻のデータが複数あれば、後から来たものを採用します。
+    """
+    def __init__(self, step, span, epoch = None, reorderSize = 1024, complete = False, raw = False):
+        """
+        Args:
+            step:        時間ステップ[sec]
+            span:        平均する時間幅[sec]
+            epoch:       基準時刻. Noneなら最初の観測時刻 + step から出力を始めます。
+            reorderSize: 並べ替えバッファの行数. Noneなら全データを溜めてから整列させます。
+            complete:    Trueなら、データを1つでも含む窓を全て出力します（最初の観測時刻以降の最初の刻みから、最後の観測時刻 + spanまで）。
+                         複数のファイルの結果を合成する場合に使います。
+            raw:         Trueなら、平均の代わりに (時刻, 和のリスト, 有効な値の数のリスト, 行数) を出力します。
+        """
+        self.step = step
+        self.span = span
+        self.epoch = epoch
+        self.reorderSize = reorderSize
+        self.complete = complete
+        self.raw = raw
+        self._step = datetime.timedelta(seconds = step)
+        self._span = datetime.timedelta(seconds = span)
+        self._heap = []                                     # 並べ替えバッファ
+        self._seq = 0                                       # 同時刻のデータの到着順
+        self._pending = None                                # 同時刻のデータを上書きするために1行だけ保留する
+        self._lastTime = None                               # 並べ替えバッファから取り出した最新の時刻
+        self._window = collections.deque()                  # 窓に入っているデータ
+        self._sums = []                                     # 窓内の値の和
+        self._counts = []                                   # 窓内の有効な値の数
+        self._present = []                                  # 窓内でその列を持つ行の数（欠損値を含む）
+        self.currentTime = None                             # 次に出力する時刻
+        self.firstTime = None
+        self.lastTime = None
+        self.maxLenOfValues = 0
+        self.lateCount = 0
+        return
+
+    def add(self, time, values):
+        """ データを1行追加し、確定した平均を返す
+        Args:
+            time:   datetime.datetime
+            values: 数値（文字列でも可）のリスト. 欠損値はNaNか、文字列の"NA"などで渡してください。
+        return:
+            list: [(時刻, 平均値のリスト, 平均したデータ数), ...]
+        """
+        if self.firstTime == None or time < self.firstTime:
+            self.firstTime = time
+        if self.lastTime == None or time > self.lastTime:
+            self.lastTime = time
+        _values = [None if (val in _missingValues if isinstance(val, str) else val != val) else float(val) for val in values]    # 欠損値はNoneにする
+        heapq.heappush(self._heap, (time, self._seq, _values))
+        self._seq += 1
+        ans = []
+        while self.reorderSize != None and len(self._heap) > self.reorderSize:
+            self._pop(ans)
+        return ans
+
+    def finish(self):
+        """ バッファに残ったデータを処理して、残りの平均を全て返す
+        return:
+            list: [(時刻, 平均値のリスト, 平均したデータ数), ...]
+        """
+        ans = []
+        while len(self._heap) > 0:
+            self._pop(ans)
+        if self._pending != None:
+            self._commit(self._pending, ans)
+            self._pending = None
+        if self.lastTime == None:                           # 1行もデータがなかった
+            return ans
+        end = self.lastTime + self._span if self.complete else self.lastTime
+        while self.currentTime != None and self.currentTime <= end:
+            ans.append(self._emit())
+        return ans
+
+    def _pop(self, ans):
+        """ 並べ替えバッファから最も古い行を取り出す """
+        time, _, values = heapq.heappop(self._heap)
+        if self._lastTime != None and time < self._lastTime:    # 既に処理済みの時刻より古い
+            self.lateCount += 1
+            return
+        self._lastTime = time
+        if self._pending != None and self._pending[0] != time:
+            self._commit(self._pending, ans)
+        self._pending = (time, values)
+        return
+
+    def _commit(self, row, ans):
+        """ 時刻順に並んだ行を窓に加える """
+        time, values = row
+        if self.currentTime == None and self.complete:              # 最初の行で出力する時刻を決める
+            epoch = self.epoch if self.epoch != None else time
+            self.currentTime = epoch + datetime.timedelta(seconds = math.ceil((time - epoch).total_seconds() / self.step) * self.step)
+        elif self.currentTime == None:
+            self.currentTime = time + self._step
+            if self.epoch != None:
+                diff = (time + self._step) - self.epoch
+                self.currentTime = self.epoch + datetime.timedelta(seconds = int(diff.total_seconds() / self.step) * self.step)
+        while self.currentTime < time:                              # この行より前の窓は確定している
+            ans.append(self._emit())
+        grow = len(values) - len(self._sums)
+        if grow > 0:
+            self._sums += [0.0] * grow
+            self._counts += [0] * grow
+            self._present += [0] * grow
+        sums, counts, present = self._sums, self._counts, self._present
+        for i, val in enumerate(values):                            # 列数は高々数十なので、配列演算よりも速い
+            present[i] += 1
+            if val != None:
+                sums[i] += val
+                counts[i] += 1
+        self._window.append((time, values))
+        return
+
+    def _emit(self):
+        """ 窓から古い行を取り除いて、currentTimeの平均を作る """
+        minTime = self.currentTime - self._span
+        sums, counts, present = self._sums, self._counts, self._present
+        while len(self._window) > 0 and self._window[0][0] < minTime:
+            _, values = self._window.popleft()
+            for i, val in enumerate(values):
+                present[i] -= 1
+                if val != None:
+                    sums[i] -= val
+                    counts[i] -= 1
+        for i in range(len(counts)):                                # 丸め誤差を溜めないようにリセットする
+            if counts[i] == 0:
+                sums[i] = 0.0
+        length = len(present)
+        while length > 0 and present[length - 1] == 0:
+            length -= 1
+        if self.maxLenOfValues < length:
+            self.maxLenOfValues = length
+        if self.raw:
+            ans = (self.currentTime, sums[:length], counts[:length], len(self._window))
+        else:
+            means = [sums[i] / counts[i] if counts[i] != 0 else "" for i in range(length)]
+            ans = (self.currentTime, means, len(self._window))
+        self.currentTime += self._step
+        return ans
+
+
+def averageLines(lines, step, span, epoch = None, reorderSize = 1024):
+    """ 文字列を1行ずつ解析しながら、移動窓の平均を逐次返すジェネレータ
+    Args:
+        lines:  文字列のイテラブル（ファイルオブジェクトでも良い）
+        その他はSlidingAveragerと同じ
+    yield:
+        tapple: (時刻, 平均値のリスト, 平均したデータ数)
+    """
+    averager = SlidingAverager(step, span, epoch, reorderSize)
+    for line in lines:
+        parsed = parseLine(line)
+        if parsed != None:
+            for one in averager.add(*parsed):
+                yield one
+    for one in averager.finish():
+        yield one
+
+
 def createAverageList(fname, step, span, epoch = None):
     """ 平均化した値を時刻と
     データの並びが逆順だろうが、順不同だろうが動作します。
     デフォルトでは、t - span <= エポック <= t　を対象として平均します。
+    ファイルは1行ずつ読み込んで、SlidingAveragerで逐次平均します。
+    時刻の乱れが並べ替えバッファに収まらなかった場合は、全データを整列させてやり直します。
 
     Args:
         fname:  ファイル名
@@ -192,85 +479,210 @@ def createAverageList(fname, step, span, epoch = None):
             first time: 最も過去の観測時刻
             last time:  最も最近の観測時刻
     """
-    fr = open(fname, 'r')                                                   # ファイル内容を読み込む
-    txt = fr.read()
-    fr.close()
-    clockDict = getClockDict(txt)                                           # 時刻を基にした辞書を作成
-    if clockDict == None:
+    for reorderSize in (1024, None):
+        averager = SlidingAverager(step, span, epoch, reorderSize)
+        data  = {}
+        with open(fname, 'r') as fr:
+            for line in fr:
+                parsed = parseLine(line)
+                if parsed != None:
+                    for time, values, count in averager.add(*parsed):
+                        data[time] = (values, count)
+        for time, values, count in averager.finish():
+            data[time] = (values, count)
+        if averager.lateCount == 0:
+            break
+    if averager.firstTime == None:
         print("There are no measurment data with time-stamp.")
         return None
-    clockList = list(clockDict.keys())                                      # 観測時刻をリストで取得
-    clockList.sort()                                                        # 観測時刻を時系列に並べ直す（走査を高速に行うために重要）
-    firstTime = min(clockList)
-    lastTime  = max(clockList)
-    print("first time is : " + str(firstTime))                              # 時刻は以下の処理でかなり重要になるので、表示させる（問題がある場合は手動で停止できるように）
-    print("last  time is : " + str(lastTime))
-    _step = datetime.timedelta(seconds = step)                              # 何度も呼び出すことになるので予めオブジェクトにしておく
-    _span = datetime.timedelta(seconds = span)
-    currentTime = firstTime + _step
-    if epoch != None:                                                       # 基準時刻が設定されていれば、それに従う
-        diff    = (firstTime + _step) - epoch
-        #print(diff.total_seconds())
-        stepNum = int(diff.total_seconds() / step)
-        currentTime = epoch + datetime.timedelta(seconds = stepNum * step)
-    _maxLenOfValues = 0
-    _minIndex = 0
-    data  = {}
-    while currentTime <= lastTime:
-        _minTime = currentTime - _span
-        _maxTime = currentTime
-        _obsData = NumBuff()                                                # データを格納するクラスオブジェクトを生成
-        _count = 0
-        _minIndexFound = False
-        for i in range(_minIndex, len(clockList)):                          # 走査を高速に行うために、rangeを使って検索範囲を絞っていく
-            time = clockList[i]
-            if _minTime <= time and _maxTime >= time:
-                if _minIndexFound == False:                                 # 検索範囲を絞るための工夫
-                    _minIndexFound = True
-                    _minIndex = i
-                one = clockDict[time]                                       # 観測データ（文字列）を取得
-                matchList = getDataList(one)
-                if matchList != None:
-                    _count += 1
-                    #print(matchList)
-                    _obsData.addForMean(matchList)                          # データを加算
-            if _maxTime < time:
-                break
-        data.update(dict({currentTime:(_obsData.mean(), _count)}))
-        if _maxLenOfValues < _obsData.len():
-            _maxLenOfValues = _obsData.len()
-        currentTime += _step
-    return (data, _maxLenOfValues, firstTime, lastTime)
+    print("first time is : " + str(averager.firstTime))
+    print("last  time is : " + str(averager.lastTime))
+    return (data, averager.maxLenOfValues, averager.firstTime, averager.lastTime)
+
+
+def _averageFile(args):
+    """ 1つのファイルについて、窓ごとの和と個数を求める（averageFilesのワーカープロセスで実行される）
+    Args:
+        args: (ファイル名, step, span, epoch)
+    return:
+        tapple: (ファイル名, [(時刻, 和のリスト, 有効な値の数のリスト, 行数), ...], first time, last time)
+    """
+    fname, step, span, epoch = args
+    for reorderSize in (1024, None):                                        # 時刻の乱れがバッファに収まらなければやり直す
+        averager = SlidingAverager(step, span, epoch, reorderSize, complete = True, raw = True)
+        rows = []
+        with open(fname, 'r') as fr:
+            for line in fr:
+                parsed = parseLine(line)
+                if parsed != None:
+                    rows += averager.add(*parsed)
+        rows += averager.finish()
+        if averager.lateCount == 0:
+            break
+    return (fname, rows, averager.firstTime, averager.lastTime)
+
+def expandFileNames(patterns):
+    """ ファイル名やワイルドカードのリストを展開して、重複のないファイル名のリストを返す """
+    ans = []
+    for pattern in patterns:
+        names = sorted(glob.glob(pattern))
+        if len(names) == 0 and os.path.isfile(pattern):
+            names = [pattern]
+        for name in names:
+            if name not in ans:
+                ans.append(name)
+    return ans
+
+def averageFiles(fnames, step, span, epoch = None, processes = None):
+    """ 複数のファイルを並列に平均化し、結果を1つに合成する
+    時間的に隣接する（あるいは重なる）ファイルでも、窓ごとの和と個数を足し合わせるので、ファイルの境目をまたぐ窓も正しく平均されます。
+    ただし、同じ時刻のデータが複数のファイルにある場合は両方とも数えます。
+    窓の刻みはepochに揃えます。epochを省略すると 1970/1/1 00:00:00 を基準にします。
+
+    Args:
+        fnames:    ファイル名のリスト
+        step:      時間ステップ
+        span:      平均する時間幅
+        epoch:     基準時刻
+        processes: ワーカープロセス数. Noneならmultiprocessingの既定値（CPU数）
+    return:
+        None:   正常な実験データが得られなかった場合
+        tapple: createAverageListと同じ形式
+    """
+    if epoch == None:
+        epoch = datetime.datetime(1970, 1, 1)
+    tasks = [(fname, step, span, epoch) for fname in fnames]
+    if processes == 1 or len(tasks) <= 1:
+        results = map(_averageFile, tasks)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(processes)
+        results = pool.imap_unordered(_averageFile, tasks)
+    merged = {}
+    firstTime = None
+    lastTime  = None
+    try:
+        for fname, rows, first, last in results:
+            if first == None:
+                print("There are no measurment data with time-stamp in " + fname)
+                continue
+            print(fname + " : " + str(first) + " - " + str(last))
+            if firstTime == None or first < firstTime:
+                firstTime = first
+            if lastTime == None or last > lastTime:
+                lastTime = last
+            for time, sums, counts, count in rows:
+                sums = np.array(sums)
+                counts = np.array(counts, dtype=np.int64)
+                if time not in merged:
+                    merged[time] = [sums, counts, count]
+                    continue
+                one = merged[time]
+                width = max(len(one[0]), len(sums))
+                one[0] = np.pad(one[0], (0, width - len(one[0]))) + np.pad(sums, (0, width - len(sums)))
+                one[1] = np.pad(one[1], (0, width - len(one[1]))) + np.pad(counts, (0, width - len(counts)))
+                one[2] += count
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+    if firstTime == None:
+        return None
+    data = {}
+    maxLenOfValues = 0
+    for time in sorted(merged.keys()):
+        if time <= firstTime or lastTime < time:                            # 両端の欠けた窓はcreateAverageListと同様に出力しない
+            continue
+        sums, counts, count = merged[time]
+        values = [float(sums[i] / counts[i]) if counts[i] != 0 else "" for i in range(len(sums))]
+        data[time] = (values, count)
+        if maxLenOfValues < len(values):
+            maxLenOfValues = len(values)
+    return (data, maxLenOfValues, firstTime, lastTime)
 
+def writeCsv(saveName, data, maxLenOfValues, blockSize = 65536):
+    """ 平均化した結果をCSVで保存する
+    blockSize行ずつ文字列を連結してからまとめて書き込みます。
+    """
+    with open(saveName, 'w') as fw:
+        lines = []
+        for time in sorted(data.keys()):
+            values, count = data[time]
+            fields = ["{0:.03f}".format(values[i]) if i < len(values) and values[i] != "" else "" for i in range(maxLenOfValues)]
+            lines.append(",".join([str(time)] + fields + [str(count)]) + "\n")
+            if len(lines) >= blockSize:
+                fw.write("".join(lines))
+                lines = []
+        fw.write("".join(lines))
+    return
+
+def writeNpz(saveName, data, maxLenOfValues):
+    """ 平均化した結果をNumPyの圧縮形式（.npz）で保存する
+    time: datetime64[us]の配列, mean: 平均値の2次元配列（欠損値はNaN）, count: 平均したデータ数
+    """
+    times = sorted(data.keys())
+    mean  = np.full((len(times), maxLenOfValues), np.nan)
+    count = np.zeros(len(times), dtype=np.int64)
+    for k, time in enumerate(times):
+        values, count[k] = data[time]
+        mean[k, :len(values)] = [np.nan if val == "" else val for val in values]
+    np.savez_compressed(saveName, time = np.array(times, dtype="datetime64[us]"), mean = mean, count = count)
+    return
+
+
+def selfTest():
+    """ 簡単な動作確認を行う """
+    import tempfile
+    print("セルフテスト")
+    lines = ["2013/05/01 00:00:{0:02d},{1}".format(i, i) for i in range(60)]
+    print(list(averageLines(lines, 10, 10)))
+    with tempfile.TemporaryDirectory() as folder:
+        names = []
+        for i, txt in enumerate(["\n".join(lines[:30]), "\n".join(lines[30:]), "", "no time-stamp\n"]):   # 空のファイルと時刻のないファイルを含む
+            names.append(os.path.join(folder, "{0}.log".format(i)))
+            with open(names[-1], "w") as fw:
+                fw.write(txt)
+        data, maxLenOfValues, first, last = averageFiles(names, 10, 10, processes = 1)
+        print(sorted(data.items()) == sorted((t, (v, c)) for t, v, c in averageLines(lines, 10, 10)))
+        print(averageFiles(names[2:], 10, 10, processes = 1))
+    return
 
 def main():
     global delta, term, samplingRate, missingThreshold      # グローバル変数の使用を宣言
     print("Processing start...")
-    argvs = sys.argv                                        # コマンドライン引数を格納したリストの取得
-    argc = len(argvs)                                       # 引数の個数
-    #print(argvs)                                           # デバッグプリント
-    #print(argc)
-    if (argc != 2):                                                         # 引数が足りない場合は、その旨を表示
-        print('Usage: # python {0} filename'.format(argvs[0]))              # 0はスクリプトファイル自体を指す
-        quit()                                                              # プログラムの終了
-    fname = argvs[1]#"test.txt" #
-    result = createAverageList(fname, delta, term)
+    parser = argparse.ArgumentParser(description = "時刻と観測値からなるログファイルを平均化します。複数のファイルを指定すると、並列に処理して1つに合成します。")
+    parser.add_argument("files", nargs = "*", help = "ファイル名（ワイルドカード可）")
+    parser.add_argument("-s", "--step", type = float, default = delta, help = "平均化する間隔[sec]")
+    parser.add_argument("-t", "--term", type = float, default = term, help = "平均化する期間[sec]")
+    parser.add_argument("-e", "--epoch", default = None, help = "基準時刻 e.g. \"2013/5/1 00:00:00\"")
+    parser.add_argument("-j", "--jobs", type = int, default = None, help = "ワーカープロセス数")
+    parser.add_argument("-o", "--output", default = None, help = "出力ファイル名")
+    parser.add_argument("--npz", action = "store_true", help = "CSVの代わりに.npz形式で保存する")
+    parser.add_argument("--selftest", action = "store_true", help = "セルフテストを実行する")
+    args = parser.parse_args()
+    if args.selftest:
+        selfTest()
+        return
+    if len(args.files) == 0:
+        parser.error("ファイル名を指定してください。")
+    fnames = expandFileNames(args.files)
+    if len(fnames) == 0:
+        print("There are no files.")
+        return
+    epoch = timeKM.getTime(args.epoch) if args.epoch != None else None
+    if len(fnames) == 1:
+        result = createAverageList(fnames[0], args.step, args.term, epoch)
+    else:
+        result = averageFiles(fnames, args.step, args.term, epoch, args.jobs)
     if result != None:
         data, maxLenOfValues, first, last = result
-        saveName = fname.split('.')[0] + "_meaned.csv"
-        fw = open(saveName, 'w')
-        clockList = list(data.keys())
-        clockList.sort()
-        for time in clockList:
-            values, count = data[time]
-            fw.write(str(time))
-            for i in range(maxLenOfValues):
-                fw.write(",")
-                if i < len(values):
-                    fw.write("{0:.03f}".format(values[i]))
-            fw.write("," + str(count))
-            fw.write("\n")
-        fw.close()
+        saveName = args.output
+        if saveName == None:
+            saveName = fnames[0].split('.')[0] + ("_meaned" if len(fnames) == 1 else "_merged_meaned") + (".npz" if args.npz else ".csv")
+        if args.npz:
+            writeNpz(saveName, data, maxLenOfValues)
+        else:
+            writeCsv(saveName, data, maxLenOfValues)
     print("fin.")
 
 if __name__ == '__main__':
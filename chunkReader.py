@@ -0,0 +1,76 @@
+﻿#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        chunkReader
+# Purpose:     大きなログファイルを一定サイズのブロックごとに読み込んで、正規表現に合致する行を取り出す
+# Abst.:       ブロックの終わりで切れた行は次のブロックへ持ち越すので、行がブロックの境目にまたがっても取りこぼしません。
+#              ファイル全体を文字列にしないので、数GBのログでもメモリ使用量はブロックサイズ程度で済みます。
+#              正規表現は1行の中で完結するもの（改行をまたがないもの）を渡してください。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     new BSD
+# History:
+#-------------------------------------------------------------------------------
+import io
+
+BLOCK_SIZE = 1 << 20            # 1回に読み込む文字数の既定値
+
+def readBlocks(source, blockSize = BLOCK_SIZE):
+    """ ファイルを行単位で区切られたブロックごとに返すジェネレータ
+    各ブロックは改行で終わります（ファイル末尾を除く）。
+    Args:
+        source:    ファイル名か、ファイルオブジェクト（テキストモード）
+        blockSize: 1回に読み込む文字数
+    """
+    if isinstance(source, str):
+        with open(source, 'r') as fr:
+            for block in readBlocks(fr, blockSize):
+                yield block
+        return
+    rest = ""                                       # 前のブロックから持ち越した、改行で終わっていない行
+    while True:
+        block = source.read(blockSize)
+        if block == "":
+            break
+        block = rest + block
+        end = block.rfind("\n") + 1
+        if end == 0:                                # 1行がブロックより長い
+            rest = block
+            continue
+        rest = block[end:]
+        yield block[:end]
+    if rest != "":
+        yield rest
+
+def iterMatches(source, pattern, group = 0, blockSize = BLOCK_SIZE):
+    """ 正規表現に合致した部分の文字列を順に返すジェネレータ
+    Args:
+        source:    ファイル名か、ファイルオブジェクト（テキストモード）
+        pattern:   コンパイル済みの正規表現
+        group:     返すグループの番号か名前
+        blockSize: 1回に読み込む文字数
+    """
+    for block in readBlocks(source, blockSize):
+        for match in pattern.finditer(block):
+            yield match.group(group)
+
+def iterText(txt, pattern, group = 0, blockSize = BLOCK_SIZE):
+    """ 文字列に対してiterMatchesを実行する """
+    return iterMatches(io.StringIO(txt), pattern, group, blockSize)
+
+
+def main():
+    import re
+    print("セルフテスト")
+    pattern = re.compile(r'\d{4}/\d{2}/\d{2} \d{2}:\d{2}:\d{2},\d+')
+    lines = ["2013/05/01 00:00:{0:02d},{1}".format(i % 60, i) if i % 7 != 0 else "garbage" for i in range(1000)]
+    txt = "\n".join(lines)
+    expected = pattern.findall(txt)
+    for blockSize in (1, 7, 64, 1 << 20):
+        print("block size {0}: {1}".format(blockSize, list(iterText(txt, pattern, blockSize = blockSize)) == expected))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        accuracy
+# Purpose:  測位結果の集合から、精度の指標（DRMS, 2DRMS, CEP, SEP, R95）を求める。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        測位結果はENU座標の(N, 2)又は(N, 3)の配列で渡します（gnss.coordinate.enuのリストも可）。
+#              中心（真値）を与えなければ、測位結果の平均を中心とします。
+#              各指標は次の通りです。
+#                DRMS:  水平誤差の2乗平均の平方根
+#                2DRMS: DRMSの2倍
+#                CEP50, CEP95: 水平誤差の50%, 95%値（経験分布から求める）
+#                SEP:   3次元誤差の50%値
+#                R95:   3次元誤差の95%値
+#              SEPとR95は(N, 3)の配列の場合のみ求めます。
+# Histroy:
+#           2026-10-19   作成
+#-------------------------------------------------------------------------------
+
+import math
+import numpy as np
+import mathKM
+import gnss.coordinate as coordinate
+
+
+def to_array(positions):
+    """ 測位結果を(N, 2)又は(N, 3)のfloat64配列にする
+    Args:
+        positions: <ndarray> or <list<gnss.coordinate.enu>> or <list<list>>
+    """
+    if len(positions) > 0 and isinstance(positions[0], coordinate.enu):
+        return np.array([[pos.e, pos.n, pos.u] for pos in positions], dtype=np.float64)
+    ans = np.asarray(positions, dtype=np.float64)
+    if ans.ndim != 2 or ans.shape[1] not in (2, 3):
+        raise ValueError("positions must be an (N, 2) or (N, 3) array.")
+    return ans
+
+
+def _percentile(values, p):
+    """ 割合pに相当する値を線形補間で求める（np.percentileの既定の方法と同じ） """
+    if len(values) == 0:
+        return float("nan")
+    pos = (len(values) - 1) * p
+    low = int(math.floor(pos))
+    high = min(low + 1, len(values) - 1)
+    part = np.partition(values, [low, high])
+    return float(part[low] + (part[high] - part[low]) * (pos - low))
+
+
+def accuracy(positions, center=None):
+    """ 精度の指標を求める
+    Args:
+        positions: 測位結果. (N, 2)又は(N, 3)の配列
+        center:    中心（真値）. Noneなら測位結果の平均
+    Return:
+        <dict> center, count, drms, 2drms, cep50, cep95, sep, r95 （sep, r95は3次元の場合のみ）
+    """
+    pos = to_array(positions)
+    if center is None:
+        _center = pos.mean(axis=0) if len(pos) > 0 else np.zeros(pos.shape[1])
+    else:
+        _center = np.asarray([center.e, center.n, center.u] if isinstance(center, coordinate.enu) else center, dtype=np.float64)[:pos.shape[1]]
+    diff = pos - _center
+    horizontal_sq = diff[:, 0] ** 2 + diff[:, 1] ** 2
+    horizontal = np.sqrt(horizontal_sq)
+    drms = math.sqrt(horizontal_sq.mean()) if len(pos) > 0 else float("nan")
+    ans = {"center": _center, "count": len(pos), "drms": drms, "2drms": 2.0 * drms,
+           "cep50": _percentile(horizontal, 0.5), "cep95": _percentile(horizontal, 0.95)}
+    if pos.shape[1] == 3:
+        spherical = np.sqrt(horizontal_sq + diff[:, 2] ** 2)
+        ans["sep"] = _percentile(spherical, 0.5)
+        ans["r95"] = _percentile(spherical, 0.95)
+    return ans
+
+
+class accuracy_monitor:
+    """ 測位結果を1つずつ受け取り、精度の指標を逐次求めるクラス
+    DRMSは2乗和（中心が未知ならWelfordの方法による分散）から正確に求めます。
+    CEP, SEP, R95はP²アルゴリズムによる推定値なので、データ数が少ないうちは誤差があります。
+    中心が未知の場合は、その時点までの平均からの距離で推定します。
+    """
+    def __init__(self, center=None):
+        """
+        Args:
+            center: 中心（真値）. Noneなら測位結果の平均を中心とする
+        """
+        self.center = None if center is None else np.asarray(center, dtype=np.float64)
+        self.count = 0
+        self._mean = np.zeros(3)
+        self._m2 = np.zeros(3)                                  # 中心が既知なら2乗和、未知なら偏差平方和
+        self._horizontal = [mathKM.P2Quantile(0.5), mathKM.P2Quantile(0.95)]
+        self._spherical = [mathKM.P2Quantile(0.5), mathKM.P2Quantile(0.95)]
+        self._is3d = None
+
+    def add(self, position):
+        """ 測位結果を1つ加える
+        Args:
+            position: (e, n)又は(e, n, u). gnss.coordinate.enuも可
+        """
+        if isinstance(position, coordinate.enu):
+            position = (position.e, position.n, position.u)
+        p = np.zeros(3)
+        p[:len(position)] = position
+        if self._is3d is None:
+            self._is3d = len(position) == 3
+        self.count += 1
+        if self.center is None:
+            delta = p - self._mean
+            self._mean += delta / self.count
+            self._m2 += delta * (p - self._mean)
+            diff = p - self._mean
+        else:
+            center = np.zeros(3)
+            center[:len(self.center)] = self.center
+            diff = p - center
+            self._mean += (p - self._mean) / self.count
+            self._m2 += diff ** 2
+        horizontal = math.hypot(diff[0], diff[1])
+        for men in self._horizontal:
+            men.add(horizontal)
+        if self._is3d:
+            spherical = math.sqrt(horizontal ** 2 + diff[2] ** 2)
+            for men in self._spherical:
+                men.add(spherical)
+
+    def extend(self, positions):
+        """ 複数の測位結果を加える """
+        for position in to_array(positions):
+            self.add(position)
+
+    def result(self):
+        """ その時点での精度の指標を、accuracy()と同じ形式の辞書で返す """
+        if self.count == 0:
+            return None
+        drms = math.sqrt((self._m2[0] + self._m2[1]) / self.count)
+        dim = 3 if self._is3d else 2
+        ans = {"center": self._mean[:dim].copy() if self.center is None else self.center[:dim], "count": self.count,
+               "drms": drms, "2drms": 2.0 * drms, "cep50": self._horizontal[0].value(), "cep95": self._horizontal[1].value()}
+        if self._is3d:
+            ans["sep"] = self._spherical[0].value()
+            ans["r95"] = self._spherical[1].value()
+        return ans
+
+
+def main():
+    np.random.seed(0)
+    positions = np.random.randn(100000, 3) * [3.0, 2.0, 5.0] + [10.0, -5.0, 1.0]
+    print("batch      :", accuracy(positions))
+    print("true center:", accuracy(positions, center=[10.0, -5.0, 1.0]))
+    monitor = accuracy_monitor()
+    monitor.extend(positions)
+    print("streaming  :", monitor.result())
+    # 等方的な2次元正規分布(σ=1)の理論値: DRMS = 1.414, CEP50 = 1.177, CEP95 = 2.448
+    print("theory     :", accuracy(np.random.randn(100000, 2), center=[0.0, 0.0]))
+
+if __name__ == '__main__':
+    main()
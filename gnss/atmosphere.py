@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        atmosphere
+# Purpose:  電離層と対流圏による信号の遅延量を計算する。
+#           全ての関数は仰角・方位角・地点・時刻の配列を受け取り、まとめて計算します（ブロードキャスト可）。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        電離層: Klobucharモデル（GPS, QZS共通. 係数は航法メッセージの値を使う）  ref: IS-GPS-200 20.3.3.5.2.5
+#              対流圏: Saastamoinenモデルで天頂遅延量を求め、Niellの写像関数(NMF)で斜距離方向へ換算する
+#              遅延量はいずれもL1の擬似距離に対する値[m]です。
+# Histroy:
+#           2026-10-19   作成
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import gnss.datum.WGS84 as wgs84
+
+# Niellの写像関数の係数. 緯度15, 30, 45, 60, 75度の値
+_nmf_latitude = np.radians([15.0, 30.0, 45.0, 60.0, 75.0])
+_nmf_hydro_average = np.array([
+    [1.2769934e-3, 1.2683230e-3, 1.2465397e-3, 1.2196049e-3, 1.2045996e-3],
+    [2.9153695e-3, 2.9152299e-3, 2.9288445e-3, 2.9022565e-3, 2.9024912e-3],
+    [62.610505e-3, 62.837393e-3, 63.721774e-3, 63.824265e-3, 64.258455e-3]])
+_nmf_hydro_amplitude = np.array([
+    [0.0000000e-0, 1.2709626e-5, 2.6523662e-5, 3.4000452e-5, 4.1202191e-5],
+    [0.0000000e-0, 2.1414979e-5, 3.0160779e-5, 7.2562722e-5, 11.723375e-5],
+    [0.0000000e-0, 9.0128400e-5, 4.3497037e-5, 84.795348e-5, 170.37206e-5]])
+_nmf_wet = np.array([
+    [5.8021897e-4, 5.6794847e-4, 5.8118019e-4, 5.9727542e-4, 6.1641693e-4],
+    [1.4275268e-3, 1.5138625e-3, 1.4572752e-3, 1.5007428e-3, 1.7599082e-3],
+    [4.3472961e-2, 4.6729510e-2, 4.3908931e-2, 4.4626982e-2, 5.4736038e-2]])
+_nmf_height = (2.53e-5, 5.49e-3, 1.14e-3)               # 高さ補正の係数
+
+
+def klobuchar(alpha, beta, lat, lon, elevation, azimuth, tow, c=wgs84.c):
+    """ Klobucharモデルによる電離層遅延量[m]を返す
+    Argv:
+        alpha:     <array-like> 航法メッセージの係数α0～α3
+        beta:      <array-like> 航法メッセージの係数β0～β3
+        lat:       <ndarray> 受信機の緯度[rad]
+        lon:       <ndarray> 受信機の経度[rad]
+        elevation: <ndarray> 衛星の仰角[rad]
+        azimuth:   <ndarray> 衛星の方位角[rad]
+        tow:       <ndarray> GPS時刻の週内秒[s]
+        c:         <float>   光速[m/s]
+    """
+    alpha = np.asarray(alpha, dtype=np.float64)
+    beta = np.asarray(beta, dtype=np.float64)
+    E = np.asarray(elevation, dtype=np.float64) / np.pi     # 以下、角度の単位はsemi-circle
+    psi = 0.0137 / (E + 0.11) - 0.022                       # 地心角
+    phi = np.clip(np.asarray(lat) / np.pi + psi * np.cos(azimuth), -0.416, 0.416)   # 電離層貫通点の緯度
+    lam = np.asarray(lon) / np.pi + psi * np.sin(azimuth) / np.cos(phi * np.pi)     # 電離層貫通点の経度
+    phi_m = phi + 0.064 * np.cos((lam - 1.617) * np.pi)     # 地磁気緯度
+    t = np.mod(4.32e4 * lam + tow, 86400.0)                 # 地方時
+    F = 1.0 + 16.0 * (0.53 - E) ** 3                        # 傾斜係数
+    amp = np.maximum(alpha[0] + phi_m * (alpha[1] + phi_m * (alpha[2] + phi_m * alpha[3])), 0.0)
+    per = np.maximum(beta[0] + phi_m * (beta[1] + phi_m * (beta[2] + phi_m * beta[3])), 72000.0)
+    x = 2.0 * np.pi * (t - 50400.0) / per
+    delay = np.where(np.abs(x) < 1.57, 5.0e-9 + amp * (1.0 - x ** 2 / 2.0 + x ** 4 / 24.0), 5.0e-9)
+    return c * F * delay
+
+def _get_standard_atmosphere(height, humidity=0.7):
+    """ 標準大気の気圧[hPa], 気温[K], 水蒸気圧[hPa]を返す
+    """
+    h = np.clip(height, 0.0, 1.0e4)                         # モデルの適用範囲外で計算が破綻しないようにする
+    pressure = 1013.25 * (1.0 - 2.2557e-5 * h) ** 5.2568
+    temperature = 15.0 - 6.5e-3 * h + 273.16
+    e = 6.108 * humidity * np.exp((17.15 * temperature - 4684.0) / (temperature - 38.45))
+    return (pressure, temperature, e)
+
+def zenith_delay(lat, height, pressure=None, temperature=None, humidity=0.7):
+    """ Saastamoinenモデルによる天頂方向の対流圏遅延量[m]を(乾燥成分, 湿潤成分)で返す
+    気圧・気温を省略すると標準大気の値を使います。
+    Argv:
+        lat:         <ndarray> 緯度[rad]
+        height:      <ndarray> 楕円体高[m]
+        pressure:    <ndarray> 気圧[hPa]
+        temperature: <ndarray> 気温[K]
+        humidity:    <float>   相対湿度(0～1)
+    """
+    height = np.asarray(height, dtype=np.float64)
+    p, T, e = _get_standard_atmosphere(height, humidity)
+    if pressure is not None:
+        p = np.asarray(pressure, dtype=np.float64)
+    if temperature is not None:
+        T = np.asarray(temperature, dtype=np.float64)
+        e = 6.108 * humidity * np.exp((17.15 * T - 4684.0) / (T - 38.45))
+    hydro = 0.0022768 * p / (1.0 - 0.00266 * np.cos(2.0 * np.asarray(lat)) - 0.00028 * np.maximum(height, 0.0) / 1.0e3)
+    wet = 0.002277 * (1255.0 / T + 0.05) * e
+    return (hydro, wet)
+
+def saastamoinen(lat, height, elevation, pressure=None, temperature=None, humidity=0.7):
+    """ Saastamoinenモデルによる対流圏遅延量[m]を返す
+    天頂遅延量を1/sin(仰角)で斜距離方向へ換算します。
+    仰角が0以下の場合や、高さが-100～10000 mの範囲外では0を返します。
+    """
+    elevation = np.asarray(elevation, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    hydro, wet = zenith_delay(lat, height, pressure, temperature, humidity)
+    valid = (elevation > 0.0) & (height >= -100.0) & (height <= 1.0e4)
+    return np.where(valid, (hydro + wet) / np.sin(np.where(valid, elevation, np.pi / 2.0)), 0.0)
+
+def _continued_fraction(sin_el, a, b, c):
+    """ 写像関数の連分数形式 """
+    return (1.0 + a / (1.0 + b / (1.0 + c))) / (sin_el + a / (sin_el + b / (sin_el + c)))
+
+def niell(lat, height, elevation, day_of_year):
+    """ Niellの写像関数を(乾燥成分, 湿潤成分)で返す
+    Argv:
+        lat:         <ndarray> 緯度[rad]
+        height:      <ndarray> 楕円体高[m]
+        elevation:   <ndarray> 仰角[rad]
+        day_of_year: <ndarray> 年間通日（小数可）
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    sin_el = np.sin(np.maximum(elevation, 1.0e-3))
+    y = (np.asarray(day_of_year) - 28.0) / 365.25 + np.where(lat < 0.0, 0.5, 0.0)  # 南半球は季節が半年ずれる
+    cos_y = np.cos(2.0 * np.pi * y)
+    abs_lat = np.abs(lat)
+    ah = [np.interp(abs_lat, _nmf_latitude, _nmf_hydro_average[i]) -
+        np.interp(abs_lat, _nmf_latitude, _nmf_hydro_amplitude[i]) * cos_y for i in range(3)]
+    aw = [np.interp(abs_lat, _nmf_latitude, _nmf_wet[i]) for i in range(3)]
+    dm = (1.0 / sin_el - _continued_fraction(sin_el, *_nmf_height)) * np.asarray(height) / 1.0e3
+    return (_continued_fraction(sin_el, *ah) + dm, _continued_fraction(sin_el, *aw))
+
+def tropospheric_delay(lat, height, elevation, day_of_year=None, pressure=None, temperature=None, humidity=0.7):
+    """ 対流圏遅延量[m]を返す
+    day_of_yearを与えるとSaastamoinenの天頂遅延量にNiellの写像関数を適用し、
+    省略するとsaastamoinen()と同じ値を返します。
+    """
+    if day_of_year is None:
+        return saastamoinen(lat, height, elevation, pressure, temperature, humidity)
+    elevation = np.asarray(elevation, dtype=np.float64)
+    height = np.asarray(height, dtype=np.float64)
+    hydro, wet = zenith_delay(lat, height, pressure, temperature, humidity)
+    mh, mw = niell(lat, height, elevation, day_of_year)
+    valid = (elevation > 0.0) & (height >= -100.0) & (height <= 1.0e4)
+    return np.where(valid, hydro * mh + wet * mw, 0.0)
+
+
+class delay_model:
+    """ 測位計算に渡す大気遅延モデル
+    インスタンスをgnss.positioning.solve_spp()のdelay_modelに渡すと、擬似距離から遅延量を差し引いて測位します。
+    """
+    def __init__(self, ion_alpha=None, ion_beta=None, tow=None, troposphere=True, day_of_year=None,
+            pressure=None, temperature=None, humidity=0.7):
+        """
+        Argv:
+            ion_alpha:   <array-like> Klobucharモデルの係数α. 省略時は電離層遅延を補正しない
+            ion_beta:    <array-like> Klobucharモデルの係数β
+            tow:         <ndarray>    各エポックのGPS時刻の週内秒[s], shape: () or (E,)
+            troposphere: <bool>       対流圏遅延を補正するかどうか
+            day_of_year: <ndarray>    各エポックの年間通日, shape: () or (E,). 与えるとNiellの写像関数を使う
+            pressure, temperature, humidity: 気象値. 省略時は標準大気
+        """
+        if ion_alpha is not None and (ion_beta is None or tow is None):
+            raise ValueError("ion_beta and tow are required for the ionospheric correction.")
+        self.ion_alpha = ion_alpha
+        self.ion_beta = ion_beta
+        self.tow = tow
+        self.troposphere = troposphere
+        self.day_of_year = day_of_year
+        self.pressure = pressure
+        self.temperature = temperature
+        self.humidity = humidity
+
+    def __call__(self, lat, lon, height, elevation, azimuth, index=None):
+        """ 遅延量[m]を返す
+        Argv:
+            lat, lon, height:   <ndarray> 受信機の緯度[rad]・経度[rad]・楕円体高[m], shape: (E,)
+            elevation, azimuth: <ndarray> 衛星の仰角[rad]・方位角[rad], shape: (E, S)
+            index:              <ndarray> エポック毎に与えた値(towなど)から取り出す要素番号, shape: (E,)
+        """
+        def pick(value):
+            value = np.asarray(value, dtype=np.float64)
+            if value.ndim > 0 and index is not None:
+                value = value[index]
+            return value[..., np.newaxis] if value.ndim > 0 else value
+        lat = np.asarray(lat)[..., np.newaxis]
+        lon = np.asarray(lon)[..., np.newaxis]
+        height = np.asarray(height)[..., np.newaxis]
+        delay = np.zeros(np.shape(elevation))
+        if self.ion_alpha is not None:
+            delay += klobuchar(self.ion_alpha, self.ion_beta, lat, lon, elevation, azimuth, pick(self.tow))
+        if self.troposphere:
+            day_of_year = None if self.day_of_year is None else pick(self.day_of_year)
+            pressure = None if self.pressure is None else pick(self.pressure)
+            temperature = None if self.temperature is None else pick(self.temperature)
+            delay += tropospheric_delay(lat, height, elevation, day_of_year, pressure, temperature, self.humidity)
+        return delay
+
+
+
+
+def main():
+    print("---self test---")
+    alpha = [0.7451e-08, 0.1490e-07, -0.5960e-07, -0.1192e-06]     # brdc2530.10nの値
+    beta = [0.7987e+05, 0.1638e+05, -0.1311e+06, -0.1311e+06]
+    el = np.radians(np.arange(5.0, 91.0, 5.0))
+    lat, lon = np.radians(32.8), np.radians(130.7)
+    print("elevation [deg]:  {0}".format(np.degrees(el).round().astype(int)))
+    print("Klobuchar [m]:    {0}".format(np.round(klobuchar(alpha, beta, lat, lon, el, 0.0, 5.0 * 3600.0), 2)))
+    print("Saastamoinen [m]: {0}".format(np.round(saastamoinen(lat, 50.0, el), 2)))
+    print("Saast.+NMF [m]:   {0}".format(np.round(tropospheric_delay(lat, 50.0, el, 180.0), 2)))
+    import time
+    el = np.random.uniform(0.1, 1.5, (3600, 12))
+    az = np.random.uniform(0.0, 2.0 * np.pi, (3600, 12))
+    t0 = time.time()
+    model = delay_model(alpha, beta, np.arange(3600.0), day_of_year=np.full(3600, 180.0))
+    model(np.full(3600, lat), np.full(3600, lon), np.full(3600, 50.0), el, az)
+    print("3600 epochs x 12 satellites: {0:.3f} s".format(time.time() - t0))
+
+
+if __name__ == '__main__':
+    main()
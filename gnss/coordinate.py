@@ -14,6 +14,12 @@
 #                        いつか、ecefクラスに返り値をxyzクラス（新設）とする差分を定義したい。
 #           2014/3/1     見やすくするためにメソッド間に空行を追加
 #           2014-09-06   enuクラスに足し算と引き算の定義を追加
+#           2026-10-19   blh.get_unit_length()の子午線方向の式で、演算子の優先順位の誤りを修正
+#                        測地線長を返すblh.get_geodesic_distance()を追加
+#                        各クラスに__slots__を定義して、インスタンス毎の__dict__をなくした
+#                        enuクラスに+=と-=を、各クラスに__array__()を追加
+#                        座標変換の途中で一時オブジェクトを生成しないように変更
+#                        change_unit_to_degree(), change_unit_to_rad()が楕円体高まで変換していたので修正
 #-------------------------------------------------------------------------------
 
 import math                     # 算術モジュールを追加
@@ -22,6 +28,8 @@ import math                     # 算術モジュールを追加
 class enu:
     """  enu座標系を扱うクラス
     """
+    __slots__ = ("datum", "e", "n", "u")
+
     def __init__(self, datum, e=0.0, n=0.0, u=0.0):
         """ 初期化
         Argv:
@@ -53,6 +61,30 @@ class enu:
         #print(e, n, u)
         return enu(self.datum, e, n, u)
 
+    def __iadd__(self, other):
+        """ 足し算（自身を書き換える）
+        新たなオブジェクトを生成しないので、ループ内での更新に向いています。
+        """
+        self.e += other.e
+        self.n += other.n
+        self.u += other.u
+        return self
+
+    def __isub__(self, other):
+        """ 引き算（自身を書き換える）
+        """
+        self.e -= other.e
+        self.n -= other.n
+        self.u -= other.u
+        return self
+
+    def __array__(self, dtype=None, copy=None):
+        """ NumPy配列化に対応する
+        np.array([enu, enu, ...])とすると、shape: (N, 3)の配列が得られます。
+        """
+        import numpy as np
+        return np.array((self.e, self.n, self.u), dtype=dtype)
+
     def __str__(self):
         """ 文字列化
         """
@@ -64,10 +96,7 @@ class enu:
         #print("dist")
         #print(self)
         #print(other)
-        diff = self - other
-        #print("diff")
-        #print(diff)
-        return math.sqrt(diff.e ** 2 + diff.n ** 2 + diff.u ** 2)
+        return math.sqrt((self.e - other.e) ** 2 + (self.n - other.n) ** 2 + (self.u - other.u) ** 2)
 
     # プロパティ
     @property
@@ -106,6 +135,8 @@ class enu:
 class ecef:
     """  ecef座標系を扱うクラス
     """
+    __slots__ = ("datum", "x", "y", "z")
+
     def __init__(self, datum, x=0.0, y=0.0, z=0.0):
         """ 初期化
         Argv:
@@ -124,22 +155,33 @@ class ecef:
         """
         return "{0:.4f},{1:.4f},{2:.4f}".format(self.x, self.y, self.z)
 
-    def to_blh(self):
-        """ blh座標系へ変換する.
+    def __array__(self, dtype=None, copy=None):
+        """ NumPy配列化に対応する
+        """
+        import numpy as np
+        return np.array((self.x, self.y, self.z), dtype=dtype)
+
+    def _to_blh_rad(self):
+        """ 緯度[rad]・経度[rad]・楕円体高[m]をタプルで返す
+        オブジェクトを生成しない分、to_blh()よりも軽量です。
         """
-        if self.x == 0.0 and self.y == 0.0 and self.z == 0.0:
-            return None
         h = self.datum.a ** 2.0 - self.datum.b ** 2.0
         p = math.hypot(self.x, self.y)
         t = math.atan2(self.z * self.datum.a, p * self.datum.b)
         sint = math.sin(t)
         cost = math.cos(t)
-
         lat = math.atan2(self.z + h / self.datum.b * (sint ** 3.0), p - h / self.datum.a * (cost ** 3.0)) # 緯度[rad]を計算
         n   = self.datum.a / math.sqrt(1.0 - self.datum.E2 * (math.sin(lat) ** 2.0))                      # 卯酉線曲率半径
         lon = math.atan2(self.y, self.x)                    # 経度[rad]を計算
         height = (p / math.cos(lat)) - n                    # 楕円体高[m]を計算
+        return (lat, lon, height)
 
+    def to_blh(self):
+        """ blh座標系へ変換する.
+        """
+        if self.x == 0.0 and self.y == 0.0 and self.z == 0.0:
+            return None
+        lat, lon, height = self._to_blh_rad()
         lat = lat * 180.0 / math.pi                         # 単位をdegに変換
         lon = lon * 180.0 / math.pi
         return blh(self.datum, lat, lon, height, "degree")
@@ -151,20 +193,19 @@ class ecef:
         """
         ans = None
         if isinstance(origin, ecef) or isinstance(origin, blh):
-            origin_blh = None
-            if isinstance(origin, blh):
-                origin_blh = blh(self.datum, origin.B, origin.L, origin.H, origin.unit) # copy
-                origin_blh.change_unit_to_rad()
-                origin = origin.to_ecef()
+            if isinstance(origin, blh):                     # 一時オブジェクトを作らないように、数値のまま処理する
+                B, L, H = origin._to_rad()
+                ox, oy, oz = origin._to_ecef_xyz()
             else:
-                origin_blh = origin.to_blh().change_unit_to_rad()
-            dx = self.x - origin.x
-            dy = self.y - origin.y
-            dz = self.z - origin.z
-            sB = math.sin(origin_blh.B)
-            cB = math.cos(origin_blh.B)
-            sL = math.sin(origin_blh.L)
-            cL = math.cos(origin_blh.L)
+                B, L, H = origin._to_blh_rad()
+                ox, oy, oz = origin.x, origin.y, origin.z
+            dx = self.x - ox
+            dy = self.y - oy
+            dz = self.z - oz
+            sB = math.sin(B)
+            cB = math.cos(B)
+            sL = math.sin(L)
+            cL = math.cos(L)
             e = -dx * sL + dy * cL
             n = -dx * cL * sB + -dy * sL * sB + dz * cB
             u = dx * cL * cB + dy * sL * cB + dz * sB
@@ -178,6 +219,8 @@ class ecef:
 class blh:
     """ 緯度・経度・楕円体高を表現するクラス.
     """
+    __slots__ = ("datum", "B", "L", "H", "unit")
+
     def __init__(self, datum, B=0.0, L=0.0, H=0.0, unit="degree"):
         """ 初期化
         Argv:
@@ -198,16 +241,30 @@ class blh:
         """
         return "{0:.10f},{1:.10f},{2:.10f}".format(self.L, self.B, self.H)
 
+    def __array__(self, dtype=None, copy=None):
+        """ NumPy配列化に対応する
+        並びは(B, L, H)で、単位はunitのままです。
+        """
+        import numpy as np
+        return np.array((self.B, self.L, self.H), dtype=dtype)
+
     def copy(self):
         return blh(self.datum, self.B, self.L, self.H, self.unit)
 
+    def _to_rad(self):
+        """ 緯度[rad]・経度[rad]・楕円体高[m]をタプルで返す
+        自身の単位は変更しません。
+        """
+        if self.unit == "degree":
+            return (self.B * math.pi / 180.0, self.L * math.pi / 180.0, self.H)
+        return (self.B, self.L, self.H)
+
     def change_unit_to_degree(self):
         """ 単位をdegreeへ変換する
         """
         if self.unit == "rad":
             self.B *= 180.0 / math.pi
             self.L *= 180.0 / math.pi
-            self.H *= 180.0 / math.pi
             self.unit = "degree"
 
     def change_unit_to_rad(self):
@@ -216,7 +273,6 @@ class blh:
         if self.unit == "degree":
             self.B *= math.pi / 180.0
             self.L *= math.pi / 180.0
-            self.H *= math.pi / 180.0
             self.unit = "rad"
 
     def get_unit_length(self, lat_deg):
@@ -228,7 +284,7 @@ class blh:
         """
         _lat = lat_deg * math.pi / 180.0
         _unitL = math.pi / 180.0 * self.datum.a * math.cos(_lat) / math.sqrt(1 - self.datum.E2 * (math.sin(_lat) ** 2.0))
-        _unitB = math.pi / 180.0 * self.datum.a * (1 - self.datum.E2) / (1 - self.datum.E2 * (math.sin(_lat) ** 2.0) ** 1.5)
+        _unitB = math.pi / 180.0 * self.datum.a * (1 - self.datum.E2) / (1 - self.datum.E2 * (math.sin(_lat) ** 2.0)) ** 1.5
         return (_unitB, _unitL)
 
     def get_distance(self, target_position_blh):
@@ -247,18 +303,36 @@ class blh:
         _distance = ((widthB * unitB) ** 2.0 + (widthL * unitL) ** 2.0) ** 0.5
         return _distance
 
+    def get_geodesic_distance(self, target_position_blh):
+        """ 指定座標までの楕円体上の測地線長[m]を返す
+        距離の制限はありませんが、楕円体高は考慮しません。
+        多数の点をまとめて処理する場合は、gnss.geodesicモジュールを直接利用してください。
+        Argv:
+            target_position_blh: <blh> 距離計算上の目標座標
+        """
+        import gnss.geodesic as geodesic                       # NumPyを必要とするので、ここでインポートする
+        B1, L1, H1 = self._to_rad()
+        B2, L2, H2 = target_position_blh._to_rad()
+        s, az1, az2 = geodesic.inverse(self.datum, B1, L1, B2, L2, unit="rad")
+        return float(s)
+
     def to_ecef(self):
         """ ecef座標系に変換したオブジェクトを返す
         ref: GPSのための実用プログラミング第1版, p. 29
         """
-        copy = blh(self.datum, self.B, self.L, self.H, self.unit)
-        copy.change_unit_to_rad()
-        n = self.datum.a / math.sqrt(1.0 - self.datum.E2 * math.sin(copy.B) ** 2.0)
-        x = (n + copy.H) * math.cos(copy.B) * math.cos(copy.L)
-        y = (n + copy.H) * math.cos(copy.B) * math.sin(copy.L)
-        z = ((1.0 - self.datum.E2) * n + copy.H) * math.sin(copy.B)
+        x, y, z = self._to_ecef_xyz()
         return ecef(self.datum, x, y, z)
 
+    def _to_ecef_xyz(self):
+        """ ecef座標系の座標値をタプルで返す
+        """
+        B, L, H = self._to_rad()
+        n = self.datum.a / math.sqrt(1.0 - self.datum.E2 * math.sin(B) ** 2.0)
+        x = (n + H) * math.cos(B) * math.cos(L)
+        y = (n + H) * math.cos(B) * math.sin(L)
+        z = ((1.0 - self.datum.E2) * n + H) * math.sin(B)
+        return (x, y, z)
+
 
 
 
@@ -292,6 +366,7 @@ def main():
     target = blh(sample_datum, 32.8613858, 130.9526228, 0.0)
     distance = hoge.get_distance(target)
     print("distance: {0} m.".format(distance))
+    print("geodesic distance: {0} m.".format(hoge.get_geodesic_distance(target)))
 
 
 
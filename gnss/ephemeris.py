@@ -14,6 +14,8 @@
 #                       本日の時点では、managerクラスのテストの全てとsub_managerクラスの一部の機能をテストできていません。
 #                       未テスト分はQZSのモジュールを作成した後にテストします。
 #           2014/3/2    オブジェクトの比較、ハッシュ値生成、文字列化でepochが利用されていなかった点を修正した。
+#           2026-10-19  readerクラスで航法ファイルのヘッダから電離層補正係数を読み込むようにした。
+#                       readerクラスで、エポックをナノ秒まで保持したgnss.timescale.gnss_timeとしてtocに格納するようにした。
 #-------------------------------------------------------------------------------
 import re
 import types
@@ -21,6 +23,7 @@ import copy
 import inspect
 import os.path
 import datetime
+import gnss.timescale as timescale
 
 class ephemeris:
     """ エフェメリスを格納するクラス
@@ -124,18 +127,52 @@ class ephemeris:
 class reader:
     """ エフェメリスを読み込むクラス
     """
-    def __init__(self, extension_pattern="\.\d{2}[nNq]", ephemeris_pattern="dummy pattern (?P<sat_name>\d+)", ephemeris_class=ephemeris):
+    def __init__(self, extension_pattern="\.\d{2}[nNq]", ephemeris_pattern="dummy pattern (?P<sat_name>\d+)", ephemeris_class=ephemeris, ion_label="GPS"):
         """
         Argv:
             extension_pattern: <str>   拡張子正規表現パターン
             ephemeris_pattern: <str>   エフェメリスの正規表現パターン（グループ化しておくこと）
             ephemeris_class:   <class> エフェメリスクラス, isinstance(ephemeris_class, type) == true　となる
+            ion_label:         <str>   ヘッダの"IONOSPHERIC CORR"行で電離層補正係数を表すラベルの接頭辞, e.g. "QZS"
         """
         #print("test")
         self._extension_pattern = extension_pattern
         self._ephemeris_pattern = ephemeris_pattern
         self._ephemeris_class = ephemeris_class                 # ここで型のチェックをして、エラーをスローすべきだろうか？
         self._value_grouped_pattern = re.compile(r"(?P<value>[-]?\d[.]\d+)[ED](?P<power>[\s+-]\d{1,2})")
+        self._ion_label = ion_label
+        self._epoch_grouped_pattern = re.compile(r"(?P<yearYY>\d{1,2}) +(?P<month>\d{1,2}) +(?P<day>\d{1,2}) +(?P<hour>\d{1,2}) +(?P<min>\d{1,2}) +(?P<sec>\d{1,2})[.](?P<microsecond>\d+)")
+        self.ion_alpha = None                                   # Klobucharモデルの係数α0～α3. 最後に読み込んだファイルの値
+        self.ion_beta = None                                    # Klobucharモデルの係数β0～β3
+
+    def read_header(self, txt):
+        """ 航法ファイルのヘッダから電離層補正係数を読み込み、ion_alphaとion_betaに格納する
+        RINEX 2の"ION ALPHA"/"ION BETA"と、RINEX 2.12(QZS)・3の"IONOSPHERIC CORR"に対応しています。
+        Argv:
+            txt: <str> 航法ファイルのテキスト
+        Return:
+            <bool> 係数が見つかればTrue
+        """
+        alpha = None
+        beta = None
+        for line in txt.splitlines():
+            label = line[60:].strip()
+            if label == "END OF HEADER":
+                break
+            if label == "ION ALPHA":
+                alpha = line[:60]
+            elif label == "ION BETA":
+                beta = line[:60]
+            elif label == "IONOSPHERIC CORR":
+                if line[:4] == self._ion_label + "A":
+                    alpha = line[4:60]
+                elif line[:4] == self._ion_label + "B":
+                    beta = line[4:60]
+        if alpha is None or beta is None:
+            return False
+        self.ion_alpha = [self._change_to_value(mem.group(0)) for mem in self._value_grouped_pattern.finditer(alpha)]
+        self.ion_beta = [self._change_to_value(mem.group(0)) for mem in self._value_grouped_pattern.finditer(beta)]
+        return True
 
     def get_date(self, date_str):
         """ RINEXのボディ部分で使われる時刻情報の文字列を解析して、時刻オブジェクトを返す
@@ -166,6 +203,22 @@ class reader:
         else:
             return None
 
+    def get_gnss_time(self, date_str):
+        """ RINEXのボディ部分で使われる時刻情報の文字列を解析して、gnss.timescale.gnss_timeを返す
+        get_date()と異なり、秒の小数部を丸めません。
+        Return:
+            <gnss.timescale.gnss_time>: 時刻情報
+                                非エポック時はNoneを返します。
+        """
+        matchTest = self._epoch_grouped_pattern.search(date_str)
+        if matchTest != None:
+            year = int(matchTest.group('yearYY'))
+            year += 2000 if year < 80 else 1900
+            return timescale.gnss_time.parse(year, matchTest.group('month'), matchTest.group('day'),
+                matchTest.group('hour'), matchTest.group('min'), matchTest.group('sec') + "." + matchTest.group('microsecond'))
+        else:
+            return None
+
     def _change_to_value(self, value_str):
         """ 文字列の数字を数値へ変換する
         Return:
@@ -192,6 +245,7 @@ class reader:
         eph = []
         if isinstance(txt, str) and self.is_available:          # ファイルの存在が確認できない場合はFalseを返す
             #print("test")
+            self.read_header(txt)
             txt = txt.replace("\n", " ")                        # 余計な文字を変換
             txt = re.sub("\s{2,}", " ", txt)
             match_test = self._ephemeris_pattern.finditer(txt)
@@ -207,6 +261,7 @@ class reader:
                     sat_name = mem.group('sat_name').strip()
                     _eph.sat_name = sat_name                        # PRN番号など. QZSだと"J *"となるので、整数化できない。
                     _eph.epoch = self.get_date(mem.group('epoch'))  # エポック（時刻）
+                    _eph.toc = self.get_gnss_time(mem.group('epoch'))  # エポック（ナノ秒まで保持する）
                     # その他
                     _dict = mem.groupdict()
                     #print(_dict)
@@ -0,0 +1,339 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        geodesic
+# Purpose:  回転楕円体上の測地線（2点間の最短経路）に関する演算を提供する。
+#           Vincentyの解法をNumPyでベクトル化しているので、航跡の区間距離や
+#           多地点間の距離行列をまとめて計算できます。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        ref: T. Vincenty, "Direct and inverse solutions of geodesics on the ellipsoid
+#                   with application of nested equations", Survey Review, 1975.
+#              精度は0.5 mm程度です。
+#              ほぼ対蹠点となる2点（経度差が180°に近く、緯度の符号が反対）では逆解法が収束しないことがあります。
+#              その場合は、Karney(2013)と同様に始点の方位角を未知数として経度差を合わせる方法（二分法）で求めます。
+# Histroy:
+#           2026-10-19   作成
+#           2026-10-19   逆解法が収束しない対蹠点付近の組も求めるようにした（以前はNaN）
+#-------------------------------------------------------------------------------
+
+import numpy as np
+
+MAX_ITERATION = 200         # 逆解法の最大繰り返し数
+TOLERANCE = 1.0e-12         # 収束判定に用いるλの変化量[rad]. 距離にして0.01 mm以下
+
+
+def _to_rad(value, unit):
+    """ 角度をradの配列に変換する
+    """
+    value = np.asarray(value, dtype=np.float64)
+    if unit == "degree":
+        return np.radians(value)
+    return value
+
+def _from_rad(value, unit):
+    """ radの配列を指定単位の角度に変換する
+    """
+    if unit == "degree":
+        return np.degrees(value)
+    return value
+
+def _inverse_antipodal(datum, phi1, L1, phi2, L2):
+    """ Vincentyの逆解法が収束しない（ほぼ対蹠点の）組について、測地線長と方位角[rad]を求める
+    Karney(2013)と同じく、始点の方位角α1を与えれば終点の緯度を通るときの経度差λ12(α1)が決まり、
+    正規化した配置ではλ12がα1について単調増加であることを利用して、α1を二分法で求めます。
+    経度差の補正と距離の計算にはVincentyの級数を用います。
+    ref: C. F. F. Karney, "Algorithms for geodesics", J. Geodesy 87, 2013.
+    """
+    a = datum.a
+    b = datum.b
+    f = datum.f
+    # 正規化: 経度差 0 <= L <= π, |β1| >= |β2|, β1 <= 0 となるように点を入れ替え・反転する
+    swap = np.abs(phi1) < np.abs(phi2)
+    L = (L2 - L1 + np.pi) % (2.0 * np.pi) - np.pi
+    L = np.where(swap, -L, L)                               # 入れ替えると経度差の符号も変わる
+    lon_sign = np.where(L < 0.0, -1.0, 1.0)
+    L = np.abs(L)
+    p1 = np.where(swap, phi2, phi1)
+    p2 = np.where(swap, phi1, phi2)
+    lat_sign = np.where(p1 > 0.0, -1.0, 1.0)
+    p1 = p1 * lat_sign
+    p2 = p2 * lat_sign
+    beta1 = np.arctan((1.0 - f) * np.tan(p1))
+    beta2 = np.arctan((1.0 - f) * np.tan(p2))
+    sinb1, cosb1 = np.sin(beta1), np.cos(beta1)
+    sinb2, cosb2 = np.sin(beta2), np.cos(beta2)
+
+    def solve(alpha1):
+        """ 方位角α1の測地線が緯度β2を通る点までの、経度差・弧長などを返す """
+        sin_alpha1 = np.sin(alpha1)
+        cos_alpha1 = np.cos(alpha1)
+        sin_alpha0 = sin_alpha1 * cosb1
+        cos2_alpha0 = 1.0 - sin_alpha0 ** 2
+        sin_alpha2 = sin_alpha0 / cosb2
+        cos_alpha2 = np.sqrt(np.maximum(cos_alpha1 ** 2 * cosb1 ** 2 + (cosb2 ** 2 - cosb1 ** 2), 0.0)) / cosb2   # 終点では北向き
+        sigma1 = np.arctan2(sinb1, cos_alpha1 * cosb1)
+        sigma2 = np.arctan2(sinb2, cos_alpha2 * cosb2)
+        omega1 = np.arctan2(sin_alpha0 * sinb1, cos_alpha1 * cosb1)
+        omega2 = np.arctan2(sin_alpha0 * sinb2, cos_alpha2 * cosb2)
+        sigma12 = (sigma2 - sigma1) % (2.0 * np.pi)
+        omega12 = (omega2 - omega1) % (2.0 * np.pi)
+        cos_2sigma_m = np.cos(sigma1 + sigma2)
+        C = f / 16.0 * cos2_alpha0 * (4.0 + f * (4.0 - 3.0 * cos2_alpha0))
+        lam12 = omega12 - (1.0 - C) * f * sin_alpha0 * (
+            sigma12 + C * np.sin(sigma12) * (cos_2sigma_m + C * np.cos(sigma12) * (-1.0 + 2.0 * cos_2sigma_m ** 2)))
+        return lam12, sigma12, cos_2sigma_m, cos2_alpha0, np.arctan2(sin_alpha2, cos_alpha2)
+
+    low = np.zeros(L.shape)
+    high = np.full(L.shape, np.pi)
+    for i in range(64):                                     # 区間幅がπ/2^64になるまで
+        mid = 0.5 * (low + high)
+        lam12 = solve(mid)[0]
+        below = lam12 < L
+        low = np.where(below, mid, low)
+        high = np.where(below, high, mid)
+    alpha1 = 0.5 * (low + high)
+    lam12, sigma, cos_2sigma_m, cos2_alpha, alpha2 = solve(alpha1)
+    sin_sigma = np.sin(sigma)
+    cos_sigma = np.cos(sigma)
+    u2 = cos2_alpha * (a ** 2 - b ** 2) / (b ** 2)
+    A = 1.0 + u2 / 16384.0 * (4096.0 + u2 * (-768.0 + u2 * (320.0 - 175.0 * u2)))
+    B = u2 / 1024.0 * (256.0 + u2 * (-128.0 + u2 * (74.0 - 47.0 * u2)))
+    delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4.0 * (
+        cos_sigma * (-1.0 + 2.0 * cos_2sigma_m ** 2) -
+        B / 6.0 * cos_2sigma_m * (-3.0 + 4.0 * sin_sigma ** 2) * (-3.0 + 4.0 * cos_2sigma_m ** 2)))
+    s = b * A * (sigma - delta_sigma)
+    # 正規化を元に戻す（緯度の反転 -> 点の入れ替え -> 経度の反転の逆順）
+    alpha1 = np.where(lat_sign < 0.0, np.pi - alpha1, alpha1)
+    alpha2 = np.where(lat_sign < 0.0, np.pi - alpha2, alpha2)
+    alpha1, alpha2 = np.where(swap, alpha2 + np.pi, alpha1), np.where(swap, alpha1 + np.pi, alpha2)
+    alpha1 = (lon_sign * alpha1) % (2.0 * np.pi)
+    alpha2 = (lon_sign * alpha2) % (2.0 * np.pi)
+    return s, alpha1, alpha2
+
+def inverse(datum, lat1, lon1, lat2, lon2, unit="degree"):
+    """ 2点間の測地線長と方位角を返す（逆解法）
+    引数は配列でも構いません。NumPyのブロードキャスト規則に従って計算します。
+    Argv:
+        datum: <gnss.datum.x>   測地系モジュール
+        lat1:  <float> or <ndarray> 始点の緯度
+        lon1:  <float> or <ndarray> 始点の経度
+        lat2:  <float> or <ndarray> 終点の緯度
+        lon2:  <float> or <ndarray> 終点の経度
+        unit:  <str>            e.g. "degree" or "rad"
+    Return:
+        <tuple<ndarray>> (測地線長[m], 始点での方位角, 終点での方位角)
+                         方位角は北を0とし、時計回りに正とします。単位はunitに従います。
+                         Vincentyの反復が収束しない（ほぼ対蹠点の）要素は、_inverse_antipodal()で求めます。
+    """
+    a = datum.a
+    b = datum.b
+    f = datum.f
+    phi1, L1, phi2, L2 = np.broadcast_arrays(
+        _to_rad(lat1, unit), _to_rad(lon1, unit), _to_rad(lat2, unit), _to_rad(lon2, unit))
+    shape = phi1.shape                                      # 計算は1次元配列で行い、最後に形を戻す
+    phi1, L1, phi2, L2 = phi1.ravel(), L1.ravel(), phi2.ravel(), L2.ravel()
+    L = (L2 - L1 + np.pi) % (2.0 * np.pi) - np.pi           # 経度差を[-π, π)に丸める
+    U1 = np.arctan((1.0 - f) * np.tan(phi1))                # 更成緯度
+    U2 = np.arctan((1.0 - f) * np.tan(phi2))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    lam = L.copy()
+    active = np.ones(L.shape, dtype=bool)                   # 未収束の要素
+    sin_sigma = np.zeros(L.shape)
+    cos_sigma = np.ones(L.shape)
+    sigma = np.zeros(L.shape)
+    cos2_alpha = np.ones(L.shape)
+    cos_2sigma_m = np.zeros(L.shape)
+    sin_lam = np.zeros(L.shape)
+    cos_lam = np.ones(L.shape)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for i in range(MAX_ITERATION):
+            idx = np.nonzero(active)                        # 収束した要素は計算しない
+            if len(idx[0]) == 0:
+                break
+            _lam = lam[idx]
+            _sinU1, _cosU1, _sinU2, _cosU2 = sinU1[idx], cosU1[idx], sinU2[idx], cosU2[idx]
+            _sin_lam = np.sin(_lam)
+            _cos_lam = np.cos(_lam)
+            _sin_sigma = np.hypot(_cosU2 * _sin_lam, _cosU1 * _sinU2 - _sinU1 * _cosU2 * _cos_lam)
+            _cos_sigma = _sinU1 * _sinU2 + _cosU1 * _cosU2 * _cos_lam
+            _sigma = np.arctan2(_sin_sigma, _cos_sigma)
+            _sin_alpha = np.where(_sin_sigma == 0.0, 0.0, _cosU1 * _cosU2 * _sin_lam / _sin_sigma)
+            _cos2_alpha = 1.0 - _sin_alpha ** 2
+            _cos_2sigma_m = np.where(_cos2_alpha == 0.0, 0.0, _cos_sigma - 2.0 * _sinU1 * _sinU2 / _cos2_alpha) # 赤道線上ではcos2σm = 0
+            C = f / 16.0 * _cos2_alpha * (4.0 + f * (4.0 - 3.0 * _cos2_alpha))
+            _lam_next = L[idx] + (1.0 - C) * f * _sin_alpha * (
+                _sigma + C * _sin_sigma * (_cos_2sigma_m + C * _cos_sigma * (-1.0 + 2.0 * _cos_2sigma_m ** 2)))
+            sin_sigma[idx] = _sin_sigma
+            cos_sigma[idx] = _cos_sigma
+            sigma[idx] = _sigma
+            cos2_alpha[idx] = _cos2_alpha
+            cos_2sigma_m[idx] = _cos_2sigma_m
+            sin_lam[idx] = _sin_lam
+            cos_lam[idx] = _cos_lam
+            done = np.abs(_lam_next - _lam) <= TOLERANCE
+            lam[idx] = _lam_next
+            active[idx] = ~done
+
+        u2 = cos2_alpha * (a ** 2 - b ** 2) / (b ** 2)
+        A = 1.0 + u2 / 16384.0 * (4096.0 + u2 * (-768.0 + u2 * (320.0 - 175.0 * u2)))
+        B = u2 / 1024.0 * (256.0 + u2 * (-128.0 + u2 * (74.0 - 47.0 * u2)))
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4.0 * (
+            cos_sigma * (-1.0 + 2.0 * cos_2sigma_m ** 2) -
+            B / 6.0 * cos_2sigma_m * (-3.0 + 4.0 * sin_sigma ** 2) * (-3.0 + 4.0 * cos_2sigma_m ** 2)))
+        s = b * A * (sigma - delta_sigma)
+        az1 = np.arctan2(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam) % (2.0 * np.pi)
+        az2 = np.arctan2(cosU1 * sin_lam, -sinU1 * cosU2 + cosU1 * sinU2 * cos_lam) % (2.0 * np.pi)
+    if np.any(active):                                      # 収束しなかったものは別の解法で求める
+        s[active], az1[active], az2[active] = _inverse_antipodal(datum, phi1[active], L1[active], phi2[active], L2[active])
+    return (s.reshape(shape)[()], _from_rad(az1, unit).reshape(shape)[()], _from_rad(az2, unit).reshape(shape)[()])
+
+def direct(datum, lat1, lon1, azimuth, distance, unit="degree"):
+    """ 始点から指定方位・距離だけ進んだ点を返す（順解法）
+    引数は配列でも構いません。
+    Argv:
+        datum:    <gnss.datum.x>   測地系モジュール
+        lat1:     <float> or <ndarray> 始点の緯度
+        lon1:     <float> or <ndarray> 始点の経度
+        azimuth:  <float> or <ndarray> 始点での方位角（北を0とし時計回りに正）
+        distance: <float> or <ndarray> 測地線長[m]
+        unit:     <str>            e.g. "degree" or "rad"
+    Return:
+        <tuple<ndarray>> (終点の緯度, 終点の経度, 終点での方位角) 単位はunitに従います。
+    """
+    a = datum.a
+    b = datum.b
+    f = datum.f
+    phi1, L1, alpha1, s = np.broadcast_arrays(
+        _to_rad(lat1, unit), _to_rad(lon1, unit), _to_rad(azimuth, unit), np.asarray(distance, dtype=np.float64))
+    sin_alpha1 = np.sin(alpha1)
+    cos_alpha1 = np.cos(alpha1)
+    tanU1 = (1.0 - f) * np.tan(phi1)
+    cosU1 = 1.0 / np.sqrt(1.0 + tanU1 ** 2)
+    sinU1 = tanU1 * cosU1
+    sigma1 = np.arctan2(tanU1, cos_alpha1)
+    sin_alpha = cosU1 * sin_alpha1
+    cos2_alpha = 1.0 - sin_alpha ** 2
+    u2 = cos2_alpha * (a ** 2 - b ** 2) / (b ** 2)
+    A = 1.0 + u2 / 16384.0 * (4096.0 + u2 * (-768.0 + u2 * (320.0 - 175.0 * u2)))
+    B = u2 / 1024.0 * (256.0 + u2 * (-128.0 + u2 * (74.0 - 47.0 * u2)))
+
+    sigma = s / (b * A)
+    for i in range(MAX_ITERATION):                          # 順解法は全要素が速やかに収束する
+        cos_2sigma_m = np.cos(2.0 * sigma1 + sigma)
+        sin_sigma = np.sin(sigma)
+        cos_sigma = np.cos(sigma)
+        delta_sigma = B * sin_sigma * (cos_2sigma_m + B / 4.0 * (
+            cos_sigma * (-1.0 + 2.0 * cos_2sigma_m ** 2) -
+            B / 6.0 * cos_2sigma_m * (-3.0 + 4.0 * sin_sigma ** 2) * (-3.0 + 4.0 * cos_2sigma_m ** 2)))
+        sigma_next = s / (b * A) + delta_sigma
+        if np.all(np.abs(sigma_next - sigma) <= TOLERANCE):
+            sigma = sigma_next
+            break
+        sigma = sigma_next
+    cos_2sigma_m = np.cos(2.0 * sigma1 + sigma)
+    sin_sigma = np.sin(sigma)
+    cos_sigma = np.cos(sigma)
+    tmp = sinU1 * sin_sigma - cosU1 * cos_sigma * cos_alpha1
+    phi2 = np.arctan2(sinU1 * cos_sigma + cosU1 * sin_sigma * cos_alpha1, (1.0 - f) * np.hypot(sin_alpha, tmp))
+    lam = np.arctan2(sin_sigma * sin_alpha1, cosU1 * cos_sigma - sinU1 * sin_sigma * cos_alpha1)
+    C = f / 16.0 * cos2_alpha * (4.0 + f * (4.0 - 3.0 * cos2_alpha))
+    L = lam - (1.0 - C) * f * sin_alpha * (sigma + C * sin_sigma * (cos_2sigma_m + C * cos_sigma * (-1.0 + 2.0 * cos_2sigma_m ** 2)))
+    L2 = (L1 + L + np.pi) % (2.0 * np.pi) - np.pi           # 経度を[-π, π)に丸める
+    alpha2 = np.arctan2(sin_alpha, -tmp) % (2.0 * np.pi)
+    return (_from_rad(phi2, unit)[()], _from_rad(L2, unit)[()], _from_rad(alpha2, unit)[()])
+
+def track_distance(datum, lat, lon, unit="degree"):
+    """ 航跡を構成する連続した点の間の距離[m]を返す
+    Argv:
+        datum: <gnss.datum.x>   測地系モジュール
+        lat:   <ndarray>        緯度の並び, shape: (N,)
+        lon:   <ndarray>        経度の並び, shape: (N,)
+        unit:  <str>            e.g. "degree" or "rad"
+    Return:
+        <ndarray> 区間距離[m], shape: (N-1,)
+                  累積距離が必要な場合は、np.cumsum()を利用してください。
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    s, az1, az2 = inverse(datum, lat[:-1], lon[:-1], lat[1:], lon[1:], unit)
+    return s
+
+def distance_to_many(datum, lat0, lon0, lat, lon, unit="degree"):
+    """ 1点から多数の点までの距離[m]を返す
+    Argv:
+        datum: <gnss.datum.x>   測地系モジュール
+        lat0:  <float>          基準点の緯度
+        lon0:  <float>          基準点の経度
+        lat:   <ndarray>        対象点の緯度, shape: (N,)
+        lon:   <ndarray>        対象点の経度, shape: (N,)
+        unit:  <str>            e.g. "degree" or "rad"
+    Return:
+        <ndarray> 距離[m], shape: (N,)
+    """
+    s, az1, az2 = inverse(datum, lat0, lon0, lat, lon, unit)
+    return s
+
+def distance_matrix(datum, lat_a, lon_a, lat_b=None, lon_b=None, unit="degree"):
+    """ 2つの点群の全ての組み合わせについて距離[m]を返す
+    lat_b, lon_bを省略すると点群Aの内部での距離行列を返します。
+    この場合は対称性を利用して、上三角部分だけを計算します。
+    Argv:
+        datum: <gnss.datum.x>   測地系モジュール
+        lat_a: <ndarray>        点群Aの緯度, shape: (N,)
+        lon_a: <ndarray>        点群Aの経度, shape: (N,)
+        lat_b: <ndarray>        点群Bの緯度, shape: (M,)
+        lon_b: <ndarray>        点群Bの経度, shape: (M,)
+        unit:  <str>            e.g. "degree" or "rad"
+    Return:
+        <ndarray> 距離行列[m], shape: (N, M) or (N, N)
+    """
+    lat_a = np.asarray(lat_a, dtype=np.float64)
+    lon_a = np.asarray(lon_a, dtype=np.float64)
+    if lat_b is None or lon_b is None:
+        n = len(lat_a)
+        i, j = np.triu_indices(n, k=1)
+        s, az1, az2 = inverse(datum, lat_a[i], lon_a[i], lat_a[j], lon_a[j], unit)
+        ans = np.zeros((n, n))
+        ans[i, j] = s
+        ans[j, i] = s
+        return ans
+    lat_b = np.asarray(lat_b, dtype=np.float64)
+    lon_b = np.asarray(lon_b, dtype=np.float64)
+    s, az1, az2 = inverse(datum, lat_a[:, np.newaxis], lon_a[:, np.newaxis], lat_b[np.newaxis, :], lon_b[np.newaxis, :], unit)
+    return s
+
+
+
+
+def main():
+    print("---self test---")
+    import time
+    import gnss.datum.WGS84 as wgs84
+    # 近距離の例
+    s, az1, az2 = inverse(wgs84, 32.8545684, 130.9808465, 32.8613858, 130.9526228)
+    print("distance: {0} m, azimuth: {1}, {2}".format(s, az1, az2))
+    lat2, lon2, az = direct(wgs84, 32.8545684, 130.9808465, az1, s)
+    print("direct: {0}, {1}, {2}".format(lat2, lon2, az))
+    s, az1, az2 = inverse(wgs84, 35.0, 135.0, -35.0, -45.0)  # 対蹠点
+    print("antipodal: {0}".format(s))
+    s, az1, az2 = inverse(wgs84, 0.0, 0.0, 0.5, 179.7)      # Vincentyの反復が収束しない例
+    print("nearly antipodal: {0} m, azimuth: {1}, {2}".format(s, az1, az2))
+
+    # 航跡の区間距離の計算時間
+    n = 1000000
+    lat = 32.0 + np.cumsum(np.random.normal(0.0, 1.0e-3, n))
+    lon = 130.0 + np.cumsum(np.random.normal(0.0, 1.0e-3, n))
+    t0 = time.time()
+    d = track_distance(wgs84, lat, lon)
+    print("track: {0} segments, {1:.1f} km, {2:.2f} s".format(len(d), np.sum(d) / 1000.0, time.time() - t0))
+
+
+if __name__ == '__main__':
+    main()
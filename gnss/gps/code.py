@@ -8,36 +8,46 @@
 # Created:     02/03/2014
 # Copyright:   (c) morishita 2014
 # Licence:     GPLv2
+# History:     2026/10/19  G1とG2の系列を1回だけ生成し、全PRNのコードを行列にまとめたコードバンクから返すようにした。
 #-------------------------------------------------------------------------------
 
-def generate_L1CA(prn):
-    LEN_L1CA = 1023
-    delay = [ #/* G2 delay (chips) */
-          5,   6,   7,   8,  17,  18, 139, 140, 141, 251,   #/*   1- 10 */
-        252, 254, 255, 256, 257, 258, 469, 470, 471, 472,   #/*  11- 20 */
-        473, 474, 509, 512, 513, 514, 515, 516, 859, 860,   #/*  21- 30 */
-        861, 862, 863, 950, 947, 948, 950,  67, 103,  91,   #/*  31- 40 */
-         19, 679, 225, 625, 946, 638, 161,1001, 554, 280,   #/*  41- 50 */
-        710, 709, 775, 864, 558, 220, 397,  55, 898, 759,   #/*  51- 60 */
-        367, 299,1018, 729, 695, 780, 801, 788, 732,  34,   #/*  61- 70 */
-        320, 327, 389, 407, 525, 405, 221, 761, 260, 326,   #/*  71- 80 */
-        955, 653, 699, 422, 188, 438, 959, 539, 879, 677,   #/*  81- 90 */
-        586, 153, 792, 814, 446, 264,1015, 278, 536, 819,   #/*  91-100 */
-        156, 957, 159, 712, 885, 461, 248, 713, 126, 807,   #/* 101-110 */
-        279, 122, 197, 693, 632, 771, 467, 647, 203, 145,   #/* 111-120 */
-        175,  52,  21, 237, 235, 886, 657, 634, 762, 355,   #/* 121-130 */
-       1012, 176, 603, 130, 359, 595,  68, 386, 797, 456,   #/* 131-140 */
-        499, 883, 307, 127, 211, 121, 118, 163, 628, 853,   #/* 141-150 */
-        484, 289, 811, 202,1021, 463, 568, 904, 670, 230,   #/* 151-160 */
-        911, 684, 309, 644, 932,  12, 314, 891, 212, 185,   #/* 161-170 */
-        675, 503, 150, 395, 345, 846, 798, 992, 357, 995,   #/* 171-180 */
-        877, 112, 144, 476, 193, 109, 445, 291,  87, 399,   #/* 181-190 */
-        292, 901, 339, 208, 711, 189, 263, 537, 663, 942,   #/* 191-200 */
-        173, 900,  30, 500, 935, 556, 373,  85, 652, 310    #/* 201-210 */
-    ]
-    code = [0] * LEN_L1CA
-    G1 = [0] * LEN_L1CA
-    G2 = [0] * LEN_L1CA
+import os.path
+import numpy as np
+
+LEN_L1CA = 1023
+_G2_DELAY = [ #/* G2 delay (chips) */
+      5,   6,   7,   8,  17,  18, 139, 140, 141, 251,   #/*   1- 10 */
+    252, 254, 255, 256, 257, 258, 469, 470, 471, 472,   #/*  11- 20 */
+    473, 474, 509, 512, 513, 514, 515, 516, 859, 860,   #/*  21- 30 */
+    861, 862, 863, 950, 947, 948, 950,  67, 103,  91,   #/*  31- 40 */
+     19, 679, 225, 625, 946, 638, 161,1001, 554, 280,   #/*  41- 50 */
+    710, 709, 775, 864, 558, 220, 397,  55, 898, 759,   #/*  51- 60 */
+    367, 299,1018, 729, 695, 780, 801, 788, 732,  34,   #/*  61- 70 */
+    320, 327, 389, 407, 525, 405, 221, 761, 260, 326,   #/*  71- 80 */
+    955, 653, 699, 422, 188, 438, 959, 539, 879, 677,   #/*  81- 90 */
+    586, 153, 792, 814, 446, 264,1015, 278, 536, 819,   #/*  91-100 */
+    156, 957, 159, 712, 885, 461, 248, 713, 126, 807,   #/* 101-110 */
+    279, 122, 197, 693, 632, 771, 467, 647, 203, 145,   #/* 111-120 */
+    175,  52,  21, 237, 235, 886, 657, 634, 762, 355,   #/* 121-130 */
+   1012, 176, 603, 130, 359, 595,  68, 386, 797, 456,   #/* 131-140 */
+    499, 883, 307, 127, 211, 121, 118, 163, 628, 853,   #/* 141-150 */
+    484, 289, 811, 202,1021, 463, 568, 904, 670, 230,   #/* 151-160 */
+    911, 684, 309, 644, 932,  12, 314, 891, 212, 185,   #/* 161-170 */
+    675, 503, 150, 395, 345, 846, 798, 992, 357, 995,   #/* 171-180 */
+    877, 112, 144, 476, 193, 109, 445, 291,  87, 399,   #/* 181-190 */
+    292, 901, 339, 208, 711, 189, 263, 537, 663, 942,   #/* 191-200 */
+    173, 900,  30, 500, 935, 556, 373,  85, 652, 310    #/* 201-210 */
+]
+
+_code_bank = None                   # 全PRNのコードを格納した行列（初回の呼び出しで作る）
+
+
+def _generate_G1_G2():
+    """ G1とG2のシフトレジスタの出力系列を±1で返す
+    どのPRNでも同じ系列なので、1回だけ生成すれば良い。
+    """
+    G1 = np.empty(LEN_L1CA, dtype=np.int8)
+    G2 = np.empty(LEN_L1CA, dtype=np.int8)
     R1 = [-1] * 10
     R2 = [-1] * 10
     for i in range(LEN_L1CA):
@@ -45,15 +55,48 @@ def generate_L1CA(prn):
         G2[i] = R2[9]
         C1 = R1[2] * R1[9]
         C2 = R2[1] * R2[2] * R2[5] * R2[7] * R2[8] * R2[9]
-        R1.insert(0, C1)
-        R2.insert(0, C2)
-        R1.pop()
-        R2.pop()
-    j = LEN_L1CA - delay[prn - 1]
-    for i in range(LEN_L1CA):
-        code[i] = -G1[i] * G2[j % LEN_L1CA]
-        j += 1
-    return code
+        R1 = [C1] + R1[:9]
+        R2 = [C2] + R2[:9]
+    return G1, G2
+
+def get_code_bank(cache_file=None):
+    """ PRN 1-210のL1 C/Aコードを格納した行列を返す
+    行列は(210, 1023)のint8で、i行目がPRN i+1のコード(±1)です。
+    G1とG2の系列を1回だけ生成し、G2を各PRNの遅延だけずらして掛け合わせて作ります。
+    一度作った行列はメモリ上に保持します。
+    Args:
+        cache_file: <str> .npyファイル名. 指定すると、ファイルがあれば読み込み、なければ保存する
+                    （既にメモリ上にある行列も保存します）
+    """
+    global _code_bank
+    if _code_bank is None:
+        if cache_file != None and os.path.isfile(cache_file):
+            bank = np.load(cache_file)
+            if bank.shape == (len(_G2_DELAY), LEN_L1CA) and bank.dtype == np.int8:
+                _code_bank = bank
+        if _code_bank is None:
+            G1, G2 = _generate_G1_G2()
+            delay = np.array(_G2_DELAY)
+            index = (np.arange(LEN_L1CA) + LEN_L1CA - delay[:, np.newaxis]) % LEN_L1CA     # 遅延させたG2の添字
+            _code_bank = -G1 * G2[index]
+        _code_bank.setflags(write=False)                                               # 共有するので書き換えを禁止する
+    if cache_file != None and not os.path.isfile(cache_file):
+        np.save(cache_file, _code_bank)
+    return _code_bank
+
+def get_L1CA(prn):
+    """ 指定したPRNのL1 C/Aコードを、int8の配列（コードバンクの行の参照）で返す
+    Args:
+        prn: <int> PRN番号 (1-210)
+    """
+    return get_code_bank()[prn - 1]
+
+def generate_L1CA(prn):
+    """ 指定したPRNのL1 C/Aコードを、±1のリストで返す
+    Args:
+        prn: <int> PRN番号 (1-210)
+    """
+    return get_L1CA(prn).tolist()
 
 def main():
     l1ca = generate_L1CA(1)
@@ -24,6 +24,7 @@
 #                       enuクラスを新設
 #            2014/2/27  汎用性を得るために、親クラスを作成し、これを継承する形に改めた。
 #            2014/3/1   メンテナンスの観点から、測地系モジュールを代入する形に変更
+#            2026-10-19 __slots__を定義し、初期化時に親クラスの__init__()を経由しないように変更
 #-------------------------------------------------------------------------------
 
 import math                     # 算術モジュールを追加
@@ -36,6 +37,8 @@ datum = wgs84
 class enu(gnss_coor.enu):
     """  enu座標系を扱うクラスです.
     """
+    __slots__ = ()
+
     def __init__(self, e=0.0, n=0.0, u=0.0):
         """ 初期化
         Argv:
@@ -43,7 +46,10 @@ class enu(gnss_coor.enu):
             n:     <float> or <str> 局地座標系における北方向座標値
             u:     <float> or <str> 局地座標系における鉛直方向座標値
         """
-        gnss_coor.enu.__init__(self, datum, e, n, u)
+        self.datum = datum
+        self.e = float(e)
+        self.n = float(n)
+        self.u = float(u)
     def __str__(self):
         """ 文字列化
         """
@@ -54,6 +60,8 @@ class enu(gnss_coor.enu):
 class ecef(gnss_coor.ecef):
     """  ecef座標系を扱うクラスです.
     """
+    __slots__ = ()
+
     def __init__(self, x=0.0, y=0.0, z=0.0):
         """ 初期化
         Argv:
@@ -61,7 +69,10 @@ class ecef(gnss_coor.ecef):
             y:     <float> or <str> ECEF座標系におけるy軸座標値
             z:     <float> or <str> ECEF座標系におけるz軸座標値
         """
-        gnss_coor.ecef.__init__(self, datum, x, y, z)
+        self.datum = datum
+        self.x = float(x)
+        self.y = float(y)
+        self.z = float(z)
     def __str__(self):
         """ 文字列化
         """
@@ -72,6 +83,8 @@ class ecef(gnss_coor.ecef):
 class blh(gnss_coor.blh):
     """ 緯度・経度・楕円体高を表現するクラス.
     """
+    __slots__ = ()
+
     def __init__(self, B=0.0, L=0.0, H=0.0, unit="degree"):
         """ 初期化
         Argv:
@@ -80,7 +93,11 @@ class blh(gnss_coor.blh):
             H:     <float> or <str> 楕円体高
             unit:  <str>            e.g. "degree" or "rad"
         """
-        gnss_coor.blh.__init__(self, datum, B, L, H, unit)
+        self.datum = datum
+        self.B = float(B)
+        self.L = float(L)
+        self.H = float(H)
+        self.unit = unit
     def __str__(self):
         """ 文字列化
         """
@@ -16,6 +16,7 @@
 #           2014/3/1     WGS84モジュールで定義した変数名変更へ対応
 #                        時刻モジュールと楕円体モジュールと座標系モジュールを置換しやすいように改造
 #                        readerクラスの初期化部分において、放送歴の拡張子部分をqzs用の"q"を取り除いた。
+#           2026-10-19   calc_sat_position()でgnss.timescale.gnss_timeを受け付けるようにした。
 #-------------------------------------------------------------------------------
 
 import os
@@ -28,6 +29,7 @@ import gnss.gps.time as gtime
 import gnss.datum.WGS84 as wgs84
 import gnss.gps.coordinate as gcoor
 import gnss.ephemeris as gnss_eph
+import gnss.timescale as timescale
 
 time_system = gtime
 datum = wgs84
@@ -110,7 +112,7 @@ class ephemeris(gnss_eph.ephemeris):
         """ 指定エポックにおける衛星の座標を返す
         計算方法はICD-200Dを参照されたし。
         Argv:
-            epoch (GPS time)  <datetime.datetime> or <int> or <float>
+            epoch (GPS time)  <datetime.datetime> or <int> or <float> or <gnss.timescale.gnss_time>
                               UTCだと、厳密な変換（をコードの整合性と利便性を保ちつつ実装するの）が面倒.
                               ただし、うるう秒+UTCと単純な変換であっても衛星位置座標の誤差は0.04 mm以下。
                               気にしなければ気にならない。
@@ -122,14 +124,19 @@ class ephemeris(gnss_eph.ephemeris):
         if self.is_available == False:
             return None
         # 引数をGPS時刻になおす
-        if isinstance(epoch, datetime.datetime):
+        if isinstance(epoch, timescale.gnss_time):
+            gpst = None
+        elif isinstance(epoch, datetime.datetime):
             gpst = (epoch - time_system.epoch_origin).total_seconds()
         elif isinstance(epoch, float) or isinstance(epoch, int):
             gpst = epoch
         else:
             return None
         #　計算開始
-        tdiff = gpst - (self.gps_week * timeKM.TIME_A_WEEK + self.TOE)  # GPS時刻同士の引き算で時間差を計算
+        if gpst is None:
+            tdiff = epoch.get_seconds_from(self.gps_week, self.TOE)     # ナノ秒単位の整数同士で差を取るので桁落ちしない
+        else:
+            tdiff = gpst - (self.gps_week * timeKM.TIME_A_WEEK + self.TOE)  # GPS時刻同士の引き算で時間差を計算
         #print(tdiff)
         n0 = math.sqrt(datum.GM) / (self.SQRT_A ** 3)                   # 衛星の平均的な角速度
         M = self.M0 + (n0 + self.delta_N) * tdiff                       # 平均近点角
@@ -11,6 +11,7 @@
 # Licence:     new BSD
 # History:      2013/1/11   4分位数の計算時に、リストの数に下限を設けた。
 #               2014/2/11   暗号理論の講義でRubyにて作ったfactorize()を移植した。
+#               2026/10/19  TwiceDrmsが2乗和を加算していなかった（最後の値しか使っていなかった）のを修正した。
 #-------------------------------------------------------------------------------
 import math
 
@@ -145,7 +146,7 @@ def TwiceDrms(valueList, trueValue):
     sum = 0.0
     for men in valueList:
         distance = abs(men - trueValue)
-        sum = distance ** 2.0
+        sum += distance ** 2.0
     rms = math.sqrt(sum / len(valueList))
     return (trueValue, 2.0 * rms)
 
@@ -18,33 +18,21 @@
 #                           うるう秒を求める処理は以下のリンク先を参考にしている。
 #                           http://fenrir.naruoka.org/download/autopilot/common/ruby/gpstime.rb
 #               2014/2/26   GPS時刻を返すconvert_utc2gpst()に1秒未満の補正項を入れた。
+#               2026/10/19  うるう秒とGPS時刻の計算をgnss.timescaleへ移し、配列も受け付けるようにした。
+#                           うるう秒の検索は線形探索から二分探索になった。
+#                           GPS週番号と曜日番号を配列でまとめて求める関数を追加した。
 #-------------------------------------------------------------------------------
 import re
 import decimal
 import datetime
+import numpy as np
 import timeKM
+import gnss.timescale as timescale
 
 # 各種定数
 GPSepoch_JD = 2444244.5			               # ユリウス日表現によるGPSの開始エポック
 epoch_origin = datetime.datetime(1980, 1, 6)   # GPSの基準エポック(UTC)
-leap_list = [                                  # うるう秒の挿入1秒後の時刻(UTC)
-    datetime.datetime(1981, 7, 1, 0, 0, 0),    # ref: http://www.bugbearr.jp/?%E6%97%A5%E6%99%82/%E5%B9%B4%E8%A1%A8
-    datetime.datetime(1982, 7, 1, 0, 0, 0),
-    datetime.datetime(1983, 7, 1, 0, 0, 0),
-    datetime.datetime(1985, 7, 1, 0, 0, 0),
-    datetime.datetime(1988, 1, 1, 0, 0, 0),
-    datetime.datetime(1990, 1, 1, 0, 0, 0),
-    datetime.datetime(1991, 1, 1, 0, 0, 0),
-    datetime.datetime(1992, 7, 1, 0, 0, 0),
-    datetime.datetime(1993, 7, 1, 0, 0, 0),
-    datetime.datetime(1994, 7, 1, 0, 0, 0),
-    datetime.datetime(1996, 1, 1, 0, 0, 0),
-    datetime.datetime(1997, 7, 1, 0, 0, 0),
-    datetime.datetime(1999, 1, 1, 0, 0, 0),
-    datetime.datetime(2006, 1, 1, 0, 0, 0),
-    datetime.datetime(2009, 1, 1, 0, 0, 0),
-    datetime.datetime(2012, 7, 1, 0, 0, 0),
-]
+leap_list = timescale.leap_list                # うるう秒の挿入1秒後の時刻(UTC). 実体はgnss.timescaleにあります
 
 
 
@@ -110,26 +98,56 @@ def get_GPSweek_From_DelimitedDate(date = "2010.3.30"):
         raise ValueError("引数の解析エラーが発生しました。引数で渡された日付はyyyy/MM/ddまたはyyyy.MM.dd形式となっていますか？")
 
 
+def get_GPSweek_From_JulianDates(jd):
+    """ ユリウス日の配列をGPS週番号の配列に変換する.
+    get_GPSweek_From_JulianDate()の配列版です。
+    """
+    _gpsDays = np.asarray(jd, dtype=np.float64) - GPSepoch_JD
+    return np.trunc(_gpsDays / 7).astype(np.int64)[()]
+
+def get_GPSweek_From_Arrays(year, month, day):
+    """ 年・月・日の配列からGPS週番号の配列を返す.
+    get_GPSweek_From_DelimitedDate()の配列版です。うるう秒は考慮しません。
+    """
+    return get_GPSweek_From_JulianDates(timeKM.get_JulianDate_From_Arrays(year, month, day))
+
+def get_DayOfWeek_From_Arrays(year, month, day):
+    """ 年・月・日の配列からGPSで云う曜日番号の配列を返す.
+    get_DayOfWeek_From_DelimitedDate()の配列版です。
+    """
+    jd = timeKM.get_JulianDate_From_Arrays(year, month, day)
+    jd_origin = timeKM.get_JulianDate_From_Arrayed_yyyyMMdd2([1980, 1, 6])
+    return np.mod(jd - jd_origin, 7)[()]
+
+def get_GPSweek_From_datetime64(t):
+    """ datetime64（の配列）からGPS週番号を返す. 時刻は切り捨てて日付だけで計算します.
+    """
+    year, month, day, ssssss = timeKM._split_datetime64(t)
+    return get_GPSweek_From_Arrays(year, month, day)
+
+def get_DayOfWeek_From_datetime64(t):
+    """ datetime64（の配列）からGPSで云う曜日番号を返す.
+    """
+    year, month, day, ssssss = timeKM._split_datetime64(t)
+    return get_DayOfWeek_From_Arrays(year, month, day)
+
+
 def convert_utc2leap_time(date):
     """ 指定日時におけるうるう秒を返す
     Argv:
-        date: (UTC) <datetime.datetime> 日時
+        date: (UTC) <datetime.datetime> 日時. datetime64やその配列も可
     Return:
-        <int> うるう秒
+        <int> うるう秒. 配列を渡した場合は配列
     """
-    leap = 0
-    for t in leap_list:
-        if t <= date:
-            leap += 1
-        else:
-            break
-    return leap
+    return timescale.get_leap_seconds(date)
 
 def convert_utc2gpst(date, A0="0.0", A1="0.0", Tot=None):
     """ GPS時刻を返す
+    1秒未満の補正を行う場合はDecimalで計算するので低速です。
+    多数の時刻を扱う場合や、ナノ秒の精度が必要な場合はgnss.timescale.gnss_time.from_utc()を利用してください。
 
     Argv:
-        date: (UTC) <datetime.datetime> GPS時刻へ変換される日時
+        date: (UTC) <datetime.datetime> GPS時刻へ変換される日時. Tot == Noneならdatetime64やその配列も可
         A0:         <str>               補正パラメータ.  e.g. 0.186264514923e-08
         A1:         <str>               補正パラメータ.  e.g. 0.159872115546e-13
         Tot:  (UTC) <datetime.datetime> 補正パラメータの元期（基準日時）
@@ -138,10 +156,7 @@ def convert_utc2gpst(date, A0="0.0", A1="0.0", Tot=None):
         <float> or <decimal.Decimal> GPS時刻[s]
                     <decimal.Decimal>, if type(Tot) != None
     """
-    dt = date - epoch_origin
-    #print(dt)
-    dt = dt.total_seconds()              # 秒に直す
-    gpst = dt + convert_utc2leap_time(date)      # うるう秒を足す
+    gpst = timescale.utc_to_gpst(date)   # うるう秒を足したGPS時刻[s]
     if Tot != None:                      # 1秒未満分の補正. ref: RINEX 3.02 A17.
         #print("hoge")
         tot = (Tot - epoch_origin).total_seconds()
@@ -170,6 +185,8 @@ def convert_utc2gpsw(date, A0="0.0", A1="0.0", Tot=None):
     Return:
         <int> GPS週番号
     """
+    if Tot == None:
+        return timescale.utc_to_week_tow(date)[0]
     return int(convert_utc2gpst(date, A0, A1, Tot) / timeKM.TIME_A_WEEK)
 
 
@@ -0,0 +1,281 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        ionex
+# Purpose:  IONEX形式の全球電離層マップ(GIM)を読み込み、電離層遅延量を計算する。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        ref: _doc/rinex/ionex1.pdf
+#              ファイルを開いた時点ではヘッダと各TECマップの位置（行番号）とエポックだけを調べ、
+#              マップの本体は問い合わせで必要になったときに初めて解析します（解析済みのマップは保持）。
+#              TECマップは(時刻, 緯度, 経度)の3次元配列に格納します。単位はTECUです。
+#              時刻方向の内挿は、IONEXの文書で推奨されている太陽に対してマップを回転させる方法を用いています。
+# Histroy:
+#           2026-10-19   作成
+#-------------------------------------------------------------------------------
+
+import re
+import os.path
+import datetime
+import numpy as np
+
+_epoch_pattern = re.compile(r"^\s*(?P<year>\d+)\s+(?P<month>\d+)\s+(?P<day>\d+)\s+(?P<hour>\d+)\s+(?P<min>\d+)\s+(?P<sec>\d+)")
+
+
+class ionex:
+    """ IONEXファイルを扱うクラス
+    """
+    def __init__(self, fname=None):
+        """
+        Argv:
+            fname: <str> IONEXファイルのパス. 省略時は後でread()かread_from_txt()を呼んでください。
+        """
+        self._lines = []
+        self._map_lines = []                # 各TECマップの開始行と終了行
+        self.epochs = np.array([], dtype="datetime64[s]")
+        self.lat = np.array([])             # 緯度のグリッド[deg]
+        self.lon = np.array([])             # 経度のグリッド[deg]
+        self.height = 450.0                 # 電離層の単層の高さ[km]
+        self.base_radius = 6371.0           # 地球の半径[km]
+        self.exponent = -1                  # TECの値の指数
+        self.elevation_cutoff = 0.0         # マップ作成時の仰角マスク[deg]
+        self._tec = np.empty((0, 0, 0))
+        self._loaded = np.array([], dtype=bool)
+        if fname is not None:
+            self.read(fname)
+
+    def read(self, fname):
+        """ ファイルを読み込む
+        Return:
+            <bool> 読み込めればTrue
+        """
+        if os.path.isfile(fname) != True:
+            return False
+        with open(fname, "r") as fr:
+            txt = fr.read()
+        return self.read_from_txt(txt)
+
+    def read_from_txt(self, txt):
+        """ テキストからヘッダとTECマップの位置を読み込む
+        Return:
+            <bool> TECマップが1つ以上あればTrue
+        """
+        self._lines = txt.splitlines()
+        self._map_lines = []
+        epochs = []
+        lat = None
+        lon = None
+        start = None
+        in_header = True
+        for i, line in enumerate(self._lines):
+            label = line[60:].strip()
+            if in_header:
+                if label == "HGT1 / HGT2 / DHGT":
+                    self.height = float(line[2:8])
+                elif label == "LAT1 / LAT2 / DLAT":
+                    lat = (float(line[2:8]), float(line[8:14]), float(line[14:20]))
+                elif label == "LON1 / LON2 / DLON":
+                    lon = (float(line[2:8]), float(line[8:14]), float(line[14:20]))
+                elif label == "BASE RADIUS":
+                    self.base_radius = float(line[:8])
+                elif label == "EXPONENT":
+                    self.exponent = int(line[:6])
+                elif label == "ELEVATION CUTOFF":
+                    self.elevation_cutoff = float(line[:8])
+                elif label == "END OF HEADER":
+                    in_header = False
+                continue
+            if label == "START OF TEC MAP":
+                start = i
+            elif label == "EPOCH OF CURRENT MAP" and start is not None:
+                epochs.append(self._get_epoch(line))
+            elif label == "END OF TEC MAP" and start is not None:
+                self._map_lines.append((start, i))
+                start = None
+        if lat is None or lon is None or len(self._map_lines) == 0:
+            return False
+        self.lat = self._get_grid(*lat)
+        self.lon = self._get_grid(*lon)
+        self.epochs = np.array(epochs, dtype="datetime64[s]")
+        self._tec = np.full((len(self.epochs), len(self.lat), len(self.lon)), np.nan)
+        self._loaded = np.zeros(len(self.epochs), dtype=bool)
+        return True
+
+    def _get_grid(self, start, stop, step):
+        """ グリッドの座標の配列を返す """
+        n = int(round((stop - start) / step)) + 1
+        return start + step * np.arange(n)
+
+    def _get_epoch(self, line):
+        """ エポックの行から時刻を返す """
+        m = _epoch_pattern.search(line)
+        return datetime.datetime(*[int(m.group(key)) for key in ("year", "month", "day", "hour", "min", "sec")])
+
+    def _load(self, indices):
+        """ 指定されたTECマップを解析して配列に格納する（解析済みのものは飛ばす）
+        """
+        for k in np.unique(indices):
+            if self._loaded[k]:
+                continue
+            start, stop = self._map_lines[k]
+            exponent = self.exponent
+            n_lon = len(self.lon)
+            i = start + 1
+            while i < stop:
+                line = self._lines[i]
+                label = line[60:].strip()
+                if label == "EXPONENT":
+                    exponent = int(line[:6])
+                elif label == "LAT/LON1/LON2/DLON/H":
+                    row = int(round((float(line[2:8]) - self.lat[0]) / (self.lat[1] - self.lat[0])))
+                    values = []
+                    while len(values) < n_lon:              # 1行に16個ずつ値が並ぶ
+                        i += 1
+                        values += self._lines[i].split()
+                    tec = np.array(values[:n_lon], dtype=np.float64)
+                    tec[tec == 9999] = np.nan               # 9999は欠測
+                    self._tec[k, row] = tec * 10.0 ** exponent
+                i += 1
+            self._loaded[k] = True
+
+    @property
+    def tec(self):
+        """ 全てのTECマップ[TECU]を返す, shape: (時刻, 緯度, 経度)
+        """
+        self._load(np.arange(len(self.epochs)))
+        return self._tec
+
+    def _interpolate_map(self, k, lat, lon):
+        """ k番目のマップを緯度・経度で双線形内挿する
+        """
+        lat_step = self.lat[1] - self.lat[0]
+        lon_step = self.lon[1] - self.lon[0]
+        lon = np.mod(lon - self.lon[0], 360.0)                  # 経度をグリッドの範囲に合わせる
+        y = np.clip((lat - self.lat[0]) / lat_step, 0.0, len(self.lat) - 1.0)
+        x = np.clip(lon / lon_step, 0.0, len(self.lon) - 1.0)
+        i = np.minimum(np.floor(y).astype(int), len(self.lat) - 2)
+        j = np.minimum(np.floor(x).astype(int), len(self.lon) - 2)
+        p = y - i
+        q = x - j
+        m = self._tec
+        return ((1.0 - p) * (1.0 - q) * m[k, i, j] + (1.0 - p) * q * m[k, i, j + 1] +
+            p * (1.0 - q) * m[k, i + 1, j] + p * q * m[k, i + 1, j + 1])
+
+    def get_tec(self, epoch, lat, lon, rotate=True):
+        """ 垂直方向の全電子数[TECU]を返す
+        Argv:
+            epoch:  <datetime64 or datetime> 時刻. 配列可（lat, lonとブロードキャストします）
+            lat:    <ndarray> 緯度[deg]
+            lon:    <ndarray> 経度[deg]
+            rotate: <bool> 時刻方向の内挿で、マップを太陽に対して固定して回転させるかどうか
+        Return:
+            <ndarray> マップの時間範囲外はNaN
+        """
+        t = (np.asarray(epoch, dtype="datetime64[ns]") - self.epochs[0]) / np.timedelta64(1, "s")
+        t, lat, lon = np.broadcast_arrays(t, np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+        T = (self.epochs - self.epochs[0]) / np.timedelta64(1, "s")
+        k = np.clip(np.searchsorted(T, t, side="right") - 1, 0, max(len(T) - 2, 0))
+        inside = (t >= T[0]) & (t <= T[-1])
+        if len(T) == 1:
+            self._load([0])
+            return np.where(inside, self._interpolate_map(0, lat, lon), np.nan)
+        self._load(np.concatenate([k[inside], k[inside] + 1]))
+        t0 = T[k]
+        t1 = T[k + 1]
+        shift0 = (t - t0) * 360.0 / 86400.0 if rotate else 0.0
+        shift1 = (t - t1) * 360.0 / 86400.0 if rotate else 0.0
+        e0 = self._interpolate_map(k, lat, lon + shift0)
+        e1 = self._interpolate_map(k + 1, lat, lon + shift1)
+        tec = ((t1 - t) * e0 + (t - t0) * e1) / (t1 - t0)
+        return np.where(inside, tec, np.nan)
+
+    def get_pierce_point(self, lat, lon, elevation, azimuth):
+        """ 電離層貫通点(IPP)の緯度・経度[deg]と傾斜係数を返す
+        Argv:
+            lat, lon:           <ndarray> 受信機の緯度・経度[deg]
+            elevation, azimuth: <ndarray> 衛星の仰角・方位角[deg]
+        Return:
+            <tuple<ndarray>> (IPPの緯度, IPPの経度, 傾斜係数)
+        """
+        lat = np.radians(lat)
+        lon = np.radians(lon)
+        azimuth = np.radians(azimuth)
+        z = np.pi / 2.0 - np.radians(elevation)                 # 天頂角
+        sin_z1 = self.base_radius / (self.base_radius + self.height) * np.sin(z)
+        psi = z - np.arcsin(sin_z1)                             # 地心角
+        lat_pp = np.arcsin(np.sin(lat) * np.cos(psi) + np.cos(lat) * np.sin(psi) * np.cos(azimuth))
+        lon_pp = lon + np.arcsin(np.sin(psi) * np.sin(azimuth) / np.cos(lat_pp))
+        return (np.degrees(lat_pp), np.degrees(lon_pp), 1.0 / np.sqrt(1.0 - sin_z1 ** 2))
+
+    def get_delay(self, epoch, lat, lon, elevation, azimuth, frequency=1575.42e6, rotate=True):
+        """ 斜距離方向の電離層遅延量[m]を返す
+        衛星と時刻の配列をまとめて計算できます。
+        Argv:
+            epoch:              <datetime64> 時刻, e.g. shape: (E, 1)
+            lat, lon:           <ndarray> 受信機の緯度・経度[deg], e.g. shape: (E, 1)
+            elevation, azimuth: <ndarray> 衛星の仰角・方位角[deg], e.g. shape: (E, S)
+            frequency:          <float> 搬送波の周波数[Hz], 省略時はL1
+        """
+        lat_pp, lon_pp, F = self.get_pierce_point(lat, lon, elevation, azimuth)
+        tec = self.get_tec(epoch, lat_pp, lon_pp, rotate)
+        return 40.3e16 / frequency ** 2 * F * tec
+
+
+
+
+def _create_sample():
+    """ テスト用のIONEXテキストを作成する
+    TECはIPPの地方時14時で最大となる単純なモデルです。
+    """
+    lines = ["     1.0            IONOSPHERE MAPS     GPS                 IONEX VERSION / TYPE",
+        "  2014     3     1     0     0     0                        EPOCH OF FIRST MAP",
+        "  2014     3     2     0     0     0                        EPOCH OF LAST MAP",
+        "  7200                                                      INTERVAL",
+        "    13                                                      # OF MAPS IN FILE",
+        "  6371.0                                                    BASE RADIUS",
+        "     2                                                      MAP DIMENSION",
+        "   450.0 450.0   0.0                                        HGT1 / HGT2 / DHGT",
+        "    87.5 -87.5  -2.5                                        LAT1 / LAT2 / DLAT",
+        "  -180.0 180.0   5.0                                        LON1 / LON2 / DLON",
+        "    -1                                                      EXPONENT",
+        "                                                            END OF HEADER"]
+    lat = np.arange(87.5, -87.6, -2.5)
+    lon = np.arange(-180.0, 180.1, 5.0)
+    for k in range(13):
+        lines.append("{0:6d}{1:54s}START OF TEC MAP".format(k + 1, ""))
+        epoch = datetime.datetime(2014, 3, 1) + datetime.timedelta(hours=2 * k)
+        lines.append("{0:6d}{1:6d}{2:6d}{3:6d}{4:6d}{5:6d}{6:24s}EPOCH OF CURRENT MAP".format(
+            epoch.year, epoch.month, epoch.day, epoch.hour, 0, 0, ""))
+        for b in lat:
+            lines.append("  {0:6.1f}{1:6.1f}{2:6.1f}{3:6.1f}{4:6.1f}{5:28s}LAT/LON1/LON2/DLON/H".format(b, -180.0, 180.0, 5.0, 450.0, ""))
+            local = np.mod(2 * k + lon / 15.0, 24.0)
+            tec = np.round((20.0 + 15.0 * np.cos((local - 14.0) / 24.0 * 2.0 * np.pi)) * np.cos(np.radians(b)) * 10.0).astype(int)
+            for i in range(0, len(tec), 16):
+                lines.append("".join("{0:5d}".format(v) for v in tec[i:i + 16]))
+        lines.append("{0:6d}{1:54s}END OF TEC MAP".format(k + 1, ""))
+    lines.append("{0:60s}END OF FILE".format(""))
+    return "\n".join(lines)
+
+def main():
+    print("---self test---")
+    gim = ionex()
+    print(gim.read_from_txt(_create_sample()))
+    print("maps: {0}, grid: {1} x {2}, loaded: {3}".format(len(gim.epochs), len(gim.lat), len(gim.lon), np.count_nonzero(gim._loaded)))
+    epoch = np.datetime64("2014-03-01T05:00:00") + np.arange(3600)[:, np.newaxis] * np.timedelta64(1, "s")
+    el = np.random.uniform(10.0, 90.0, (3600, 10))
+    az = np.random.uniform(0.0, 360.0, (3600, 10))
+    import time
+    t0 = time.time()
+    delay = gim.get_delay(epoch, 32.8, 130.7, el, az)
+    print("3600 epochs x 10 satellites: {0:.3f} s, loaded maps: {1}".format(time.time() - t0, np.count_nonzero(gim._loaded)))
+    print("delay [m]: min {0:.2f}, max {1:.2f}".format(np.min(delay), np.max(delay)))
+    print("TEC at a grid node: {0:.1f} (expected {1:.1f})".format(
+        float(gim.get_tec(np.datetime64("2014-03-01T02:00:00"), 30.0, 0.0)), gim.tec[1, 23, 36]))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        kalman
+# Purpose:  拡張カルマンフィルタ(EKF)による連続測位を提供する。
+#           1 Hzなどで連続して得られる観測データを、前のエポックの推定値を引き継ぎながら処理します。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        状態量は以下の通りです（時計誤差は距離[m]に換算して扱います）。
+#                "cv":     (X, Y, Z, Vx, Vy, Vz, 時計誤差, 時計誤差の変化率)   等速度モデル
+#                "static": (X, Y, Z, 時計誤差, 時計誤差の変化率)              静止モデル
+#              初期値は最初のエポックの最小二乗解（gnss.positioning.solve_spp()）から得ます。
+# Histroy:
+#           2026-10-19   作成
+#-------------------------------------------------------------------------------
+
+import numpy as np
+import gnss.datum.WGS84 as wgs84
+import gnss.positioning as positioning
+
+
+class ekf:
+    """ 拡張カルマンフィルタによる測位を行うクラス
+    """
+    def __init__(self, model="cv", sigma_acceleration=1.0, sigma_position=0.0, sigma_clock_drift=1.0,
+            sigma_pseudorange=3.0, datum=wgs84, elevation_mask=0.0, weighting="elevation"):
+        """ 初期化
+        Argv:
+            model:              <str>   "cv": 等速度モデル, "static": 静止モデル
+            sigma_acceleration: <float> 加速度の標準偏差[m/s^2]. 等速度モデルで使用します。
+            sigma_position:     <float> 位置のランダムウォークの標準偏差[m/s^0.5]. 静止モデルで使用します。
+            sigma_clock_drift:  <float> 受信機時計誤差の変化率のランダムウォークの標準偏差[m/s^1.5]
+            sigma_pseudorange:  <float> 天頂方向の衛星の擬似距離の標準偏差[m]
+            datum:              <gnss.datum.x> 測地系モジュール
+            elevation_mask:     <float> 仰角マスク[rad]
+            weighting:          <str>   "elevation": 仰角に応じた重み付け, それ以外: 等重み
+        """
+        if model not in ("cv", "static"):
+            raise ValueError("modelには\"cv\"か\"static\"を指定してください。")
+        self._model = model
+        self._sigma_acceleration = sigma_acceleration
+        self._sigma_position = sigma_position
+        self._sigma_clock_drift = sigma_clock_drift
+        self._sigma_pseudorange = sigma_pseudorange
+        self._datum = datum
+        self._elevation_mask = elevation_mask
+        self._weighting = weighting
+        self._w_zenith = positioning._get_weight(np.array([np.pi / 2.0]), weighting)[0]   # 天頂方向の衛星の重み
+        if model == "cv":
+            self._n = 8
+            self._clock = 6                                     # 時計誤差の添え字
+        else:
+            self._n = 5
+            self._clock = 3
+        self._x = None                                          # 状態量
+        self._P = None                                          # 誤差共分散行列
+        self._matrix_cache = {}                                 # 時間間隔毎の状態遷移行列とプロセスノイズ
+
+    def _get_transition(self, dt):
+        """ 時間間隔dtにおける状態遷移行列とプロセスノイズの共分散行列を返す
+        一度計算したものは保持しておき、再利用します。
+        """
+        if dt in self._matrix_cache:
+            return self._matrix_cache[dt]
+        n = self._n
+        F = np.eye(n)
+        Q = np.zeros((n, n))
+        c = self._clock
+        F[c, c + 1] = dt                                        # 時計誤差 += 変化率 * dt
+        q = self._sigma_clock_drift ** 2
+        Q[c:c + 2, c:c + 2] = q * np.array([[dt ** 3 / 3.0, dt ** 2 / 2.0], [dt ** 2 / 2.0, dt]])
+        if self._model == "cv":
+            F[0:3, 3:6] = np.eye(3) * dt                        # 位置 += 速度 * dt
+            q = self._sigma_acceleration ** 2
+            Q[0:3, 0:3] = np.eye(3) * q * dt ** 3 / 3.0
+            Q[0:3, 3:6] = np.eye(3) * q * dt ** 2 / 2.0
+            Q[3:6, 0:3] = np.eye(3) * q * dt ** 2 / 2.0
+            Q[3:6, 3:6] = np.eye(3) * q * dt
+        else:
+            Q[0:3, 0:3] = np.eye(3) * self._sigma_position ** 2 * dt
+        self._matrix_cache[dt] = (F, Q)
+        return (F, Q)
+
+    def initialize(self, position, clock_bias, sigma_position=10.0, sigma_velocity=10.0, sigma_clock=10.0, sigma_clock_drift=100.0):
+        """ 状態量を初期化する
+        Argv:
+            position:          <ndarray> 受信機のECEF座標[m]
+            clock_bias:        <float>   受信機時計誤差[s]
+            sigma_position:    <float>   位置の初期標準偏差[m]
+            sigma_velocity:    <float>   速度の初期標準偏差[m/s]
+            sigma_clock:       <float>   時計誤差の初期標準偏差[m]
+            sigma_clock_drift: <float>   時計誤差の変化率の初期標準偏差[m/s]
+        """
+        c = self._clock
+        self._x = np.zeros(self._n)
+        self._x[0:3] = position
+        self._x[c] = clock_bias * self._datum.c
+        sigma = np.zeros(self._n)
+        sigma[0:3] = sigma_position
+        if self._model == "cv":
+            sigma[3:6] = sigma_velocity
+        sigma[c] = sigma_clock
+        sigma[c + 1] = sigma_clock_drift
+        self._P = np.diag(sigma ** 2)
+
+    def predict(self, dt):
+        """ 状態量をdt[s]だけ時間更新する
+        """
+        F, Q = self._get_transition(dt)
+        self._x = F @ self._x
+        self._P = F @ self._P @ F.T + Q
+
+    def update(self, sat_positions, pseudoranges, sat_clock_bias=None, dt=1.0):
+        """ 1エポック分の観測データを処理する
+        未初期化であれば、最小二乗法の解で初期化します。
+        Argv:
+            sat_positions:  <ndarray> 信号送信時刻における衛星のECEF座標[m], shape: (S, 3)
+            pseudoranges:   <ndarray> 擬似距離[m], shape: (S,), 観測していない衛星はNaN
+            sat_clock_bias: <ndarray> 衛星時計の誤差[s], shape: (S,), 省略時は0
+            dt:             <float>   前回のエポックからの経過時間[s]
+        Return:
+            <dict> "position", "velocity", "clock_bias", "clock_drift", "residual", "used"
+                   観測値が不足して観測更新できなかった場合は、時間更新のみの値を返します。
+        """
+        sat_positions = np.asarray(sat_positions, dtype=np.float64)
+        pseudoranges = np.asarray(pseudoranges, dtype=np.float64)
+        if sat_clock_bias is None:
+            sat_clock_bias = np.zeros(pseudoranges.shape)
+        corrected = pseudoranges + self._datum.c * np.asarray(sat_clock_bias, dtype=np.float64)
+        available = np.isfinite(corrected) & np.all(np.isfinite(sat_positions), axis=1)
+        residual = np.full(pseudoranges.shape, np.nan)
+        used = np.zeros(pseudoranges.shape, dtype=bool)
+
+        if not self.is_initialized:
+            sol = positioning.solve_spp(sat_positions, pseudoranges, sat_clock_bias, datum=self._datum,
+                elevation_mask=self._elevation_mask, weighting=self._weighting)
+            if sol["converged"]:
+                self.initialize(sol["position"], sol["clock_bias"])
+                return self._get_result(sol["residual"], sol["used"])
+            return self._get_result(residual, used)
+
+        self.predict(dt)
+        idx = np.nonzero(available)[0]
+        if len(idx) == 0:
+            return self._get_result(residual, used)
+        pos = self._x[0:3]
+        c = self._clock
+        sat = positioning._correct_sagnac(sat_positions[idx], pos, self._datum)
+        d = sat - pos
+        rho = np.linalg.norm(d, axis=1)
+        elevation, azimuth = positioning._get_elevation(sat, pos, self._datum)
+        ok = elevation >= self._elevation_mask
+        idx = idx[ok]
+        if len(idx) == 0:
+            return self._get_result(residual, used)
+        v = corrected[idx] - (rho[ok] + self._x[c])             # イノベーション
+        H = np.zeros((len(idx), self._n))                       # 観測行列
+        H[:, 0:3] = -d[ok] / rho[ok][:, np.newaxis]
+        H[:, c] = 1.0
+        R = np.diag(self._sigma_pseudorange ** 2 * self._w_zenith / positioning._get_weight(elevation[ok], self._weighting)) # 天頂方向の分散を基準とする
+        PHt = self._P @ H.T
+        S = H @ PHt + R
+        K = np.linalg.solve(S, PHt.T).T                         # カルマンゲイン. S は対称行列
+        self._x = self._x + K @ v
+        IKH = np.eye(self._n) - K @ H
+        self._P = IKH @ self._P @ IKH.T + K @ R @ K.T           # 数値的に安定なJoseph形式
+        residual[idx] = v - H @ (K @ v)
+        used[idx] = True
+        return self._get_result(residual, used)
+
+    def run(self, sat_positions, pseudoranges, sat_clock_bias=None, dt=1.0):
+        """ 複数エポックの観測データを順に処理する
+        Argv:
+            sat_positions:  <ndarray> 衛星のECEF座標[m], shape: (E, S, 3)
+            pseudoranges:   <ndarray> 擬似距離[m], shape: (E, S)
+            sat_clock_bias: <ndarray> 衛星時計の誤差[s], shape: (E, S), 省略時は0
+            dt:             <float>   エポック間隔[s]
+        Return:
+            <dict> update()の各要素を、先頭にエポックの次元を持つ配列にしたもの
+        Exception:
+            ValueError: エポック数が0の場合
+        """
+        pseudoranges = np.asarray(pseudoranges, dtype=np.float64)
+        if len(pseudoranges) == 0:
+            raise ValueError("観測データが1エポックもありません。")
+        if sat_clock_bias is None:
+            sat_clock_bias = np.zeros(pseudoranges.shape)
+        results = [self.update(sat_positions[k], pseudoranges[k], sat_clock_bias[k], dt) for k in range(len(pseudoranges))]
+        ans = {}
+        for key in results[0]:
+            ans[key] = np.array([mem[key] for mem in results])
+        return ans
+
+    def _get_result(self, residual, used):
+        """ 現在の推定値を辞書にして返す
+        """
+        return {"position": self.position, "velocity": self.velocity, "clock_bias": self.clock_bias,
+            "clock_drift": self.clock_drift, "residual": residual, "used": used}
+
+    # プロパティ
+    @property
+    def is_initialized(self):
+        """ 初期化済みかどうかを返す
+        """
+        return self._x is not None
+
+    @property
+    def position(self):
+        """ 受信機のECEF座標[m]を返す
+        """
+        if self._x is None:
+            return np.full(3, np.nan)
+        return self._x[0:3].copy()
+
+    @property
+    def velocity(self):
+        """ 受信機の速度(ECEF)[m/s]を返す
+        """
+        if self._x is None:
+            return np.full(3, np.nan)
+        if self._model == "cv":
+            return self._x[3:6].copy()
+        return np.zeros(3)
+
+    @property
+    def clock_bias(self):
+        """ 受信機時計誤差[s]を返す
+        """
+        if self._x is None:
+            return np.nan
+        return self._x[self._clock] / self._datum.c
+
+    @property
+    def clock_drift(self):
+        """ 受信機時計誤差の変化率[s/s]を返す
+        """
+        if self._x is None:
+            return np.nan
+        return self._x[self._clock + 1] / self._datum.c
+
+    @property
+    def covariance(self):
+        """ 誤差共分散行列を返す
+        """
+        if self._P is None:
+            return None
+        return self._P.copy()
+
+
+
+
+def main():
+    print("---self test---")
+    import time
+    import gnss.coordinate as coordinate
+    # 北へ10 m/sで移動する受信機の模擬観測データ
+    n_epoch = 600
+    start = np.array(coordinate.blh(wgs84, 32.8, 130.7, 50.0).to_ecef())
+    north = np.array([-np.sin(np.radians(32.8)) * np.cos(np.radians(130.7)), -np.sin(np.radians(32.8)) * np.sin(np.radians(130.7)), np.cos(np.radians(32.8))])
+    truth = start + np.arange(n_epoch)[:, np.newaxis] * 10.0 * north
+    direction = np.random.normal(0.0, 1.0, (8, 3)) + start / np.linalg.norm(start) * 1.5
+    direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+    sats = np.broadcast_to(start + direction * 2.02e7, (n_epoch, 8, 3))
+    rotated = positioning._correct_sagnac(sats, truth)
+    pr = np.linalg.norm(rotated - truth[:, np.newaxis, :], axis=2) + wgs84.c * 1.0e-4
+    pr += np.random.normal(0.0, 3.0, pr.shape)
+    t0 = time.time()
+    f = ekf("cv", sigma_acceleration=0.1)
+    result = f.run(sats, pr)
+    print("EKF: {0} epochs, {1:.2f} s".format(n_epoch, time.time() - t0))
+    ls = positioning.solve_spp(sats, pr)
+    print("rms error EKF: {0:.2f} m, LS: {1:.2f} m".format(
+        np.sqrt(np.mean(np.sum((result["position"][10:] - truth[10:]) ** 2, axis=1))),
+        np.sqrt(np.mean(np.sum((ls["position"][10:] - truth[10:]) ** 2, axis=1)))))
+    print("velocity: {0}".format(result["velocity"][-1]))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,81 +1,317 @@
 #!/usr/bin/env python3
 # -*- coding:utf-8 -*-
-import coordinate
-import numpy as np
-import datum.WGS84 as wgs84
+#-------------------------------------------------------------------------------
+# Name:        positioning
+# Purpose:  測位計算に関する処理を提供する。
+#
+# Author:      morishita
+#
+# Copyright:   (c) morishita 2014
+# Licence:     MIT
+# Histroy:
+#           2026-10-19   ECEF座標系で重み付き最小二乗法による単独測位を行うsolve_spp()を追加
+#                        モジュールのインポートをパッケージ形式に変更
+#                        複数エポックの正規方程式をまとめて解くsolve_least_squares_batch()を追加し、solve_spp()で利用
+#                        hoge()で非推奨のnp.matrixを使わないように変更
+#                        多数の地点と時刻のDOPをまとめて計算するdop_grid()を追加
+#                        dop()で非推奨のnp.matrixを使わないように変更
+#                        solve_spp()で大気遅延モデル（gnss.atmosphere）による補正を行えるようにした
+#-------------------------------------------------------------------------------
 import math
+import numpy as np
+import gnss.coordinate as coordinate
+import gnss.datum.WGS84 as wgs84
 
 def dop(star_positions, receiver_position):
 	""" 幾何情報から、測位精度指標DOPを計算する
+	多数の地点や時刻についてまとめて計算する場合は、dop_grid()を利用してください。
 	"""
-	r = []
-	for position in star_positions:
-		_r = position.distance(receiver_position)
-		r.append(_r)
-
 	# デザイン行列（幾何行列）作成
-	G = []
-	for i in range(len(star_positions)):
-		_r = r[i]
-		_p = star_positions[i]
-		row = [-(_p.e - receiver_position.e) / _r, \
-		       -(_p.n - receiver_position.n) / _r, \
-		       -(_p.u - receiver_position.u) / _r]
-		G.append(row)
-	G = np.matrix(G)
+	p = np.array([[_p.e, _p.n, _p.u] for _p in star_positions])
+	d = p - np.array([receiver_position.e, receiver_position.n, receiver_position.u])
+	G = -d / np.linalg.norm(d, axis=1)[:, np.newaxis]
 
 	# DOPの計算
-	C = (G.T * G).I
-	C = C.tolist()
-	#print(C)
-	PDOP = math.sqrt(C[0][0] + C[1][1] + C[2][2])
-	HDOP = math.sqrt(C[0][0] + C[1][1])
-	VDOP = math.sqrt(C[2][2])
+	C = np.linalg.inv(G.T @ G)
+	PDOP = math.sqrt(C[0, 0] + C[1, 1] + C[2, 2])
+	HDOP = math.sqrt(C[0, 0] + C[1, 1])
+	VDOP = math.sqrt(C[2, 2])
 	return {"PDOP":PDOP, "HDOP":HDOP, "VDOP":VDOP}
 
+def dop_grid(sat_positions, sites, mask=None, elevation_mask=0.0, datum=wgs84, chunk_size=None):
+	""" 多数の地点・時刻におけるDOPをまとめて計算する
+	受信機時計誤差を未知数に含めた4元の幾何行列を地点毎の局地座標系(ENU)で作成して計算します。
+	可視衛星が4機未満であったり、衛星配置が縮退している場合のDOPはNaNとなります。
+	maskで衛星を選ぶと、例えばGPSのみとGPS+QZSの比較ができます。
+	Argv:
+		sat_positions:  <ndarray> 衛星のECEF座標[m], shape: (T, S, 3), 存在しない衛星はNaN
+		sites:          <ndarray> 地点のECEF座標[m], shape: (N, 3)
+		mask:           <ndarray> 利用する衛星をTrueとしたマスク, shape: (T, S) or (S,), 省略時は全て利用
+		elevation_mask: <float>   仰角マスク[rad]
+		datum:          <gnss.datum.x> 測地系モジュール
+		chunk_size:     <int>     一度に処理する地点数. 省略時はメモリ使用量が数十MB程度になるように決めます。
+	Return:
+		<dict<ndarray>> {"GDOP", "PDOP", "HDOP", "VDOP", "TDOP"}, 各shape: (N, T)
+	"""
+	sat_positions = np.asarray(sat_positions, dtype=np.float64)
+	sites = np.atleast_2d(np.asarray(sites, dtype=np.float64))
+	n_time, n_sat = sat_positions.shape[:2]
+	n_site = len(sites)
+	available = np.all(np.isfinite(sat_positions), axis=2)
+	if mask is not None:
+		available &= np.broadcast_to(np.asarray(mask, dtype=bool), available.shape)
+	sat_positions = np.where(available[..., np.newaxis], sat_positions, 0.0)
+	if chunk_size is None:
+		chunk_size = max(1, 1000000 // max(1, n_time * n_sat))
+
+	lat, lon = _get_lat_lon(sites, datum)
+	sB, cB, sL, cL = np.sin(lat), np.cos(lat), np.sin(lon), np.cos(lon)
+	R = np.empty((n_site, 3, 3))                            # ECEF -> ENU の回転行列
+	R[:, 0] = np.stack([-sL, cL, np.zeros(n_site)], axis=1)
+	R[:, 1] = np.stack([-cL * sB, -sL * sB, cB], axis=1)
+	R[:, 2] = np.stack([cL * cB, sL * cB, sB], axis=1)
+
+	ans = {}
+	for key in ("GDOP", "PDOP", "HDOP", "VDOP", "TDOP"):
+		ans[key] = np.full((n_site, n_time), np.nan)
+	for k in range(0, n_site, chunk_size):
+		_R = R[k:k + chunk_size]
+		d = sat_positions[np.newaxis] - sites[k:k + chunk_size, np.newaxis, np.newaxis, :]
+		enu = np.einsum("cij,ctsj->ctsi", _R, d)
+		rho = np.linalg.norm(enu, axis=3)
+		elevation = np.arctan2(enu[..., 2], np.hypot(enu[..., 0], enu[..., 1]))
+		use = available[np.newaxis] & (elevation >= elevation_mask)
+		G = np.empty(enu.shape[:3] + (4,))
+		G[..., :3] = -enu / np.where(rho > 0.0, rho, 1.0)[..., np.newaxis]
+		G[..., 3] = 1.0
+		N = np.einsum("ctsi,cts,ctsj->ctij", G, use.astype(np.float64), G)
+		ok = np.count_nonzero(use, axis=2) >= 4
+		ok &= np.abs(np.linalg.det(N)) > 1.0e-12 * np.max(np.abs(N), axis=(2, 3)) ** 4
+		N[~ok] = np.eye(4)                                  # 計算できない組み合わせは単位行列に置き換えてから一括で逆行列を求める
+		C = np.linalg.inv(N)
+		c = np.where(ok[..., np.newaxis], np.diagonal(C, axis1=2, axis2=3), np.nan)
+		ans["GDOP"][k:k + chunk_size] = np.sqrt(np.sum(c, axis=2))
+		ans["PDOP"][k:k + chunk_size] = np.sqrt(c[..., 0] + c[..., 1] + c[..., 2])
+		ans["HDOP"][k:k + chunk_size] = np.sqrt(c[..., 0] + c[..., 1])
+		ans["VDOP"][k:k + chunk_size] = np.sqrt(c[..., 2])
+		ans["TDOP"][k:k + chunk_size] = np.sqrt(c[..., 3])
+	return ans
+
 def hoge(star_positions, receiver_position, measured_distances, weight=None):
 	""" 測位計算を行う
+	Return:
+		<ndarray> 座標の修正量 (e, n, u)
 	"""
 	# 重み行列の調整
-	if weight == None:
-		weight =  np.eye(len(star_positions))
-		weight = np.matrix(weight)
-	#print(type(weight))
-
-	# 適当な初期座標からの距離
-	r = []
-	for position in star_positions:
-		_r = position.distance(receiver_position)
-		r.append(_r)
-	#print("r")
-	#print(r)
+	if weight is None:
+		weight = np.eye(len(star_positions))
+	weight = np.asarray(weight, dtype=np.float64)
 
-	# 観測された距離との差分を求める
-	delta_r = []	
-	for i in range(len(r)):
-		_r0 = r[i]
-		_r1 = measured_distances[i]
-		delta_r.append(_r1 - _r0)
-	#print("delta r")
-	#print(delta_r)
+	# 適当な初期座標からの距離と、デザイン行列（幾何行列）
+	p = np.array([[_p.e, _p.n, _p.u] for _p in star_positions])
+	d = p - np.array([receiver_position.e, receiver_position.n, receiver_position.u])
+	r = np.linalg.norm(d, axis=1)
+	G = -d / r[:, np.newaxis]
 
-	# デザイン行列（幾何行列）作成
-	G = []
-	for i in range(len(star_positions)):
-		_r = r[i]
-		_p = star_positions[i]
-		row = [-(_p.e - receiver_position.e) / _r, \
-		       -(_p.n - receiver_position.n) / _r, \
-		       -(_p.u - receiver_position.u) / _r]
-		G.append(row)
-	G = np.matrix(G)
+	# 観測された距離との差分を求める
+	delta_r = np.asarray(measured_distances, dtype=np.float64) - r
 
 	# 座標の修正量を求める
-	dr = np.array(delta_r)
-	x = np.dot((G.T * weight * G).I * G.T * weight, dr)
+	x = np.linalg.solve(G.T @ weight @ G, G.T @ weight @ delta_r)
 	return x
 
 
+def _get_lat_lon(positions, datum=wgs84):
+	""" ECEF座標から緯度[rad]と経度[rad]を配列で返す
+	Argv:
+		positions: <ndarray> ECEF座標, shape: (..., 3)
+	"""
+	x = positions[..., 0]
+	y = positions[..., 1]
+	z = positions[..., 2]
+	p = np.hypot(x, y)
+	h = datum.a ** 2.0 - datum.b ** 2.0
+	t = np.arctan2(z * datum.a, p * datum.b)
+	lat = np.arctan2(z + h / datum.b * np.sin(t) ** 3.0, p - h / datum.a * np.cos(t) ** 3.0)
+	lon = np.arctan2(y, x)
+	return (lat, lon)
+
+def _get_elevation(sat_positions, receiver_position, datum=wgs84):
+	""" 受信機から見た衛星の仰角[rad]と方位角[rad]を配列で返す
+	Argv:
+		sat_positions:     <ndarray> 衛星のECEF座標, shape: (..., S, 3)
+		receiver_position: <ndarray> 受信機のECEF座標, shape: (..., 3)
+		datum:             <gnss.datum.x> 測地系モジュール
+	Return:
+		<tuple<ndarray>> (仰角, 方位角), shape: (..., S)
+	"""
+	receiver_position = np.asarray(receiver_position, dtype=np.float64)
+	lat, lon = _get_lat_lon(receiver_position, datum)
+	sB = np.sin(lat)[..., np.newaxis]
+	cB = np.cos(lat)[..., np.newaxis]
+	sL = np.sin(lon)[..., np.newaxis]
+	cL = np.cos(lon)[..., np.newaxis]
+	d = sat_positions - receiver_position[..., np.newaxis, :]
+	e = -d[..., 0] * sL + d[..., 1] * cL
+	n = -d[..., 0] * cL * sB - d[..., 1] * sL * sB + d[..., 2] * cB
+	u = d[..., 0] * cL * cB + d[..., 1] * sL * cB + d[..., 2] * sB
+	elevation = np.arctan2(u, np.hypot(e, n))
+	azimuth = np.arctan2(e, n) % (2.0 * np.pi)
+	return (elevation, azimuth)
+
+def _correct_sagnac(sat_positions, receiver_position, datum=wgs84):
+	""" 信号伝搬中の地球の自転を考慮して、衛星座標を受信時刻のECEF座標系へ回転させる
+	Argv:
+		sat_positions:     <ndarray> 送信時刻における衛星のECEF座標, shape: (..., S, 3)
+		receiver_position: <ndarray> 受信機のECEF座標, shape: (..., 3)
+	Return:
+		<ndarray> 回転後の衛星座標, shape: (..., S, 3)
+	"""
+	rho = np.linalg.norm(sat_positions - receiver_position[..., np.newaxis, :], axis=-1)
+	theta = datum.omega_e * rho / datum.c                  # 伝搬時間中の地球の回転角
+	c = np.cos(theta)
+	s = np.sin(theta)
+	ans = np.empty_like(sat_positions)
+	ans[..., 0] = c * sat_positions[..., 0] + s * sat_positions[..., 1]
+	ans[..., 1] = -s * sat_positions[..., 0] + c * sat_positions[..., 1]
+	ans[..., 2] = sat_positions[..., 2]
+	return ans
+
+def _get_weight(elevation, weighting):
+	""" 仰角に応じた観測値の重みを返す
+	分散のモデルは sigma^2 = a^2 + b^2 / sin(el)^2 (a = b = 0.3 m) です。
+	"""
+	if weighting == "elevation":
+		sin_el = np.maximum(np.sin(elevation), 0.05)        # 地平線付近で重みが0にならないように下限を設ける
+		return 1.0 / (0.09 + 0.09 / sin_el ** 2)
+	return np.ones_like(elevation)
+
+def solve_least_squares_batch(G, v, weight=None, mask=None):
+	""" 複数エポックの重み付き最小二乗問題をまとめて解く
+	エポック毎に衛星数が異なる場合は、maskで利用する観測値を指定してください。
+	観測値が未知数より少ないエポックや、衛星配置が縮退しているエポックの解はNaNとなります。
+	Argv:
+		G:      <ndarray> デザイン行列, shape: (E, S, M)
+		v:      <ndarray> 残差ベクトル, shape: (E, S)
+		weight: <ndarray> 観測値の重み, shape: (E, S), 省略時は等重み
+		mask:   <ndarray> 利用する観測値をTrueとしたマスク, shape: (E, S), 省略時は全て利用
+	Return:
+		<tuple<ndarray>> (解, shape: (E, M), 解けたかどうか, shape: (E,))
+	"""
+	G = np.asarray(G, dtype=np.float64)
+	v = np.asarray(v, dtype=np.float64)
+	n_epoch, n_sat, n_unknown = G.shape
+	if weight is None:
+		weight = np.ones((n_epoch, n_sat))
+	if mask is None:
+		mask = np.ones((n_epoch, n_sat), dtype=bool)
+	w = np.where(mask, weight, 0.0)                         # 利用しない観測値は重みを0にする
+	v = np.where(mask, v, 0.0)
+	G = np.where(mask[..., np.newaxis], G, 0.0)
+	N = np.einsum("esi,es,esj->eij", G, w, G)               # 正規方程式の係数行列
+	b = np.einsum("esi,es,es->ei", G, w, v)
+	# 縮退の判定. 行列式を係数行列の大きさで正規化して閾値と比較する
+	ok = (np.count_nonzero(mask, axis=1) >= n_unknown)
+	ok &= np.abs(np.linalg.det(N)) > 1.0e-12 * np.max(np.abs(N), axis=(1, 2)) ** n_unknown
+	N[~ok] = np.eye(n_unknown)                              # 解けないエポックは単位行列に置き換えてから一括で解く
+	b[~ok] = 0.0
+	x = np.linalg.solve(N, b[..., np.newaxis])[..., 0]
+	x[~ok] = np.nan
+	return (x, ok)
+
+def solve_spp(sat_positions, pseudoranges, sat_clock_bias=None, initial_position=None, datum=wgs84,
+		elevation_mask=0.0, weighting="elevation", max_iteration=10, tolerance=1.0e-4, delay_model=None):
+	""" 擬似距離を用いた単独測位を行う
+	ECEF座標系で受信機座標と受信機時計誤差を未知数とした反復重み付き最小二乗法で解きます。
+	地球の自転による補正（サニャック効果）と衛星時計の補正を行います。
+	複数のエポックをまとめて渡すと、全エポックの正規方程式を一括で解きます。
+	観測していない衛星の擬似距離はNaNとしてください。
+	Argv:
+		sat_positions:    <ndarray> 信号送信時刻における衛星のECEF座標[m], shape: (S, 3) or (E, S, 3)
+		pseudoranges:     <ndarray> 擬似距離[m], shape: (S,) or (E, S)
+		sat_clock_bias:   <ndarray> 衛星時計の誤差[s], shape: (S,) or (E, S), 省略時は0
+		initial_position: <ndarray> 受信機座標の初期値(ECEF)[m], shape: (3,) or (E, 3), 省略時は地球の中心
+		datum:            <gnss.datum.x> 測地系モジュール
+		elevation_mask:   <float>   仰角マスク[rad]
+		weighting:        <str>     "elevation": 仰角に応じた重み付け, それ以外: 等重み
+		max_iteration:    <int>     最大の反復回数
+		tolerance:        <float>   収束判定に用いる座標の修正量[m]
+		delay_model:      <callable> 大気遅延量[m]を返すモデル, e.g. gnss.atmosphere.delay_model
+		                  delay_model(緯度, 経度, 楕円体高, 仰角, 方位角, エポックの番号)の形式で呼び出します。
+	Return:
+		<dict> 各要素は先頭にエポックの次元を持ちます（1エポックのみの場合は持ちません）。
+			"position":   受信機のECEF座標[m], shape: (E, 3)
+			"clock_bias": 受信機時計誤差[s], shape: (E,)
+			"residual":   擬似距離の残差[m], shape: (E, S), 利用しなかった衛星はNaN
+			"used":       測位に利用した衛星, shape: (E, S)
+			"iteration":  反復回数, shape: (E,)
+			"converged":  収束したかどうか, shape: (E,), 収束しなかったエポックの座標はNaN
+	"""
+	sat_positions = np.asarray(sat_positions, dtype=np.float64)
+	pseudoranges = np.asarray(pseudoranges, dtype=np.float64)
+	single = pseudoranges.ndim == 1
+	if single:                                              # 1エポックのみでも、複数エポックとして処理する
+		sat_positions = sat_positions[np.newaxis]
+		pseudoranges = pseudoranges[np.newaxis]
+	if sat_clock_bias is None:
+		sat_clock_bias = np.zeros(pseudoranges.shape)
+	sat_clock_bias = np.broadcast_to(np.asarray(sat_clock_bias, dtype=np.float64), pseudoranges.shape)
+	corrected = pseudoranges + datum.c * sat_clock_bias       # 衛星時計の補正
+	available = np.isfinite(corrected) & np.all(np.isfinite(sat_positions), axis=2)
+	corrected = np.where(available, corrected, 0.0)
+	sat_positions = np.where(available[..., np.newaxis], sat_positions, 0.0)
+	n_epoch, n_sat = pseudoranges.shape
+
+	x = np.zeros((n_epoch, 4))
+	if initial_position is not None:
+		x[:, :3] = initial_position
+	residual = np.full((n_epoch, n_sat), np.nan)
+	used = np.zeros((n_epoch, n_sat), dtype=bool)
+	iteration = np.zeros(n_epoch, dtype=int)
+	converged = np.zeros(n_epoch, dtype=bool)
+	active = np.count_nonzero(available, axis=1) >= 4       # 未知数が4つなので、最低4衛星必要
+	for i in range(max_iteration):
+		idx = np.nonzero(active)[0]                         # 収束したエポックは計算しない
+		if len(idx) == 0:
+			break
+		_x = x[idx]
+		sat = _correct_sagnac(sat_positions[idx], _x[:, :3], datum)
+		d = sat - _x[:, np.newaxis, :3]
+		rho = np.linalg.norm(d, axis=2)
+		elevation, azimuth = _get_elevation(sat, _x[:, :3], datum)
+		near = np.linalg.norm(_x[:, :3], axis=1) > datum.b * 0.5   # 受信機位置がある程度定まってから仰角を利用する
+		_used = available[idx] & ((elevation >= elevation_mask) | ~near[:, np.newaxis])
+		w = np.where(near[:, np.newaxis], _get_weight(elevation, weighting), 1.0)
+		v = corrected[idx] - (rho + _x[:, 3:4])             # 残差
+		if delay_model is not None and np.any(near):        # 大気遅延の補正
+			lat, lon = _get_lat_lon(_x[:, :3], datum)
+			height = np.hypot(_x[:, 0], _x[:, 1]) / np.cos(lat) - datum.a / np.sqrt(1.0 - datum.E2 * np.sin(lat) ** 2)
+			delay = delay_model(lat, lon, height, elevation, azimuth, idx)
+			v -= np.where(near[:, np.newaxis], np.nan_to_num(delay), 0.0)
+		G = np.empty(d.shape[:2] + (4,))                    # デザイン行列
+		G[..., :3] = -d / np.where(rho > 0.0, rho, 1.0)[..., np.newaxis]
+		G[..., 3] = 1.0
+		dx, ok = solve_least_squares_batch(G, v, w, _used)
+		iteration[idx] = i + 1
+		active[idx[~ok]] = False                            # 解けないエポックは打ち切る
+		x[idx[ok]] += dx[ok]
+		done = ok & (np.linalg.norm(np.where(ok[:, np.newaxis], dx[:, :3], 0.0), axis=1) < tolerance)
+		_v = v - np.einsum("esi,ei->es", G, np.where(ok[:, np.newaxis], dx, 0.0))
+		residual[idx[done]] = np.where(_used[done], _v[done], np.nan)
+		used[idx[done]] = _used[done]
+		converged[idx[done]] = True
+		active[idx[done]] = False
+
+	position = np.where(converged[:, np.newaxis], x[:, :3], np.nan)
+	clock = np.where(converged, x[:, 3] / datum.c, np.nan)
+	ans = {"position": position, "clock_bias": clock, "residual": residual,
+		"used": used, "iteration": iteration, "converged": converged}
+	if single:
+		for key in ans:
+			ans[key] = ans[key][0]
+	return ans
+
+
 def main():
 	""" self test
 	"""
@@ -88,8 +324,6 @@ def main():
 	for i in range(10):
 		#print(i)
 		fuga = hoge([a, b, c, d], user, distance)
-		fuga = fuga.tolist()
-		fuga = fuga[0]
 		user.e += fuga[0]
 		user.n += fuga[1]
 		user.u += fuga[2]
@@ -98,5 +332,31 @@ def main():
 	_dop = dop([a, b, c, d], user)
 	print(_dop)
 
+	# 模擬観測データを用いた単独測位
+	receiver = coordinate.blh(wgs84, 32.8, 130.7, 50.0).to_ecef()
+	receiver = np.array([receiver.x, receiver.y, receiver.z])
+	n_epoch = 3600
+	direction = np.random.normal(0.0, 1.0, (8, 3))
+	direction[:, :] += receiver / np.linalg.norm(receiver) * 1.5     # 上空の衛星になるように偏らせる
+	direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+	sats = np.broadcast_to(receiver + direction * 2.02e7, (n_epoch, 8, 3))
+	sat_clock = np.random.normal(0.0, 1.0e-4, (n_epoch, 8))
+	rotated = _correct_sagnac(sats, np.broadcast_to(receiver, (n_epoch, 3)))
+	pr = np.linalg.norm(rotated - receiver, axis=2) + wgs84.c * 1.0e-3 - wgs84.c * sat_clock
+	pr += np.random.normal(0.0, 1.0, pr.shape)
+	pr[::10, 0] = np.nan                                            # 欠測
+	import time
+	t0 = time.time()
+	result = solve_spp(sats, pr, sat_clock)
+	print("SPP: {0} epochs, {1:.2f} s".format(n_epoch, time.time() - t0))
+	print("mean error: {0} m".format(np.nanmean(result["position"], axis=0) - receiver))
+
+	# 地点と時刻を格子状にしたDOPの計算
+	lat, lon = np.meshgrid(np.linspace(20.0, 45.0, 26), np.linspace(120.0, 150.0, 31))
+	sites = np.array([coordinate.blh(wgs84, B, L, 0.0).to_ecef() for B, L in zip(lat.ravel(), lon.ravel())])
+	t0 = time.time()
+	_dop = dop_grid(sats[:60], sites, elevation_mask=math.radians(10.0))
+	print("DOP grid: {0} sites x {1} epochs, {2:.2f} s, median PDOP: {3:.2f}".format(len(sites), 60, time.time() - t0, np.nanmedian(_dop["PDOP"])))
+
 if __name__ == '__main__':
     main()
\ No newline at end of file
@@ -13,6 +13,8 @@
 #                        readerクラスの初期化部分において、放送歴の拡張子部分だけ変更した。
 #                        [課題] 衛星名とPRN番号の割り当てを変える必要がある・・・かも。
 #                               ただし、衛星入れ替わりとともに衛星名とPRNの組み合わせが変わるようだと使いにくい。
+#           2026-10-19   ヘッダの電離層補正係数として"QZSA"/"QZSB"の行を読み込むようにした。
+#           2026-10-19   calc_sat_position()でgnss.timescale.gnss_timeを受け付けるようにした。
 #-------------------------------------------------------------------------------
 
 import os
@@ -25,6 +27,7 @@ import gnss.qzs.time as qtime
 import gnss.datum.GRS80 as grs80
 import gnss.qzs.coordinate as qcoor
 import gnss.ephemeris as gnss_eph
+import gnss.timescale as timescale
 
 time_system = qtime
 datum = grs80
@@ -107,7 +110,7 @@ class ephemeris(gnss_eph.ephemeris):
         """ 指定エポックにおける衛星の座標を返す
         計算方法はICD-200Dを参照されたし。
         Argv:
-            epoch (GPS time)  <datetime.datetime> or <int> or <float>
+            epoch (GPS time)  <datetime.datetime> or <int> or <float> or <gnss.timescale.gnss_time>
                               UTCだと、厳密な変換（をコードの整合性と利便性を保ちつつ実装するの）が面倒.
                               ただし、うるう秒+UTCと単純な変換であっても衛星位置座標の誤差は0.04 mm以下。
                               気にしなければ気にならない。
@@ -119,14 +122,19 @@ class ephemeris(gnss_eph.ephemeris):
         if self.is_available == False:
             return None
         # 引数をGPS時刻になおす
-        if isinstance(epoch, datetime.datetime):
+        if isinstance(epoch, timescale.gnss_time):
+            gpst = None
+        elif isinstance(epoch, datetime.datetime):
             gpst = (epoch - time_system.epoch_origin).total_seconds()
         elif isinstance(epoch, float) or isinstance(epoch, int):
             gpst = epoch
         else:
             return None
         #　計算開始
-        tdiff = gpst - (self.gps_week * timeKM.TIME_A_WEEK + self.TOE)  # GPS時刻同士の引き算で時間差を計算
+        if gpst is None:
+            tdiff = epoch.get_seconds_from(self.gps_week, self.TOE)     # ナノ秒単位の整数同士で差を取るので桁落ちしない
+        else:
+            tdiff = gpst - (self.gps_week * timeKM.TIME_A_WEEK + self.TOE)  # GPS時刻同士の引き算で時間差を計算
         #print(tdiff)
         n0 = math.sqrt(datum.GM) / (self.SQRT_A ** 3)                   # 衛星の平均的な角速度
         M = self.M0 + (n0 + self.delta_N) * tdiff                       # 平均近点角
@@ -189,7 +197,7 @@ class reader(gnss_eph.reader):
     def __init__(self):
         """
         """
-        gnss_eph.reader.__init__(self, "\.\d{2}[q]", eph_pattern, ephemeris) 
+        gnss_eph.reader.__init__(self, "\.\d{2}[q]", eph_pattern, ephemeris, "QZS")
     def read_ephemeris_from_txt(self, txt):
         """ テキストから読み出したエフェメリスをリストで返す
         Argv:
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        raim
+# Purpose:  受信機における測位の完全性監視(RAIM)と、故障衛星の検出・除外(FDE)を提供する。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        重み付き残差二乗和(WSSE)をカイ二乗検定して故障を検出します。
+#              衛星を1機除いた場合の残差二乗和・解・正規行列の逆行列は、
+#              正規行列のランク1更新（Sherman-Morrisonの公式）で求めるので、衛星の組み合わせ毎に解き直す必要はありません。
+#                WSSE_i = WSSE - w_i * v_i^2 / (1 - h_i),  h_i = w_i * g_i^T N^-1 g_i
+#              保護レベルはWalter & Enge(1995)のスロープを用いて
+#                PL = max_i(slope_i) * (sqrt(T) + K_md)
+#              としています。sqrt(T) + K_mdは非心カイ二乗分布から求まる値の近似です。
+# Histroy:
+#           2026-10-19   作成
+#-------------------------------------------------------------------------------
+
+import math
+import statistics
+import numpy as np
+import gnss.datum.WGS84 as wgs84
+import gnss.positioning as positioning
+
+_threshold_cache = {}
+
+
+def _regularized_gamma(a, x):
+    """ 正規化された下側不完全ガンマ関数P(a, x)を返す
+    ref: Numerical Recipes 6.2
+    """
+    if x <= 0.0:
+        return 0.0
+    if x < a + 1.0:                                         # 級数展開
+        term = 1.0 / a
+        total = term
+        n = a
+        for i in range(500):
+            n += 1.0
+            term *= x / n
+            total += term
+            if abs(term) < abs(total) * 1.0e-15:
+                break
+        return total * math.exp(-x + a * math.log(x) - math.lgamma(a))
+    b = x + 1.0 - a                                         # 連分数展開
+    c = 1.0 / 1.0e-300
+    d = 1.0 / b
+    h = d
+    for i in range(1, 500):
+        an = -i * (i - a)
+        b += 2.0
+        d = an * d + b
+        if abs(d) < 1.0e-300:
+            d = 1.0e-300
+        c = b + an / c
+        if abs(c) < 1.0e-300:
+            c = 1.0e-300
+        d = 1.0 / d
+        delta = d * c
+        h *= delta
+        if abs(delta - 1.0) < 1.0e-15:
+            break
+    return 1.0 - math.exp(-x + a * math.log(x) - math.lgamma(a)) * h
+
+def chi2_threshold(dof, p_fa):
+    """ 自由度dofのカイ二乗分布において、上側確率がp_faとなる値を返す
+    一度求めた値は保持しておき、再利用します。
+    Argv:
+        dof:  <int>   自由度
+        p_fa: <float> 誤警報確率
+    """
+    key = (int(dof), p_fa)
+    if key in _threshold_cache:
+        return _threshold_cache[key]
+    a = dof / 2.0
+    lower = 0.0
+    upper = max(1.0, dof) * 10.0
+    while 1.0 - _regularized_gamma(a, upper / 2.0) > p_fa:  # 上限を広げる
+        upper *= 2.0
+    for i in range(200):                                    # 二分法
+        middle = (lower + upper) / 2.0
+        if 1.0 - _regularized_gamma(a, middle / 2.0) > p_fa:
+            lower = middle
+        else:
+            upper = middle
+        if upper - lower < 1.0e-10 * upper:
+            break
+    _threshold_cache[key] = (lower + upper) / 2.0
+    return _threshold_cache[key]
+
+def fde(G, v, weight, mask, rotation=None, p_fa=1.0e-5, p_md=1.0e-3, max_exclusion=1):
+    """ 線形化された観測方程式に対して故障の検出と除外を行う
+    複数エポックをまとめて処理します。
+    Argv:
+        G:             <ndarray> デザイン行列, shape: (E, S, 4), 列の並びは(X, Y, Z, 時計誤差)
+        v:             <ndarray> 最小二乗解における残差[m], shape: (E, S)
+        weight:        <ndarray> 観測値の重み[1/m^2], shape: (E, S)
+        mask:          <ndarray> 測位に利用した観測値, shape: (E, S)
+        rotation:      <ndarray> ECEFからENUへの回転行列, shape: (E, 3, 3), 省略時は保護レベルをECEFのXY/Zで評価
+        p_fa:          <float>   誤警報確率
+        p_md:          <float>   検出失敗確率
+        max_exclusion: <int>     1エポックで除外する衛星の最大数
+    Return:
+        <dict>
+            "test_statistic": 除外前の重み付き残差二乗和, shape: (E,)
+            "threshold":      除外前の検定の閾値, shape: (E,)
+            "fault":          除外前に故障を検出したかどうか, shape: (E,)
+            "excluded":       除外した観測値, shape: (E, S)
+            "correction":     除外による解の修正量, shape: (E, 4)
+            "valid":          除外後に検定を通過したかどうか, shape: (E,)
+            "HPL":            水平保護レベル[m], shape: (E,)
+            "VPL":            垂直保護レベル[m], shape: (E,)
+            保護レベルは除外後の衛星配置で計算します。検定できないエポックはNaNとなります。
+    """
+    G = np.where(mask[..., np.newaxis], G, 0.0)
+    w = np.where(mask, weight, 0.0)
+    v = np.where(mask, v, 0.0)
+    n_epoch, n_sat = v.shape
+    mask = mask.copy()
+    k_md = statistics.NormalDist().inv_cdf(1.0 - p_md)
+
+    N = np.einsum("esi,es,esj->eij", G, w, G)
+    count = np.count_nonzero(mask, axis=1)
+    ok = count >= 4
+    N[~ok] = np.eye(4)
+    Ninv = np.linalg.inv(N)
+    correction = np.zeros((n_epoch, 4))
+    excluded = np.zeros((n_epoch, n_sat), dtype=bool)
+
+    def test(v, w, mask):
+        """ 現在の状態で検定を行う """
+        dof = np.count_nonzero(mask, axis=1) - 4
+        wsse = np.sum(w * v ** 2, axis=1)
+        threshold = np.array([chi2_threshold(k, p_fa) if k > 0 else np.nan for k in dof])
+        return (wsse, threshold, dof)
+
+    wsse, threshold, dof = test(v, w, mask)
+    fault = (dof > 0) & ok & (wsse > threshold)
+    statistic0 = np.where(ok & (dof > 0), wsse, np.nan)
+    threshold0 = threshold.copy()
+    for k in range(max_exclusion):
+        target = fault if k == 0 else (~valid & (dof > 1))
+        target &= ok
+        if not np.any(target):
+            break
+        h = w * np.einsum("esi,eij,esj->es", G, Ninv, G)   # 各観測値のてこ比
+        redundancy = np.where(mask, 1.0 - h, 1.0)
+        t = np.where(mask & (redundancy > 1.0e-9), w * v ** 2 / np.where(redundancy > 1.0e-9, redundancy, 1.0), -1.0)
+        i = np.argmax(t, axis=1)                            # 除外によって残差二乗和が最も小さくなる衛星
+        e = np.nonzero(target)[0]
+        i = i[e]
+        g = G[e, i]
+        Ng = np.einsum("eij,ej->ei", Ninv[e], g)
+        r = redundancy[e, i]
+        dx = -Ng * (w[e, i] * v[e, i] / r)[:, np.newaxis]  # 除外後の解の修正量
+        Ninv[e] += np.einsum("ei,ej->eij", Ng, Ng) * (w[e, i] / r)[:, np.newaxis, np.newaxis]   # ランク1更新
+        correction[e] += dx
+        v[e] -= np.einsum("esi,ei->es", G[e], dx)
+        mask[e, i] = False
+        w[e, i] = 0.0
+        v[e, i] = 0.0
+        G[e, i] = 0.0
+        excluded[e, i] = True
+        wsse, threshold, dof = test(v, w, mask)
+        valid = (dof > 0) & (wsse <= threshold)
+    wsse, threshold, dof = test(v, w, mask)
+    valid = ok & (dof > 0) & (wsse <= threshold)
+
+    # 保護レベル
+    S = np.einsum("eij,esj,es->eis", Ninv, G, w)            # 観測値から解への写像, shape: (E, 4, S)
+    Sp = S[:, :3]
+    if rotation is not None:
+        Sp = np.einsum("eij,ejs->eis", rotation, Sp)
+    h = w * np.einsum("esi,eij,esj->es", G, Ninv, G)
+    denominator = np.sqrt(np.where(mask & (1.0 - h > 1.0e-9), w * (1.0 - h), np.inf))
+    hslope = np.hypot(Sp[:, 0], Sp[:, 1]) / denominator
+    vslope = np.abs(Sp[:, 2]) / denominator
+    pbias = np.sqrt(threshold) + k_md
+    HPL = np.where(ok & (dof > 0), np.max(hslope, axis=1) * pbias, np.nan)
+    VPL = np.where(ok & (dof > 0), np.max(vslope, axis=1) * pbias, np.nan)
+    return {"test_statistic": statistic0, "threshold": threshold0, "fault": fault, "excluded": excluded,
+        "correction": correction, "valid": valid, "HPL": HPL, "VPL": VPL}
+
+def raim(sat_positions, pseudoranges, sat_clock_bias=None, datum=wgs84, elevation_mask=0.0,
+        weighting="elevation", sigma=1.0, p_fa=1.0e-5, p_md=1.0e-3, max_exclusion=1, delay_model=None):
+    """ 単独測位を行い、その結果に対してRAIM/FDEを適用する
+    引数の多くはgnss.positioning.solve_spp()と共通です。
+    Argv:
+        sigma:         <float> 天頂方向の衛星の擬似距離の標準偏差[m]. 検定の重みの尺度に用います。
+        p_fa:          <float> 誤警報確率
+        p_md:          <float> 検出失敗確率
+        max_exclusion: <int>   1エポックで除外する衛星の最大数
+    Return:
+        <dict> fde()の返り値に、除外後の"position"[m]と"clock_bias"[s]を加えたもの
+               要素は先頭にエポックの次元を持ちます（1エポックのみの場合は持ちません）。
+    """
+    sat_positions = np.asarray(sat_positions, dtype=np.float64)
+    pseudoranges = np.asarray(pseudoranges, dtype=np.float64)
+    single = pseudoranges.ndim == 1
+    if single:
+        sat_positions = sat_positions[np.newaxis]
+        pseudoranges = pseudoranges[np.newaxis]
+        if sat_clock_bias is not None:
+            sat_clock_bias = np.asarray(sat_clock_bias)[np.newaxis]
+    sol = positioning.solve_spp(sat_positions, pseudoranges, sat_clock_bias, datum=datum,
+        elevation_mask=elevation_mask, weighting=weighting, delay_model=delay_model)
+    converged = sol["converged"]
+    position = np.where(converged[:, np.newaxis], sol["position"], 0.0)
+
+    # 解における線形化された観測方程式を作り直す
+    sat = positioning._correct_sagnac(np.nan_to_num(sat_positions), position, datum)
+    d = sat - position[:, np.newaxis, :]
+    rho = np.linalg.norm(d, axis=2)
+    G = np.empty(d.shape[:2] + (4,))
+    G[..., :3] = -d / np.where(rho > 0.0, rho, 1.0)[..., np.newaxis]
+    G[..., 3] = 1.0
+    elevation, azimuth = positioning._get_elevation(sat, position, datum)
+    w_zenith = positioning._get_weight(np.array([np.pi / 2.0]), weighting)[0]
+    weight = positioning._get_weight(elevation, weighting) / w_zenith / sigma ** 2
+    mask = sol["used"] & converged[:, np.newaxis]
+    lat, lon = positioning._get_lat_lon(position, datum)
+    sB, cB, sL, cL = np.sin(lat), np.cos(lat), np.sin(lon), np.cos(lon)
+    rotation = np.empty((len(lat), 3, 3))
+    rotation[:, 0] = np.stack([-sL, cL, np.zeros(len(lat))], axis=1)
+    rotation[:, 1] = np.stack([-cL * sB, -sL * sB, cB], axis=1)
+    rotation[:, 2] = np.stack([cL * cB, sL * cB, sB], axis=1)
+
+    ans = fde(G, np.nan_to_num(sol["residual"]), weight, mask, rotation, p_fa, p_md, max_exclusion)
+    ans["position"] = np.where(converged[:, np.newaxis], sol["position"] + ans["correction"][:, :3], np.nan)
+    ans["clock_bias"] = np.where(converged, sol["clock_bias"] + ans["correction"][:, 3] / datum.c, np.nan)
+    if single:
+        for key in ans:
+            ans[key] = ans[key][0]
+    return ans
+
+
+
+
+def main():
+    print("---self test---")
+    import time
+    import gnss.coordinate as coordinate
+    n_epoch = 3600
+    receiver = np.array(coordinate.blh(wgs84, 32.8, 130.7, 50.0).to_ecef())
+    direction = np.random.normal(0.0, 1.0, (9, 3)) + receiver / np.linalg.norm(receiver) * 1.5
+    direction /= np.linalg.norm(direction, axis=1)[:, np.newaxis]
+    sats = np.broadcast_to(receiver + direction * 2.02e7, (n_epoch, 9, 3))
+    rotated = positioning._correct_sagnac(sats, np.broadcast_to(receiver, (n_epoch, 3)))
+    pr = np.linalg.norm(rotated - receiver, axis=2) + np.random.normal(0.0, 1.0, (n_epoch, 9))
+    pr[n_epoch // 2:, 3] += 50.0                            # 後半は衛星3に故障
+    t0 = time.time()
+    result = raim(sats, pr)
+    print("RAIM: {0} epochs, {1:.2f} s".format(n_epoch, time.time() - t0))
+    print("fault detected: first half {0}, last half {1}".format(
+        np.count_nonzero(result["fault"][:n_epoch // 2]), np.count_nonzero(result["fault"][n_epoch // 2:])))
+    print("excluded satellite 3: {0}".format(np.count_nonzero(result["excluded"][:, 3])))
+    print("median HPL: {0:.1f} m, VPL: {1:.1f} m".format(np.nanmedian(result["HPL"]), np.nanmedian(result["VPL"])))
+    print("mean error after exclusion: {0}".format(np.nanmean(result["position"][n_epoch // 2:], axis=0) - receiver))
+    print("chi2 threshold (dof=1..5, p=1e-5): {0}".format([round(float(chi2_threshold(k, 1.0e-5)), 3) for k in range(1, 6)]))
+
+
+if __name__ == '__main__':
+    main()
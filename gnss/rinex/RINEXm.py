@@ -15,12 +15,15 @@
 #                        可読性も少しは向上したと思う。
 #                        付け焼刃的な処理もあるけど、そこは将来の課題ということで。
 #                        RINEXオブジェクトのjoin()を汎化させるには、sort可能な1エポック毎の観測データを格納するクラスを宣言して、かつ格納しているエポックをハッシュで管理する必要がある。用途があれば作ります。
+#              2026/10/19 Epochクラスでgnss.timescale.gnss_timeを扱えるようにし、ヘッダの時刻を秒の小数部の全桁で保持するようにした。
+#                        Epoch.epochに代入できなかった点を修正した。
 #-------------------------------------------------------------------------------
 import os
 import re
 import sys
 import datetime
 import gnss.gps.time as gtime
+import gnss.timescale as timescale
 
 
 def getTimeOfObsInHeader(str):
@@ -39,11 +42,9 @@ def getTimeOfObsInHeader(str):
         day    = int(matchTest.group('day'))
         hour   = int(matchTest.group('hour'))
         minute = int(matchTest.group('min'))
-        sec    = int(matchTest.group('sec'))
-        _microsecond   = matchTest.group('microsecond') # このままでは単位が必ずしもμsにはならないので、以下で単位を変換する
-        microsecond    = int(int(_microsecond) * 10**(6 - len(_microsecond)))   # datetimeオブジェクトを使うと有効桁が一つ足りないのだが・・・実用上は問題ないと思う
+        sec    = matchTest.group('sec') + "." + matchTest.group('microsecond')
         system = matchTest.group('timeSystem')
-        return Epoch(system, datetime.datetime(year, month, day, hour, minute, sec, microsecond))
+        return Epoch(system, timescale.gnss_time.parse(year, month, day, hour, minute, sec))  # 秒の小数部は全桁を保持する
     else:
         return None
 
@@ -108,16 +109,13 @@ class Epoch:
         コンストラクタ
         Args:
             timeSystemName[str]              : 時刻系, exm. "GPS"
-            time          [datetime.datetime]: 時刻
+            time          [datetime.datetime or gnss.timescale.gnss_time]: 時刻
         """
         if isinstance(timeSystemName, str):
             self.tsystem = timeSystemName
         else:
             self.tsystem = ""
-        if isinstance(time, datetime.datetime):
-            self._epoch = time
-        else:
-            self._epoch = None
+        self.epoch = time
         return
     # プロパティ
     @property
@@ -126,8 +124,24 @@ class Epoch:
         return self.tsystem
     @property
     def epoch(self):
-        """ 時刻[datetime.datetime] """
+        """ 時刻[datetime.datetime]. マイクロ秒未満は切り捨てています """
         return self._epoch
+    @epoch.setter
+    def epoch(self, time):
+        """ 時刻を設定する. datetime.datetimeかgnss.timescale.gnss_timeを受け付ける """
+        if isinstance(time, timescale.gnss_time):
+            self._time = time
+            self._epoch = time.datetime
+        elif isinstance(time, datetime.datetime):
+            self._time = timescale.gnss_time.from_datetime64(time)
+            self._epoch = time
+        else:
+            self._time = None
+            self._epoch = None
+    @property
+    def time(self):
+        """ 時刻[gnss.timescale.gnss_time]. ナノ秒まで保持しています """
+        return self._time
     @property
     def year(self):
         """ 年[yyyy] """
@@ -177,6 +191,13 @@ class Epoch:
             return self.epoch.microsecond
         else:
             return None
+    @property
+    def nanosecond(self):
+        """ 秒未満の端数[ns] """
+        if self._time != None:
+            return int(self._time.ns % 1000000000)
+        else:
+            return None
 
 
 
@@ -210,8 +231,8 @@ class HeaderOfRINEX:
             ans._header.append(men)
         ans._start = self._start
         ans._end = self._end
-        ans._timeOfFirstObs = Epoch(self._timeOfFirstObs.system, self._timeOfFirstObs.epoch)
-        ans._timeOfLastObs  = Epoch(self._timeOfLastObs.system, self._timeOfLastObs.epoch)
+        ans._timeOfFirstObs = Epoch(self._timeOfFirstObs.system, self._timeOfFirstObs.time)
+        ans._timeOfLastObs  = Epoch(self._timeOfLastObs.system, self._timeOfLastObs.time)
         ans._isSet = self._isSet
         return ans
     def set(self, fname = ""):
@@ -250,12 +271,12 @@ class HeaderOfRINEX:
             for line in txt:
                 if "TIME OF FIRST OBS" in line:
                     tfo = getTimeOfObsInHeader(line)
-                    if self._timeOfFirstObs.epoch > tfo.epoch:
-                        self._timeOfFirstObs.epoch = tfo.epoch
+                    if self._timeOfFirstObs.time > tfo.time:
+                        self._timeOfFirstObs.epoch = tfo.time
                 if "TIME OF LAST OBS" in line:
                     tlo = getTimeOfObsInHeader(line)
-                    if self._timeOfLastObs.epoch < tlo.epoch:
-                        self._timeOfLastObs.epoch = tlo.epoch
+                    if self._timeOfLastObs.time < tlo.time:
+                        self._timeOfLastObs.epoch = tlo.time
                 if "end" in line:
                     self._end = line
                 if "END OF HEADER" in line:             # ヘッダー部分を抜けるとループを停止
@@ -272,12 +293,12 @@ class HeaderOfRINEX:
             #print("in header last: {0}".format(self._timeOfLastObs.epoch))
             for line in self._header:
                 if "TIME OF FIRST OBS" in line:
-                    str = "  {0:4d}    {1:2d}    {2:2d}    {3:2d}    {4:2d}   {5:2d}.{6:06d}0".format(self._timeOfFirstObs.year, self._timeOfFirstObs.month, self._timeOfFirstObs.day, self._timeOfFirstObs.hour, self._timeOfFirstObs.minute, self._timeOfFirstObs.second, self._timeOfFirstObs.microsecond)
+                    str = "  {0:4d}    {1:2d}    {2:2d}    {3:2d}    {4:2d}   {5:2d}.{6:07d}".format(self._timeOfFirstObs.year, self._timeOfFirstObs.month, self._timeOfFirstObs.day, self._timeOfFirstObs.hour, self._timeOfFirstObs.minute, self._timeOfFirstObs.second, self._timeOfFirstObs.nanosecond // 100)
                     str += self._timeOfFirstObs.system.rjust(8) # 右揃え
                     str += "         TIME OF FIRST OBS   \n"
                     ans.append(str)
                 elif "TIME OF LAST OBS" in line:
-                    str = "  {0:4d}    {1:2d}    {2:2d}    {3:2d}    {4:2d}   {5:2d}.{6:06d}0".format(self._timeOfLastObs.year, self._timeOfLastObs.month, self._timeOfLastObs.day, self._timeOfLastObs.hour, self._timeOfLastObs.minute, self._timeOfLastObs.second, self._timeOfLastObs.microsecond)
+                    str = "  {0:4d}    {1:2d}    {2:2d}    {3:2d}    {4:2d}   {5:2d}.{6:07d}".format(self._timeOfLastObs.year, self._timeOfLastObs.month, self._timeOfLastObs.day, self._timeOfLastObs.hour, self._timeOfLastObs.minute, self._timeOfLastObs.second, self._timeOfLastObs.nanosecond // 100)
                     str += self._timeOfLastObs.system.rjust(8)
                     str += "         TIME OF LAST OBS    \n"
                     ans.append(str)
@@ -0,0 +1,458 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+#-------------------------------------------------------------------------------
+# Name:        timescale
+# Purpose:  UTCとGPS時刻(GPST)の間の変換を、配列に対してまとめて行う手段を提供する。
+#           GPSとQZSで共通に利用します（QZSTはGPSTと同じくうるう秒を含みません）。
+#
+# Author:      morishita
+#
+# Created:     19/10/2026
+# Copyright:   (c) morishita 2026
+# Licence:     MIT
+# Memo:        時刻は次のいずれかで受け取ります。
+#                <numpy.datetime64>, <datetime.datetime> またはそれらの配列
+#                <float> GPSの基準エポック(1980-01-06 00:00:00)からの経過秒数
+#              datetime64はナノ秒単位の整数で差を取るので、秒への換算までは桁落ちしません。
+#              うるう秒はうるう秒の挿入時刻の配列をsearchsortedで検索して求めます。
+#              うるう秒の表はIERSのleap-seconds.list形式のファイル（既定はdata/leap-seconds.list）から読み込みます。
+#              新しいうるう秒が発表されたら、ファイルを差し替えてreload_leap_seconds()を呼んでください。
+# Histroy:
+#           2026-10-19   作成
+#           2026-10-19   うるう秒の表をファイルから読み込むようにした。再読み込みと有効期限の確認の機能を追加
+#           2026-10-19   ナノ秒単位の整数で時刻を保持するgnss_timeクラスを追加
+#           2026-10-19   モジュールの読み込み時には、うるう秒の表の警告を出さないようにした
+#-------------------------------------------------------------------------------
+
+import os
+import hashlib
+import datetime
+import warnings
+import numpy as np
+
+# 各種定数
+GPS_EPOCH = np.datetime64("1980-01-06T00:00:00", "ns")     # GPSの基準エポック
+SECONDS_A_WEEK = 604800
+LEAP_SECONDS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "leap-seconds.list")
+_NTP_EPOCH = np.datetime64("1900-01-01T00:00:00", "ns")   # leap-seconds.listで使われるNTPの基準エポック
+_GPST_TAI = 19                                             # TAI - GPST [s]
+
+leap_list = []                              # うるう秒の挿入1秒後の時刻(UTC)のリスト. 再読み込みの際は中身を入れ替えます
+_table = {                                  # 読み込んだうるう秒の表. 再読み込みの際は辞書ごと差し替えます
+    "utc": np.array([]),                    # 挿入時刻(UTC)[s]
+    "gpst": np.array([]),                   # 挿入時刻(GPST)[s]
+    "offset": np.array([0]),                # 各挿入時刻以降のGPST - UTC[s]（先頭は最初の挿入より前の値0）
+    "updated": None,                        # ファイルの更新日時 <datetime64>
+    "expires": None,                        # ファイルの有効期限 <datetime64>
+    "hash_ok": False,                       # ファイルのハッシュ値が一致したかどうか
+    "fname": None,
+    "mtime": None,
+}
+
+
+def _ntp_to_datetime64(seconds):
+    """ NTP時刻[s]をdatetime64[ns]に変換する """
+    return _NTP_EPOCH + np.timedelta64(int(seconds), "s")
+
+def read_leap_seconds_file(fname=LEAP_SECONDS_FILE):
+    """ IERSのleap-seconds.list形式のファイルを読み込む
+    Argv:
+        fname: <str> ファイルパス
+    Return:
+        <dict> "date": TAI-UTCが切り替わる時刻 <ndarray<datetime64>>,
+               "tai_utc": 切り替わった後のTAI-UTC[s] <ndarray<int>>,
+               "updated", "expires": ファイルの更新日時と有効期限 <datetime64>,
+               "hash_ok": ハッシュ値が一致したかどうか <bool>
+    """
+    updated = None
+    expires = None
+    file_hash = None
+    ntp = []
+    tai_utc = []
+    with open(fname, "r") as fr:
+        for line in fr:
+            if line.startswith("#$"):
+                updated = int(line[2:].split()[0])
+            elif line.startswith("#@"):
+                expires = int(line[2:].split()[0])
+            elif line.startswith("#h"):
+                file_hash = "".join(line[2:].split())
+            elif line.startswith("#") == False:
+                field = line.split("#")[0].split()
+                if len(field) >= 2:
+                    ntp.append(int(field[0]))
+                    tai_utc.append(int(field[1]))
+    if len(ntp) == 0 or updated is None or expires is None:
+        raise ValueError("{0} is not a leap-seconds.list file.".format(fname))
+    # ハッシュ値は、更新日時・有効期限・各データ行の数値を空白なしで連結した文字列のSHA-1
+    data = str(updated) + str(expires) + "".join(str(a) + str(b) for a, b in zip(ntp, tai_utc))
+    hash_ok = file_hash is not None and hashlib.sha1(data.encode("ascii")).hexdigest() == file_hash.lower()
+    order = np.argsort(ntp)
+    date = _NTP_EPOCH + np.array(ntp, dtype=np.int64)[order].astype("timedelta64[s]")
+    return {"date": date, "tai_utc": np.array(tai_utc)[order], "updated": _ntp_to_datetime64(updated),
+        "expires": _ntp_to_datetime64(expires), "hash_ok": hash_ok}
+
+def load_leap_seconds(fname=LEAP_SECONDS_FILE, warn=False):
+    """ うるう秒の表を読み込み、以降の変換で利用する
+    モジュールの読み込み時にも呼ばれるので、既定では警告を出しません。表の状態はcheck_leap_seconds()で確認してください。
+    Argv:
+        fname: <str>  ファイルパス
+        warn:  <bool> Trueなら、ファイルの有効期限が切れていたり内容に不整合があれば警告を出す
+    """
+    global _table
+    data = read_leap_seconds_file(fname)
+    gps = data["tai_utc"] - _GPST_TAI > 0                   # GPSの基準エポック以降のうるう秒
+    utc = (data["date"][gps] - GPS_EPOCH) / np.timedelta64(1, "s")
+    offset = np.concatenate([[0], data["tai_utc"][gps] - _GPST_TAI])   # 挿入後のGPST - UTC
+    _table = {"utc": utc, "gpst": utc + offset[1:], "updated": data["updated"], "expires": data["expires"],
+        "hash_ok": data["hash_ok"], "fname": fname, "mtime": os.path.getmtime(fname), "offset": offset}
+    leap_list[:] = [datetime.datetime(1980, 1, 6) + datetime.timedelta(seconds=int(t)) for t in utc]
+    if warn:
+        for message in check_leap_seconds():
+            warnings.warn(message, stacklevel=3)
+    return len(utc)
+
+def reload_leap_seconds(fname=None, force=False):
+    """ うるう秒の表を読み込み直す
+    長時間動作するプログラムから定期的に呼び出すことを想定しています。
+    ファイルが更新されていなければ何もしません。
+    読み込んだ表の有効期限が切れていたり内容に不整合があれば警告を出します。
+    Argv:
+        fname: <str>  ファイルパス. 省略時は前回読み込んだファイル
+        force: <bool> Trueなら更新の有無によらず読み込む
+    Return:
+        <bool> 読み込み直したらTrue
+    """
+    if fname is None:
+        fname = _table["fname"] or LEAP_SECONDS_FILE
+    if force == False and fname == _table["fname"] and os.path.getmtime(fname) == _table["mtime"]:
+        return False
+    load_leap_seconds(fname, warn=True)
+    return True
+
+def check_leap_seconds(now=None):
+    """ 読み込んだうるう秒の表に問題がないか調べる
+    Argv:
+        now: <datetime64 or datetime> 判定に用いる現在時刻(UTC), 省略時はシステムの時刻
+    Return:
+        <list<str>> 問題点の説明. 問題がなければ空のリスト
+    """
+    problems = []
+    if now is None:
+        now = datetime.datetime.now(datetime.timezone.utc)
+    if isinstance(now, datetime.datetime) and now.tzinfo is not None:
+        now = now.astimezone(datetime.timezone.utc).replace(tzinfo=None)   # datetime64はタイムゾーンを持たない
+    now = np.datetime64(now, "ns")
+    if _table["expires"] is None:
+        return ["leap second table is not loaded."]
+    if _table["hash_ok"] == False:
+        problems.append("hash of {0} does not match its contents.".format(_table["fname"]))
+    if now > _table["expires"]:
+        problems.append("leap second table expired on {0}; update {1} from IERS.".format(
+            np.datetime_as_string(_table["expires"], unit="D"), _table["fname"]))
+    if np.any(np.diff(_table["offset"]) != 1):
+        problems.append("leap seconds in {0} do not increase one by one.".format(_table["fname"]))
+    return problems
+
+load_leap_seconds()
+
+
+def to_seconds(utc):
+    """ 時刻をGPSの基準エポックからの経過秒数（うるう秒を含まない）に変換する
+    Argv:
+        utc: <datetime64 or datetime or float> 時刻またはその配列
+    Return:
+        <ndarray<float64>> 経過秒数
+    """
+    a = np.asarray(utc)
+    if a.dtype.kind in "MO":                                    # 時刻型
+        ns = (a.astype("datetime64[ns]") - GPS_EPOCH).astype(np.int64)
+        return ns // 1000000000 + (ns % 1000000000) * 1.0e-9
+    return a.astype(np.float64)
+
+def to_datetime64(seconds):
+    """ GPSの基準エポックからの経過秒数をdatetime64[ns]に変換する
+    """
+    seconds = np.asarray(seconds, dtype=np.float64)
+    whole = np.floor(seconds)
+    ns = whole.astype(np.int64) * 1000000000 + np.round((seconds - whole) * 1.0e9).astype(np.int64)
+    return GPS_EPOCH + ns.astype("timedelta64[ns]")
+
+def get_leap_seconds(utc):
+    """ 指定時刻(UTC)におけるGPSTとUTCの差（うるう秒の累積）[s]を返す
+    Argv:
+        utc: <datetime64 or datetime or float> 時刻またはその配列
+    Return:
+        <ndarray<int64>> or <int64>
+    """
+    table = _table                                              # 再読み込みで差し替えられても一貫した表を使う
+    return table["offset"][np.searchsorted(table["utc"], to_seconds(utc), side="right")][()]
+
+def utc_to_gpst(utc):
+    """ UTCをGPS時刻[s]（GPSの基準エポックからの経過秒数）に変換する
+    """
+    table = _table
+    t = to_seconds(utc)
+    return (t + table["offset"][np.searchsorted(table["utc"], t, side="right")])[()]
+
+def gpst_to_utc(gpst, as_datetime64=False):
+    """ GPS時刻[s]をUTCに変換する
+    Argv:
+        gpst:          <ndarray> GPS時刻[s]
+        as_datetime64: <bool>    Trueならdatetime64[ns]で返し、FalseならGPSの基準エポックからの経過秒数で返す
+    """
+    gpst = np.asarray(gpst, dtype=np.float64)
+    table = _table
+    utc = gpst - table["offset"][np.searchsorted(table["gpst"], gpst, side="right")]
+    if as_datetime64:
+        return to_datetime64(utc)[()]
+    return utc[()]
+
+def gpst_to_week_tow(gpst):
+    """ GPS時刻[s]を(GPS週番号, 週内秒[s])に変換する
+    """
+    gpst = np.asarray(gpst, dtype=np.float64)
+    week = np.floor_divide(gpst, SECONDS_A_WEEK)
+    return (week.astype(np.int64)[()], (gpst - week * SECONDS_A_WEEK)[()])
+
+def week_tow_to_gpst(week, tow):
+    """ (GPS週番号, 週内秒[s])をGPS時刻[s]に変換する
+    """
+    return (np.asarray(week, dtype=np.float64) * SECONDS_A_WEEK + np.asarray(tow, dtype=np.float64))[()]
+
+def utc_to_week_tow(utc):
+    """ UTCを(GPS週番号, 週内秒[s])に変換する
+    """
+    return gpst_to_week_tow(utc_to_gpst(utc))
+
+def week_tow_to_utc(week, tow, as_datetime64=False):
+    """ (GPS週番号, 週内秒[s])をUTCに変換する
+    """
+    return gpst_to_utc(week_tow_to_gpst(week, tow), as_datetime64)
+
+
+class gnss_time:
+    """ GNSSの時刻（GPST）を、GPSの基準エポックからの経過ナノ秒数(int64)で保持するクラス
+    datetimeのようにマイクロ秒で丸められることも、Decimalのように遅くなることもありません。
+    1つの時刻だけでなく、時刻の配列も保持できます。
+    int64のナノ秒なので、表現できる範囲は1980年から約292年です。
+    """
+    __slots__ = ("ns",)
+
+    def __init__(self, ns=0):
+        """
+        Argv:
+            ns: <int or ndarray<int64>> GPSの基準エポックからの経過ナノ秒数(GPST)
+        """
+        self.ns = np.asarray(ns, dtype=np.int64)
+
+    # 生成
+    @classmethod
+    def from_week_tow(cls, week, tow):
+        """ GPS週番号と週内秒[s]から生成する """
+        return cls(np.asarray(week, dtype=np.int64) * (SECONDS_A_WEEK * 1000000000) + _to_ns(tow))
+
+    @classmethod
+    def from_seconds(cls, gpst):
+        """ GPS時刻[s]（基準エポックからの経過秒数）から生成する """
+        return cls(_to_ns(gpst))
+
+    @classmethod
+    def from_datetime64(cls, epoch):
+        """ GPSTで表された日時（datetime64, datetime）から生成する
+        うるう秒の変換は行いません。
+        """
+        return cls((np.asarray(epoch).astype("datetime64[ns]") - GPS_EPOCH).astype(np.int64))
+
+    @classmethod
+    def from_utc(cls, utc, A0=0.0, A1=0.0, tot=None):
+        """ UTCの日時（datetime64, datetime）から生成する
+        A0, A1, totを与えると、1秒未満のGPST-UTCの差も補正します. ref: RINEX 3.02 A17.
+        Argv:
+            utc: <datetime64 or datetime> UTCの日時
+            A0:  <float> 補正パラメータ[s]
+            A1:  <float> 補正パラメータ[s/s]
+            tot: <datetime64 or datetime> 補正パラメータの元期(UTC)
+        """
+        ns = (np.asarray(utc).astype("datetime64[ns]") - GPS_EPOCH).astype(np.int64)
+        table = _table
+        seconds = ns // 1000000000
+        ns = ns + table["offset"][np.searchsorted(table["utc"], seconds, side="right")] * 1000000000
+        if tot is not None:
+            tot_ns = (np.datetime64(tot, "ns") - GPS_EPOCH).astype(np.int64)
+            dt = (ns - tot_ns) * 1.0e-9                         # 差を取ってから秒にするので桁落ちしない
+            ns = ns + np.round((A0 + A1 * dt) / (1.0 - A1) * 1.0e9).astype(np.int64)
+        return cls(ns)
+
+    @classmethod
+    def parse(cls, year, month, day, hour, minute, second):
+        """ 年月日時分と秒の文字列(e.g. "30.0000000")から生成する
+        秒の小数部は文字列のまま桁を数えるので、ナノ秒まで正確に読み込めます。
+        """
+        whole, _, fraction = str(second).strip().partition(".")
+        epoch = np.datetime64(datetime.datetime(int(year), int(month), int(day), int(hour), int(minute)), "ns")
+        ns = (epoch - GPS_EPOCH).astype(np.int64) + int(whole) * 1000000000 + int((fraction + "000000000")[:9])
+        return cls(ns)
+
+    # 変換
+    @property
+    def week(self):
+        """ GPS週番号 """
+        return (self.ns // (SECONDS_A_WEEK * 1000000000))[()]
+
+    @property
+    def tow_ns(self):
+        """ 週内秒[ns] """
+        return (self.ns % (SECONDS_A_WEEK * 1000000000))[()]
+
+    @property
+    def tow(self):
+        """ 週内秒[s] """
+        return (self.ns % (SECONDS_A_WEEK * 1000000000) * 1.0e-9)[()]
+
+    @property
+    def seconds(self):
+        """ GPS時刻[s]. 2^53 nsを超えるとfloat64では1 ns未満の桁が失われます """
+        return (self.ns // 1000000000 + self.ns % 1000000000 * 1.0e-9)[()]
+
+    @property
+    def datetime64(self):
+        """ GPSTで表した日時 <datetime64[ns]> """
+        return (GPS_EPOCH + self.ns.astype("timedelta64[ns]"))[()]
+
+    @property
+    def datetime(self):
+        """ GPSTで表した日時 <datetime.datetime>（マイクロ秒未満は切り捨て）. 配列ならdatetime.datetimeのobject配列 """
+        return np.asarray(np.datetime64("1980-01-06", "us") + (self.ns // 1000).astype("timedelta64[us]")).astype(object)[()]
+
+    def to_utc(self):
+        """ UTCの日時を返す <datetime64[ns]> """
+        table = _table
+        seconds = self.ns // 1000000000
+        leap = table["offset"][np.searchsorted(table["gpst"], seconds, side="right")]
+        return (GPS_EPOCH + (self.ns - leap * 1000000000).astype("timedelta64[ns]"))[()]
+
+    def get_seconds_from(self, week, tow):
+        """ GPS週番号と週内秒[s]で表した時刻からの経過秒数を返す
+        大きな数同士の引き算は整数で行うので、桁落ちしません。
+        """
+        return ((self.ns - gnss_time.from_week_tow(week, tow).ns) * 1.0e-9)[()]
+
+    # 演算
+    def __add__(self, other):
+        """ 秒数[s]かtimedelta64を足す """
+        return gnss_time(self.ns + _to_ns(other))
+
+    __radd__ = __add__
+
+    def __sub__(self, other):
+        """ gnss_time同士なら差[s]を、秒数[s]かtimedelta64なら引いた時刻を返す """
+        if isinstance(other, gnss_time):
+            return ((self.ns - other.ns) * 1.0e-9)[()]
+        return gnss_time(self.ns - _to_ns(other))
+
+    def _get_ns(self, other):
+        return other.ns if isinstance(other, gnss_time) else gnss_time.from_datetime64(other).ns
+
+    def __eq__(self, other):
+        return (self.ns == self._get_ns(other))[()]
+
+    def __ne__(self, other):
+        return (self.ns != self._get_ns(other))[()]
+
+    def __lt__(self, other):
+        return (self.ns < self._get_ns(other))[()]
+
+    def __le__(self, other):
+        return (self.ns <= self._get_ns(other))[()]
+
+    def __gt__(self, other):
+        return (self.ns > self._get_ns(other))[()]
+
+    def __ge__(self, other):
+        return (self.ns >= self._get_ns(other))[()]
+
+    def __hash__(self):
+        return hash(self.ns.tobytes())
+
+    # 配列としての振る舞い
+    def __len__(self):
+        return len(self.ns)
+
+    def __getitem__(self, index):
+        return gnss_time(self.ns[index])
+
+    def __array__(self, dtype=None, copy=None):
+        """ np.asarray()で経過ナノ秒数の配列を返す """
+        return self.ns if dtype is None else self.ns.astype(dtype)
+
+    @property
+    def shape(self):
+        return self.ns.shape
+
+    # 文字列化
+    def __str__(self):
+        """ e.g. 2014-02-26T00:00:00.000000000 """
+        return str(np.datetime_as_string(self.datetime64, unit="ns"))
+
+    def __repr__(self):
+        return "gnss_time('{0}')".format(self)
+
+    def strftime(self, fmt="%Y %m %d %H %M", digits=7):
+        """ 書式を指定して文字列化する
+        秒は小数点以下digits桁で末尾に付け加えます（RINEXのエポック行の形式が既定）。
+        配列なら文字列の配列を返します。分までの部分は異なる分ごとに1回だけ書式化します。
+        """
+        ns = np.asarray(self.ns)
+        sec = ns % 60000000000
+        minutes, inverse = np.unique((ns - sec) // 60000000000, return_inverse=True)
+        heads = np.array([(datetime.datetime(1980, 1, 6) + datetime.timedelta(minutes=int(m))).strftime(fmt) for m in minutes])
+        ans = np.char.add(np.char.add(heads[inverse.reshape(ns.shape)], " "), np.char.rjust((sec // 1000000000).astype(str), 2))
+        if digits > 0:
+            frac = np.char.zfill((sec % 1000000000).astype(str), 9)
+            ans = np.char.add(np.char.add(ans, "."), np.char.ljust(frac, 9).astype("U{0}".format(min(digits, 9))))
+        ans = np.asarray(ans)
+        return str(ans) if ans.ndim == 0 else ans
+
+def _to_ns(value):
+    """ 秒数[s]やtimedelta64をナノ秒(int64)に換算する """
+    value = np.asarray(value)
+    if value.dtype.kind == "m":
+        return value.astype("timedelta64[ns]").astype(np.int64)
+    if value.dtype.kind in "iu":
+        return value.astype(np.int64) * 1000000000
+    return np.round(value.astype(np.float64) * 1.0e9).astype(np.int64)
+
+
+
+
+def main():
+    print("---self test---")
+    import time
+    utc = np.datetime64("1980-01-06") + np.arange(0, 46 * 365 * 86400, 600).astype("timedelta64[s]")
+    t0 = time.time()
+    week, tow = utc_to_week_tow(utc)
+    t1 = time.time()
+    back = week_tow_to_utc(week, tow, as_datetime64=True)
+    print("{0} epochs: UTC->week/TOW {1:.3f} s, inverse {2:.3f} s".format(len(utc), t1 - t0, time.time() - t1))
+    print("round trip error: {0}".format(np.max(np.abs(back - utc))))
+    print("leap seconds at 2012-07-01 00:00:00: {0}".format(get_leap_seconds(datetime.datetime(2012, 7, 1))))
+    print("leap seconds at 2012-06-30 23:59:59: {0}".format(get_leap_seconds(datetime.datetime(2012, 6, 30, 23, 59, 59))))
+    print("2014-02-26 00:00:00 UTC -> week, TOW: {0}".format(utc_to_week_tow(np.datetime64("2014-02-26T00:00:00"))))
+    print("leap seconds at 2020-01-01 00:00:00: {0}".format(get_leap_seconds(datetime.datetime(2020, 1, 1))))
+    print("table: {0} leap seconds, updated {1}, expires {2}, hash ok: {3}".format(
+        len(leap_list), _table["updated"], _table["expires"], _table["hash_ok"]))
+    print("reloaded: {0}".format(reload_leap_seconds()))
+    print("problems: {0}".format(check_leap_seconds()))
+    t = gnss_time.parse(2014, 2, 26, 0, 0, "0.1234567")
+    print("gnss_time: {0}, week {1}, TOW {2}, {3}".format(repr(t), t.week, t.tow_ns, t.strftime()))
+    print("1 ns later: {0}, difference: {1} s".format(t + 1.0e-9, (t + 1.0e-9) - t))
+    print("UTC: {0} -> {1}".format(t.to_utc(), gnss_time.from_utc(t.to_utc())))
+    ts = gnss_time.from_utc(utc)
+    t0 = time.time()
+    tdiff = (ts + 0.5) - ts[0]
+    print("{0} epochs: arithmetic {1:.3f} s, sorted: {2}".format(len(ts), time.time() - t0, bool(np.all(np.diff(tdiff) > 0))))
+
+
+if __name__ == '__main__':
+    main()
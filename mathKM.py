@@ -11,15 +11,32 @@
 # Licence:     new BSD
 # History:      2013/1/11   4分位数の計算時に、リストの数に下限を設けた。
 #               2014/2/11   暗号理論の講義でRubyにて作ったfactorize()を移植した。
+#               2026/10/19  整列済みデータを共有するSortedSampleを追加し、4分位数を使う関数の整列を1回で済ませるようにした。
+#                           逐次計算用のWelford, P2Quantile, StreamStatsと刈り込み平均trimmedMeanを追加した。
+#                           ndarrayとmemoryviewも受け付け、NumPyで計算するようにした。test()の内容を1回の整列で求めるdescribe()を追加した。
+#                           TwiceDrmsが2乗和を加算していなかった（最後の値しか使っていなかった）のを修正した。2次元・3次元の精度指標はgnss.accuracyを使うこと。
+#                           factorize()の平方根を整数で求めるようにした。完全な素因数分解を行うprimeFactors()とfactorint()を追加した。
+#                           isPrime()で3.3 * 10^24以上の数に強いリュカ判定も行うようにした（BPSW判定）。
 #-------------------------------------------------------------------------------
+import bisect
 import math
+import numpy as np
+
+def _asArray(valueList):
+    """ ndarrayかmemoryviewであれば、float64の1次元配列にして返す. それ以外はNone """
+    if isinstance(valueList, (np.ndarray, memoryview)):
+        return np.asarray(valueList, dtype=np.float64).ravel()
+    return None
 
 def mean(valueList):
     """ 平均を返す
     外れ値の検討は行いません。
     Args:
-        valueList:  処理したい値のリスト
+        valueList:  処理したい値のリスト（ndarray, memoryviewも可）
     """
+    array = _asArray(valueList)
+    if array is not None:
+        return float(array.mean()) if len(array) > 0 else None
     if isinstance(valueList, list) == False:
         return None
     _sum = 0.0
@@ -35,14 +52,17 @@ def mean2(valueList, lower, upper):
         lower:      指定範囲の最小値
         upper:      指定範囲の最大値
     """
-    if isinstance(valueList, list) == False:
+    if (isinstance(lower, int) or isinstance(lower, float) or isinstance(lower, np.number)) == False:
         return None
-    if (isinstance(lower, int) or isinstance(lower, float)) == False:
-        return None
-    if (isinstance(upper, int) or isinstance(upper, float)) == False:
+    if (isinstance(upper, int) or isinstance(upper, float) or isinstance(upper, np.number)) == False:
         return None
     if lower > upper:
         return None
+    array = _asArray(valueList)
+    if array is not None:
+        return float(array[(lower <= array) & (array <= upper)].mean())
+    if isinstance(valueList, list) == False:
+        return None
     _sum = 0.0
     count = 0.0
     for men in valueList:
@@ -60,10 +80,26 @@ def mean3(valueList):
         None: 4分位数を計算できない場合
         float: 平均の推定値
     """
-    _quantile = quantile(valueList)
-    if _quantile == None:
+    sample = _getSortedSample(valueList)
+    if sample == None:
+        return None
+    return _mean3(sample)
+
+def _mean3(sample):
+    """ 整列済みのデータを使ってmean3()を計算する """
+    _quantile = sample.quantile()
+    return sample.meanBetween(_quantile[1], _quantile[3])
+
+def _getSortedSample(valueList):
+    """ 4分位数を計算できるデータであれば、整列したSortedSampleを返す """
+    array = _asArray(valueList)
+    if array is not None:
+        return SortedSample(array) if len(array) > 5 else None
+    if isinstance(valueList, list) == False:
         return None
-    return mean2(valueList, _quantile[1], _quantile[3])
+    if len(valueList) <= 5:
+        return None
+    return SortedSample(valueList)
 
 def quantile(valueList):
     """ 4分位数を返す
@@ -75,36 +111,17 @@ def quantile(valueList):
     Returen:
         Tuple: (0%値, 25%値, 50%値, 75%値, 100%値)
     """
-    if isinstance(valueList, list) == False:
+    array = _asArray(valueList)
+    if array is not None:                               # 配列なら全体を整列せず、必要な順位の値だけをnp.partitionで求める
+        if len(array) <= 5:
+            return None
+        size = len(array)
+        ranks = sorted(set([0, size - 1, size // 2 - 1, size // 2, int(size * 0.25) - 1, int(size * 0.25), int(size * 0.75) - 1, int(size * 0.75)]))
+        return SortedSample(np.partition(array, ranks), presorted = True).quantile()
+    sample = _getSortedSample(valueList)
+    if sample == None:
         return None
-    if len(valueList) <= 5:
-        return None
-    dummy = []
-    for men in valueList:
-        dummy.append(men)
-    dummy.sort()
-    size = len(dummy)
-    p25 = size * 0.25
-    p50 = size * 0.50
-    p75 = size * 0.75
-    # 最小
-    v0 = dummy[0]
-    # 25%値
-    temp = dummy[int(p25) - 1]
-    temp2 = dummy[int(p25)]
-    v25 = (temp2 - temp) * (p25 - int(p25)) + temp
-    # 50%値
-    if size % 2 == 0:   # 偶数
-        v50 = (dummy[int(p50) - 1] + dummy[int(p50)]) / 2.0
-    else:               # 奇数
-        v50 = dummy[int(p50)]
-    # 75%値
-    temp = dummy[int(p75) - 1]
-    temp2 = dummy[int(p75)]
-    v75 = (temp2 - temp) * (p75 - int(p75)) + temp
-    # 最大値
-    v100 = dummy[-1]
-    return (v0, v25, v50, v75, v100)
+    return sample.quantile()
 
 def CheckGaussianDistribution(valueList):
     """ 分布の偏りを検査する
@@ -123,6 +140,10 @@ def CheckGaussianDistribution(valueList):
     _quantile = quantile(valueList)
     if _quantile == None:
         return None
+    return _checkGaussianDistribution(_quantile)
+
+def _checkGaussianDistribution(_quantile):
+    """ 4分位数を使ってCheckGaussianDistribution()を計算する """
     v25 = _quantile[1]
     v50 = _quantile[2]
     v75 = _quantile[3]
@@ -142,10 +163,13 @@ def TwiceDrms(valueList, trueValue):
         valueList: 処理したい値のリスト
         trueValue: 真値
     """
+    array = _asArray(valueList)
+    if array is not None:
+        return (trueValue, 2.0 * math.sqrt(float(((array - trueValue) ** 2).mean())))
     sum = 0.0
     for men in valueList:
         distance = abs(men - trueValue)
-        sum = distance ** 2.0
+        sum += distance ** 2.0
     rms = math.sqrt(sum / len(valueList))
     return (trueValue, 2.0 * rms)
 
@@ -157,10 +181,10 @@ def TwiceDrms2(valueList):
         None: 4分位数を計算できない場合
         float: 2DRMSの推定値
     """
-    _quantile = quantile(valueList)
-    if _quantile == None:
+    sample = _getSortedSample(valueList)
+    if sample == None:
         return None
-    estimatedTrueValue = mean2(valueList, _quantile[1], _quantile[3])
+    estimatedTrueValue = _mean3(sample)
     return (estimatedTrueValue, TwiceDrms(valueList, estimatedTrueValue))
 
 def sd(valueList):
@@ -170,6 +194,12 @@ def sd(valueList):
         None: 平均を計算不可能な場合
         float: 標準偏差
     """
+    array = _asArray(valueList)
+    if array is not None:
+        if len(array) < 2:
+            return None
+        _mean = float(array.mean())
+        return (_mean, math.sqrt(float(((array - _mean) ** 2).sum()) / (len(array) - 1)))
     _mean = mean(valueList)
     if _mean == None:
         return None
@@ -193,19 +223,22 @@ def sd2(valueList, min, max):
         None: 4分位数を計算できない場合
         tuple: (平均の推定値, 標準偏差の推定値, 計算に利用されたデータの割合)
     """
-    copy = []
-    for men in valueList:
-        p = float(men)
-        if min <= p <= max:
-            copy.append(p)
-    _mean = mean3(copy)
-    if _mean == None:
+    array = _asArray(valueList)
+    if array is not None:
+        sample = SortedSample(array)
+    else:
+        sample = SortedSample([float(men) for men in valueList])
+    return _sd2(sample, min, max)
+
+def _sd2(sample, min, max):
+    """ 整列済みのデータを使ってsd2()を計算する
+    範囲内のデータは整列済みデータの連続した一部なので、コピーも整列し直しもしません。
+    """
+    copy = sample.sub(min, max)
+    if len(copy) <= 5:
         return None
-    sum = 0.0
-    for men in copy:
-        diff = (men - _mean) ** 2.0
-        sum += diff
-    return (_mean, math.sqrt(sum / (len(copy) - 1)), len(copy) / len(valueList))
+    _mean = _mean3(copy)
+    return (_mean, math.sqrt(copy.squaredDeviation(_mean) / (len(copy) - 1)), len(copy) / len(sample))
 
 def sd3(valueList):
     """ 標準偏差の推定値を返す
@@ -218,34 +251,21 @@ def sd3(valueList):
         None: 4分位数を計算できない場合
         tuple: ((平均の推定値, 標準偏差の推定値, データの利用率), 分布の偏り方の指標)
     """
-    _quantile = quantile(valueList)
-    #print("in sd3()")
-    #print(_quantile)
-    if _quantile == None:
+    sample = _getSortedSample(valueList)            # 整列は1回だけ行い、以降は整列済みのデータを共有する
+    if sample == None:
         return None
-    dummy = []
-    for men in valueList:
-        dummy.append(men)
-    dummy.sort()
-    size = len(dummy)
-    p1 = size * (0.5 - 0.3413)   # 1σに近い値を取得したい
-    p2 = size * (0.5 + 0.3413)   # なぜ2σに値する0.4772を使わないかというと、外れ値が多い場合に対処できないため
-    # %値, 2σに近い値を取得する
-    temp = dummy[int(p1) - 1]
-    temp2 = dummy[int(p1)]
-    v1 = (temp2 - temp) * (p1 - int(p1)) + temp
-    # %値
-    temp = dummy[int(p2) - 1]
-    temp2 = dummy[int(p2)]
-    v2 = (temp2 - temp) * (p2 - int(p2)) + temp
+    return _sd3(sample)
+
+def _sd3(sample):
+    """ 整列済みのデータを使ってsd3()を計算する """
+    _quantile = sample.quantile()
+    v1 = sample.percentile(0.5 - 0.3413)            # 1σに近い値を取得したい
+    v2 = sample.percentile(0.5 + 0.3413)            # なぜ2σに値する0.4772を使わないかというと、外れ値が多い場合に対処できないため
     # 範囲を求める（2σの範囲に相当する部分を探そうとしている）
     lower = _quantile[2] - (_quantile[2] - v1) * 2.0        # 式はあえて整理しない
     higher = _quantile[2] + (v2 - _quantile[2]) * 2.0
-    #print(lower)
-    #print(higher)
-    _sd = sd2(valueList, lower, higher)
-    #print(_sd)
-    return (_sd, CheckGaussianDistribution(valueList))
+    _sd = _sd2(sample, lower, higher)
+    return (_sd, _checkGaussianDistribution(_quantile))
 
 def test(sample):
     """ 各関数を使って統計データを返す
@@ -259,33 +279,553 @@ def test(sample):
     _2drms2 = TwiceDrms2(sample)
     return (_mean, _mean2, _quantile, _sd, _sd3, _2drms2)
 
+class SortedSample:
+    """ 整列済みのデータを共有して、分位数や範囲内の平均・標準偏差を求めるクラス
+    元のリストを1回だけコピーして整列し、値の累積和を持っておくので、
+    範囲指定の平均（mean2相当）や部分範囲の分位数を、整列し直さずにO(log n)で求められます。
+    sub()で作った部分範囲のオブジェクトは整列済みデータと累積和を共有します。
+    """
+    def __init__(self, valueList = None, presorted = False, _parent = None, _start = 0, _stop = 0):
+        """
+        Args:
+            valueList: 値のリストかndarray. ndarrayならNumPyで整列・累積します。
+            presorted: Trueなら整列済みとして扱う（quantile()のように、必要な順位の値だけが正しい位置にあれば良い場合にも使う）
+        """
+        if _parent != None:
+            self._data = _parent._data
+            self._shift = _parent._shift
+            self._sum1 = _parent._sum1
+            self._sum2 = _parent._sum2
+            self._start = _start
+            self._stop = _stop
+            return
+        self._start = 0
+        if isinstance(valueList, np.ndarray):
+            self._data = valueList if presorted else np.sort(valueList)
+            self._stop = len(self._data)
+            self._shift = float(self._data[self._stop // 2]) if self._stop > 0 and presorted == False else 0.0
+            if presorted:                               # 累積和は使わないので省く
+                self._sum1 = self._sum2 = None
+                return
+            diff = self._data - self._shift
+            self._sum1 = np.concatenate(([0.0], np.cumsum(diff)))
+            self._sum2 = np.concatenate(([0.0], np.cumsum(diff * diff)))
+            return
+        self._data = valueList if presorted else sorted(valueList)
+        self._stop = len(self._data)
+        self._shift = float(self._data[self._stop // 2]) if self._stop > 0 else 0.0   # 桁落ちを防ぐために中央付近の値を引いてから累積する
+        self._sum1 = [0.0]
+        self._sum2 = [0.0]
+        s1 = 0.0
+        s2 = 0.0
+        for men in self._data:
+            diff = float(men) - self._shift
+            s1 += diff
+            s2 += diff * diff
+            self._sum1.append(s1)
+            self._sum2.append(s2)
+        return
+
+    def __len__(self):
+        return self._stop - self._start
+
+    def __getitem__(self, index):
+        """ 範囲内のindex番目の値. 負の添字はリストと同様に後ろから数える """
+        if index < 0:
+            index += len(self)
+        value = self._data[self._start + index]
+        return float(value) if isinstance(value, np.floating) else value
+
+    def percentile(self, p):
+        """ quantile()と同じ補間方法で、割合pに相当する値を返す """
+        pos = len(self) * p
+        temp = self[int(pos) - 1]
+        temp2 = self[int(pos)]
+        return (temp2 - temp) * (pos - int(pos)) + temp
+
+    def quantile(self):
+        """ 4分位数を返す
+        Returen:
+            Tuple: (0%値, 25%値, 50%値, 75%値, 100%値)
+        """
+        size = len(self)
+        if size % 2 == 0:   # 偶数
+            v50 = (self[size // 2 - 1] + self[size // 2]) / 2.0
+        else:               # 奇数
+            v50 = self[size // 2]
+        return (self[0], self.percentile(0.25), v50, self.percentile(0.75), self[-1])
+
+    def _range(self, lower, upper):
+        """ lower <= x <= upper となる値の添字の範囲（整列済みデータ全体での添字） """
+        if isinstance(self._data, np.ndarray):
+            view = self._data[self._start:self._stop]
+            return (self._start + int(np.searchsorted(view, lower, "left")), self._start + int(np.searchsorted(view, upper, "right")))
+        return (bisect.bisect_left(self._data, lower, self._start, self._stop), bisect.bisect_right(self._data, upper, self._start, self._stop))
+
+    def sub(self, lower, upper):
+        """ lower <= x <= upper の範囲の値だけを持つSortedSampleを返す """
+        start, stop = self._range(lower, upper)
+        return SortedSample(_parent = self, _start = start, _stop = stop)
+
+    def sum(self):
+        """ 範囲内の値の合計 """
+        return float(self._sum1[self._stop] - self._sum1[self._start]) + self._shift * len(self)
+
+    def mean(self):
+        """ 範囲内の値の平均 """
+        return self.sum() / len(self)
+
+    def meanBetween(self, lower, upper):
+        """ lower <= x <= upper の値の平均（mean2と同じ） """
+        return self.sub(lower, upper).mean()
+
+    def squaredDeviation(self, center):
+        """ 範囲内の値とcenterとの差の2乗和 """
+        s1 = self._sum1[self._stop] - self._sum1[self._start]
+        s2 = self._sum2[self._stop] - self._sum2[self._start]
+        d = center - self._shift
+        return max(float(s2 - 2.0 * d * s1 + len(self) * d * d), 0.0)
+
+
+class Welford:
+    """ Welfordの方法で平均と分散を逐次計算するクラス
+    値を保持しないので、何か月分のデータでもメモリ使用量は一定です。
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0                          # 偏差平方和
+        return
+
+    def add(self, value):
+        """ 値を1つ加える """
+        self.count += 1
+        delta = float(value) - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (float(value) - self.mean)
+        return
+
+    def merge(self, other):
+        """ 別のWelfordオブジェクトの結果を合成する """
+        if other.count == 0:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self._m2 += other._m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        return
+
+    def variance(self):
+        """ 不偏分散. 2個未満ならNone """
+        if self.count < 2:
+            return None
+        return self._m2 / (self.count - 1)
+
+    def sd(self):
+        """ 標準偏差（sd()と同じく不偏分散から求める）. 2個未満ならNone """
+        var = self.variance()
+        if var == None:
+            return None
+        return math.sqrt(var)
+
+
+class P2Quantile:
+    """ P²アルゴリズム（Jain & Chlamtac, 1985）で分位数を逐次推定するクラス
+    5つのマーカーだけを保持するので、データ数によらずメモリ使用量は一定です。
+    """
+    def __init__(self, p):
+        """
+        Args:
+            p: 推定したい割合 (0 < p < 1). e.g. 中央値なら0.5
+        """
+        self.p = p
+        self.count = 0
+        self._q = []                                        # マーカーの高さ
+        self._n = [0, 1, 2, 3, 4]                           # マーカーの位置
+        self._np = [0.0, 2.0 * p, 4.0 * p, 2.0 + 2.0 * p, 4.0]   # マーカーの理想的な位置
+        self._dn = [0.0, p / 2.0, p, (1.0 + p) / 2.0, 1.0]
+        return
+
+    def add(self, value):
+        """ 値を1つ加える """
+        x = float(value)
+        self.count += 1
+        q = self._q
+        if self.count <= 5:                                 # 最初の5つは整列して保持する
+            bisect.insort(q, x)
+            return
+        n = self._n
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = bisect.bisect_right(q, x) - 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._np[i] += self._dn[i]
+        for i in range(1, 4):                               # 中間のマーカーの高さを調整
+            d = self._np[i] - n[i]
+            if (d >= 1.0 and n[i + 1] - n[i] > 1) or (d <= -1.0 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                qp = q[i] + d / (n[i + 1] - n[i - 1]) * ((n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+                                                        + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1]))
+                if q[i - 1] < qp < q[i + 1]:                # 放物線補間
+                    q[i] = qp
+                else:                                       # 線形補間
+                    q[i] = q[i] + d * (q[i + d] - q[i]) / (n[i + d] - n[i])
+                n[i] += d
+        return
+
+    def value(self):
+        """ 分位数の推定値. データが無ければNone """
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            pos = (self.count - 1) * self.p
+            low = int(pos)
+            high = min(low + 1, self.count - 1)
+            return self._q[low] + (self._q[high] - self._q[low]) * (pos - low)
+        return self._q[2]
+
+
+class StreamStats:
+    """ 平均・標準偏差・4分位数・4分位範囲内の平均（mean3相当）を逐次推定するクラス
+    4分位範囲内の平均は、値が届いた時点での4分位数の推定値を使って判定するので近似値です。
+    データ数が十分に多ければmean3()に近い値になります。
+    """
+    def __init__(self, warmup = 20):
+        """
+        Args:
+            warmup: 4分位範囲内の平均を集計し始めるまでのデータ数
+        """
+        self.all = Welford()
+        self.trimmed = Welford()
+        self._quartiles = [P2Quantile(0.25), P2Quantile(0.5), P2Quantile(0.75)]
+        self.min = None
+        self.max = None
+        self.warmup = warmup
+        return
+
+    def add(self, value):
+        """ 値を1つ加える """
+        x = float(value)
+        if self.all.count >= self.warmup:
+            if self._quartiles[0].value() <= x <= self._quartiles[2].value():
+                self.trimmed.add(x)
+        self.all.add(x)
+        for men in self._quartiles:
+            men.add(x)
+        if self.min == None or x < self.min:
+            self.min = x
+        if self.max == None or x > self.max:
+            self.max = x
+        return
+
+    def extend(self, valueList):
+        """ 複数の値を加える """
+        for men in valueList:
+            self.add(men)
+        return
+
+    def quantile(self):
+        """ 4分位数の推定値. quantile()と同じ形式 """
+        if self.all.count == 0:
+            return None
+        return (self.min, self._quartiles[0].value(), self._quartiles[1].value(), self._quartiles[2].value(), self.max)
+
+    def trimmedMean(self):
+        """ 4分位範囲内の平均の推定値. 集計前ならNone """
+        if self.trimmed.count == 0:
+            return None
+        return self.trimmed.mean
+
+
+def trimmedMean(valueList, proportion = 0.25):
+    """ 両端からそれぞれproportionの割合のデータを除いた平均（刈り込み平均）を返す
+    Args:
+        valueList:  処理したい値のリスト（ndarray, memoryviewも可）、又はSortedSample
+        proportion: 片側で除く割合 (0 <= proportion < 0.5)
+    """
+    if isinstance(valueList, SortedSample) == False:
+        array = _asArray(valueList)
+        if array is not None:
+            valueList = array
+        elif isinstance(valueList, list) == False:
+            return None
+        if len(valueList) == 0:
+            return None
+        valueList = SortedSample(valueList)
+    cut = int(len(valueList) * proportion)
+    return SortedSample(_parent = valueList, _start = valueList._start + cut, _stop = valueList._stop - cut).mean()
+
+def describe(valueList):
+    """ test()と同じ統計量を、1回の整列でまとめて計算して辞書で返す
+    Args:
+        valueList: 処理したい値のリスト（ndarray, memoryviewも可）
+    Return:
+        None: 4分位数を計算できない場合
+        dict: キーは mean, mean2, quantile, sd, sd3, TwiceDrms2 （値はそれぞれの関数の戻り値と同じ）
+    """
+    sample = _getSortedSample(valueList)
+    if sample == None:
+        return None
+    _quantile = sample.quantile()
+    _mean = sample.mean()
+    estimatedTrueValue = _mean3(sample)
+    array = _asArray(valueList)
+    return {"mean": _mean,
+            "mean2": sample.meanBetween(_quantile[1], _quantile[2]),
+            "quantile": _quantile,
+            "sd": (_mean, math.sqrt(sample.squaredDeviation(_mean) / (len(sample) - 1))),
+            "sd3": _sd3(sample),
+            "TwiceDrms2": (estimatedTrueValue, TwiceDrms(array if array is not None else valueList, estimatedTrueValue))}
+
 def factorize(n):
     """ 素因数分解を行う
-    A * B の形まで分解します。
+    A * B の形まで分解します（フェルマー法）。
     公開鍵暗号を解く演習問題レベルなら問題ありません。
+    平方根は整数で求めるので、大きなnでも桁落ちしません。ただし、2つの因数が離れていると非常に時間が掛かります。
+    完全な素因数分解にはprimeFactors()を使ってください。
     """
     #print(n)
-    x = int(math.sqrt(n)) + 1
-    y = 0
-    z = 0
+    x = math.isqrt(n)
+    if x * x < n:
+        x += 1
     while(1):
         z = x * x - n
-        y = math.sqrt(z)
-        if (y - int(y)) != 0:
-            x += 1
-        if (x + y) * (x - y) == n:
+        y = math.isqrt(z)
+        if y * y == z:
             break
+        x += 1
     return (x + y, x - y)
 
+_smallPrimes = []                       # 試し割りに使う素数のリスト（primeSieveで作る）
+_SMALL_PRIME_LIMIT = 1 << 16
+
+def primeSieve(limit):
+    """ limit未満の素数のリストをエラトステネスの篩で求める """
+    if limit < 3:
+        return []
+    sieve = bytearray([1]) * (limit // 2)          # 奇数 2i + 1 が素数かどうか
+    sieve[0] = 0
+    for i in range(1, (math.isqrt(limit - 1) - 1) // 2 + 1):
+        if sieve[i]:
+            p = 2 * i + 1
+            sieve[p * p // 2::p] = bytes(len(range(p * p // 2, limit // 2, p)))
+    return [2] + [2 * i + 1 for i in range(1, limit // 2) if sieve[i]]
+
+def _getSmallPrimes():
+    if len(_smallPrimes) == 0:
+        _smallPrimes.extend(primeSieve(_SMALL_PRIME_LIMIT))
+    return _smallPrimes
+
+_MR_DETERMINISTIC_LIMIT = 3317044064679887385961981     # 最初の13個の素数を底にしたミラー・ラビン法の最小の擬素数
+
+def _jacobi(a, n):
+    """ ヤコビ記号 (a/n) を返す. nは正の奇数 """
+    a %= n
+    result = 1
+    while a != 0:
+        while a % 2 == 0:
+            a //= 2
+            if n % 8 in (3, 5):
+                result = -result
+        a, n = n, a
+        if a % 4 == 3 and n % 4 == 3:
+            result = -result
+        a %= n
+    return result if n == 1 else 0
+
+def _isStrongLucasProbablePrime(n):
+    """ 強いリュカ確率的素数判定（Selfridgeの方法でパラメータを選ぶ）
+    nは3より大きい奇数で、小さな素数で割り切れないこと。
+    """
+    root = math.isqrt(n)
+    if root * root == n:                            # 平方数ではDが見つからない
+        return False
+    D = 5
+    while True:
+        j = _jacobi(D, n)
+        if j == -1:
+            break
+        if j == 0 and abs(D) != n:
+            return False
+        D = -(D + 2) if D > 0 else -D + 2           # 5, -7, 9, -11, ...
+    P = 1
+    Q = (1 - D) // 4
+    d = n + 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    inv2 = (n + 1) // 2                             # 2の逆元
+    U = 1
+    V = P
+    Qk = Q % n
+    for bit in bin(d)[3:]:
+        U = U * V % n                               # 添字を2倍
+        V = (V * V - 2 * Qk) % n
+        Qk = Qk * Qk % n
+        if bit == "1":                              # 添字に1を足す
+            U, V = (P * U + V) * inv2 % n, (D * U + P * V) * inv2 % n
+            Qk = Qk * Q % n
+    if U == 0 or V == 0:
+        return True
+    for _ in range(s - 1):
+        V = (V * V - 2 * Qk) % n
+        if V == 0:
+            return True
+        Qk = Qk * Qk % n
+    return False
+
+def isPrime(n):
+    """ 素数かどうかをミラー・ラビン法で判定する
+    最初の13個の素数を底に使うので、n < 3.3 * 10^24 では確定的に判定できます。
+    それ以上では強いリュカ確率的素数判定も行います（BPSW判定. 反例は知られていません）。
+    """
+    if n < 2:
+        return False
+    for p in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41):
+        if n % p == 0:
+            return n == p
+    d = n - 1
+    s = 0
+    while d % 2 == 0:
+        d //= 2
+        s += 1
+    for a in (2, 3, 5, 7, 11, 13, 17, 19, 23, 29, 31, 37, 41):
+        x = pow(a, d, n)
+        if x == 1 or x == n - 1:
+            continue
+        for _ in range(s - 1):
+            x = x * x % n
+            if x == n - 1:
+                break
+        else:
+            return False
+    if n >= _MR_DETERMINISTIC_LIMIT:
+        return _isStrongLucasProbablePrime(n)
+    return True
+
+def pollardRho(n, c = 1):
+    """ ポラードのρ法（ブレントの循環検出）で、nの自明でない約数を1つ返す
+    nは合成数であること。
+    """
+    if n % 2 == 0:
+        return 2
+    while True:
+        y = 2
+        r = 1
+        q = 1
+        g = 1
+        m = 128                                     # gcdをまとめて取る間隔
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+            r *= 2
+        if g == n:                                  # まとめた分で行き過ぎたら1つずつ戻って探す
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g
+        c += 1                                      # 失敗したら多項式を変えてやり直す
+
+def primeFactors(n):
+    """ 素因数分解を行う
+    篩で求めた小さな素数で試し割りし、残りはisPrime()で素数判定しながらポラードのρ法で分解します。
+    ρ法の手間は残った合成数の最小の素因数pの平方根に比例します（楕円曲線法などへの切り替えはありません）。
+    pが10桁程度までなら1秒以内ですが、2つの20桁程度（64 bit）の素数の積のような数では数分から数時間掛かります。
+    Return:
+        list: 素因数を小さい順に並べたリスト（重複あり）. e.g. 12 -> [2, 2, 3]
+    """
+    n = int(n)
+    if n < 2:
+        return []
+    ans = []
+    for p in _getSmallPrimes():
+        if p * p > n:
+            break
+        while n % p == 0:
+            ans.append(p)
+            n //= p
+    if n == 1:
+        return ans
+    stack = [n]
+    while len(stack) > 0:
+        m = stack.pop()
+        if m < _SMALL_PRIME_LIMIT * _SMALL_PRIME_LIMIT or isPrime(m):   # 試し割りの後なので、この範囲に残った数は素数
+            ans.append(m)
+            continue
+        root = math.isqrt(m)
+        if root * root == m:
+            stack += [root, root]
+            continue
+        d = pollardRho(m)
+        stack += [d, m // d]
+    ans.sort()
+    return ans
+
+def factorint(n):
+    """ 素因数分解の結果を {素数: 指数} の辞書で返す（sympy.factorintと同じ形式） """
+    ans = {}
+    for p in primeFactors(n):
+        ans[p] = ans.get(p, 0) + 1
+    return ans
+
 def main():
     # とある気圧の観測データ [hPa], 1 Hz sampling
     baro = [932.08,932.09,932.09,932.1,932.09,932.09,932.08,932.14,932.09,932.08,932.13,932.02,932.11,932.09,932.08,932.11,932.07,932.11,932.08,932.11,931.95,932.1,932.1,932.1,932.07,932.08]
     result = test(baro)
     print(result)
+
+    # 逐次計算
+    stream = StreamStats()
+    stream.extend(baro)
+    print((stream.all.mean, stream.all.sd(), stream.quantile(), stream.trimmedMean(), trimmedMean(baro)))
+
+    # NumPyの配列でも同じ結果になる
+    print(describe(np.array(baro)))
     
     # 素因数分解
     hoge = 8550349 * 3607151
     print(factorize(hoge))
+    print(primeFactors(hoge))
+    # ベンチマーク（フェルマー法は因数が近い場合しか速くない）
+    import time
+    for hoge in [8550349 * 3607151, 1000003 * 998244353, (2**61 - 1) * 1000000007, 2**64 + 1, 600851475143 * 2**70 * 99991]:
+        t0 = time.perf_counter()
+        result = primeFactors(hoge)
+        t1 = time.perf_counter()
+        print("{0}: {1}  primeFactors {2:.2f} ms".format(hoge, result, (t1 - t0) * 1000.0), end="")
+        if len(result) == 2 and hoge % 2 == 1 and result[1] < 100 * result[0]:
+            t0 = time.perf_counter()
+            factorize(hoge)
+            print(", factorize {0:.2f} ms".format((time.perf_counter() - t0) * 1000.0), end="")
+        print()
+    # ρ法の手間は最小の素因数の平方根に比例する（素因数が1桁増えると約3倍）
+    for p, q in [(1000000007, 998244353), (10000000019, 99999999977), (100000000003, 999999999989)]:
+        t0 = time.perf_counter()
+        primeFactors(p * q)
+        print("{0} * {1}: primeFactors {2:.2f} ms".format(p, q, (time.perf_counter() - t0) * 1000.0))
+    print("2つの64 bitの素数の積は数分以上掛かるので省略")
+    # 13個の底のミラー・ラビン法をすり抜ける合成数も、リュカ判定で合成数と分かる
+    print(isPrime(3317044064679887385961981), primeFactors(3317044064679887385961981))
     #import sympy                        # 標準パッケージを使った場合
     #hoge = 46546135
     #result = sympy.factorint(hoge)
@@ -13,9 +13,17 @@
 # History:     2013/5/14    時刻に関する処理を削除して、timeKMモジュールを参照するように改めた。
 #              2013/5/19    正規表現パターンを修正
 #                           クラスのメソッドにsetlineを追加
+#              2026/10/19   時刻の取得にtimeKM.getTimes()を使い、大量の行をまとめて処理するようにした。
+#                           正常なデータの抽出にchunkReaderを使い、ファイルをブロックごとに処理する関数を追加した。
+#                           ログを1回の走査で集計するscanLogとLogReportクラスを追加した（scanLogは13月などの不正な日付の行も除外する）。
+#                           PressureLoggerのaddForMean・mean・toStringが存在しないAT103_Temperatureを参照していたので、Thermistor_Temperatureに直した。
+#                           ログを列ごとの配列で保持し、リサンプリングや移動統計に対応したPressureLogクラスを追加した。
 #-------------------------------------------------------------------------------
 import datetime
+import io
 import re
+import numpy as np
+import chunkReader
 import timeKM
 
 reDataPattern        = re.compile(r'\d{4}/\d{1,2}/\d{1,2} \d{1,2}:\d{1,2}:\d{1,2},-?\d+\.\d+,\d+\.\d+,-?\d+\.?\d*,\d+')# AD変換値にはマイナスは付かないのだが、ここではキャリブレーション後を見越してつけておく
@@ -55,7 +63,7 @@ class PressureLogger:
         """
         self.SCP1000_Temperature += float(scp1000Temp)
         self.SCP1000_Pressure += float(scp1000Pressure)
-        self.AT103_Temperature += float(at103Temp)
+        self.Thermistor_Temperature += float(at103Temp)          # サーミスタにはAT103を使っている
         self.brightness += float(brightness)
         self.__count += 1.0
         return
@@ -64,15 +72,273 @@ class PressureLogger:
         算術平均です。
         最大とか最少とか外れ値とかは全く考慮しません。
         """
+        if self.__count == 0.0:
+            return
         self.SCP1000_Temperature /= self.__count
         self.SCP1000_Pressure /= self.__count
-        self.AT103_Temperature /= self.__count
+        self.Thermistor_Temperature /= self.__count
         self.brightness /= self.__count
         self.__count = 0.0
     def toString(self):
         """ データを文字列化して返す
         """
-        return "{0:.2f},{1:.2f},{2:.1f},{3:.1f}".format(self.SCP1000_Temperature, self.SCP1000_Pressure, self.AT103_Temperature, self.brightness)
+        return "{0:.2f},{1:.2f},{2:.1f},{3:.1f}".format(self.SCP1000_Temperature, self.SCP1000_Pressure, self.Thermistor_Temperature, self.brightness)
+
+class PressureLog:
+    """ 気圧ロガーのログを列ごとの配列で保持するクラス
+    時刻はdatetime64[us]、観測値はfloat32の配列です。時刻順に並べて保持するので、期間の切り出しはsearchsortedで行えます。
+    1行ずつPressureLoggerオブジェクトを作る代わりに使ってください。
+    """
+    COLUMNS = ("SCP1000_Temperature", "SCP1000_Pressure", "Thermistor_Temperature", "brightness")
+
+    def __init__(self, time = None, values = None):
+        """
+        Args:
+            time:   datetime64の配列
+            values: 観測値の2次元配列（行: 時刻, 列: COLUMNSの順）
+        """
+        self.time = np.array([] if time is None else time, dtype="datetime64[us]")
+        if values is None:
+            self.values = np.zeros((len(self.time), len(self.COLUMNS)), dtype=np.float32)
+        else:
+            self.values = np.asarray(values, dtype=np.float32).reshape(len(self.time), len(self.COLUMNS))
+        self.count = None                               # resampleの結果であれば、各時刻に含まれる行数
+        if np.any(self.time[1:] < self.time[:-1]):      # 時刻順に並べる
+            order = np.argsort(self.time, kind="stable")
+            self.time = self.time[order]
+            self.values = self.values[order]
+        return
+
+    @classmethod
+    def read(cls, source, blockSize = chunkReader.BLOCK_SIZE):
+        """ ログファイルを読み込む
+        Args:
+            source:    ファイル名か、ファイルオブジェクト（テキストモード）
+            blockSize: 1回に読み込む文字数
+        """
+        times = []
+        values = []
+        parser = timeKM.TimeParser()
+        for block in chunkReader.readBlocks(source, blockSize):
+            rows = reDataPattern.findall(block)
+            if len(rows) == 0:
+                continue
+            time = parser.parseLines(rows)
+            value = np.array([row.split(",")[1:] for row in rows], dtype=np.float32)
+            valid = ~np.isnat(time)
+            times.append(time[valid])
+            values.append(value[valid])
+        if len(times) == 0:
+            return cls()
+        return cls(np.concatenate(times), np.concatenate(values))
+
+    @classmethod
+    def fromText(cls, txt):
+        """ 文字列のログから作る """
+        return cls.read(io.StringIO(txt))
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, index):
+        """ 添字・スライス・マスクで行を取り出す. 列名を渡すとその列の配列を返す """
+        if isinstance(index, str):
+            return self.values[:, self.COLUMNS.index(index)]
+        ans = PressureLog(np.atleast_1d(self.time[index]), self.values[index])
+        if self.count is not None:
+            ans.count = np.atleast_1d(self.count[index])
+        return ans
+
+    def __getattr__(self, name):
+        if name in PressureLog.COLUMNS:
+            return self[name]
+        raise AttributeError(name)
+
+    def slice(self, start = None, end = None):
+        """ start <= t < end の期間を切り出す
+        Args:
+            start, end: datetime.datetimeかdatetime64. Noneなら端まで
+        """
+        first = 0 if start is None else np.searchsorted(self.time, np.datetime64(start, "us"), side="left")
+        last = len(self.time) if end is None else np.searchsorted(self.time, np.datetime64(end, "us"), side="left")
+        return self[first:last]
+
+    def resample(self, step, origin = None, how = "mean"):
+        """ step秒ごとに区切って集約する
+        データの無い区間は出力しません。各区間に含まれる行数はcountに入ります。
+        Args:
+            step:   区間の長さ[sec]
+            origin: 区間の基準時刻. Noneなら1970/1/1 00:00:00
+            how:    "mean", "min", "max", "std" のいずれか
+        Return:
+            PressureLog: 時刻は各区間の先頭
+        """
+        if len(self) == 0:
+            return PressureLog()
+        _step = np.timedelta64(int(round(step * 1e6)), "us")
+        _origin = np.datetime64("1970-01-01", "us") if origin is None else np.datetime64(origin, "us")
+        bins = (self.time - _origin) // _step
+        starts = np.flatnonzero(np.r_[True, bins[1:] != bins[:-1]])       # 時刻順に並んでいるので、区間の境目だけを探せば良い
+        count = np.diff(np.r_[starts, len(self)])
+        values = self.values.astype(np.float64)
+        if how == "mean":
+            ans = np.add.reduceat(values, starts, axis=0) / count[:, None]
+        elif how == "min":
+            ans = np.minimum.reduceat(values, starts, axis=0)
+        elif how == "max":
+            ans = np.maximum.reduceat(values, starts, axis=0)
+        elif how == "std":
+            mean = np.add.reduceat(values, starts, axis=0) / count[:, None]
+            sq = np.add.reduceat((values - np.repeat(mean, count, axis=0)) ** 2, starts, axis=0)
+            ans = np.sqrt(sq / np.maximum(count - 1, 1)[:, None])
+            ans[count < 2] = np.nan
+        else:
+            raise ValueError("unknown aggregation: " + str(how))
+        result = PressureLog(_origin + bins[starts] * _step, ans)
+        result.count = count
+        return result
+
+    def rolling(self, window, how = "mean"):
+        """ 各時刻 t について、t - window < 時刻 <= t の行の統計量を求める
+        累積和とsearchsortedで求めるので、窓の大きさによらず計算量はO(n)です。
+        Args:
+            window: 窓の長さ[sec]
+            how:    "mean", "std", "count" のいずれか
+        Return:
+            ndarray: 行数 x 列数の配列（"count"なら行数の1次元配列）
+        """
+        _window = np.timedelta64(int(round(window * 1e6)), "us")
+        first = np.searchsorted(self.time, self.time - _window, side="right")
+        last = np.searchsorted(self.time, self.time, side="right")
+        count = last - first
+        if how == "count":
+            return count
+        if how not in ("mean", "std"):
+            raise ValueError("unknown statistic: " + str(how))
+        if len(self) == 0:
+            return np.zeros((0, len(self.COLUMNS)))
+        values = self.values.astype(np.float64)
+        values = values - values.mean(axis=0)                                   # 桁落ちを抑えるために全体の平均を引いておく
+        zeros = np.zeros((1, values.shape[1]))
+        cumsum = np.vstack((zeros, np.cumsum(values, axis=0)))
+        s1 = cumsum[last] - cumsum[first]
+        n = count[:, None].astype(np.float64)
+        if how == "mean":
+            return s1 / n + self.values.astype(np.float64).mean(axis=0)
+        cumsq = np.vstack((zeros, np.cumsum(values ** 2, axis=0)))
+        s2 = cumsq[last] - cumsq[first]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (s2 - s1 ** 2 / n) / (n - 1)
+        return np.where(n > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def mean(self):
+        """ 列ごとの平均を辞書で返す """
+        if len(self) == 0:
+            return dict([(name, float("nan")) for name in self.COLUMNS])
+        return dict(zip(self.COLUMNS, self.values.astype(np.float64).mean(axis=0).tolist()))
+
+    def toCsv(self, saveName):
+        """ CSVで保存する """
+        lines = []
+        for time, value in zip(self.time.tolist(), self.values.tolist()):
+            lines.append(time.strftime("%Y/%m/%d %H:%M:%S") + ",{0:.2f},{1:.2f},{2:.1f},{3:.1f}\n".format(*value))
+        with open(saveName, 'w') as fw:
+            fw.write("".join(lines))
+        return
+
+class LogReport:
+    """ ログを1回走査して得られる、データ品質の集計結果
+    正常な行、正常な行の割合、除外した理由ごとの行数、正常な行の時刻の範囲をまとめて保持します。
+    """
+    REASONS = ("empty", "noTime", "fieldCount", "badValue")    # 除外理由: 空行, 時刻が無い, 値の個数が違う, 値が数値でない
+
+    def __init__(self, name = ""):
+        self.name = name
+        self.totalLines = 0
+        self.rows = []                                          # 正常な行（keepRows = Falseなら空のまま）
+        self.healthyLines = 0
+        self.rejected = dict([(reason, 0) for reason in self.REASONS])
+        self.firstTime = None
+        self.lastTime = None
+        return
+
+    @property
+    def healthyRate(self):
+        """ 正常な行の割合 """
+        if self.totalLines == 0:
+            return 0.0
+        return float(self.healthyLines) / float(self.totalLines)
+
+    @property
+    def coverage(self):
+        """ 正常な行の時刻の範囲（datetime.timedelta） """
+        if self.firstTime == None:
+            return datetime.timedelta(0)
+        return self.lastTime - self.firstTime
+
+    def toDict(self):
+        """ 集計結果を辞書で返す（一覧表示などに使う） """
+        ans = {"name": self.name, "totalLines": self.totalLines, "healthyLines": self.healthyLines, "healthyRate": self.healthyRate,
+               "firstTime": self.firstTime, "lastTime": self.lastTime, "coverage": self.coverage.total_seconds()}
+        ans.update(self.rejected)
+        return ans
+
+    def toString(self):
+        """ 集計結果を文字列化して返す """
+        rejected = ", ".join(["{0}: {1}".format(reason, self.rejected[reason]) for reason in self.REASONS])
+        return "{0}: {1}/{2} lines healthy ({3:.1%}), {4} - {5}, rejected [{6}]".format(
+            self.name, self.healthyLines, self.totalLines, self.healthyRate, self.firstTime, self.lastTime, rejected)
+
+def _getRejectedReason(line):
+    """ 正常でない行の除外理由を返す """
+    if line.strip() == "":
+        return "empty"
+    matchTest = timeKM.reDateGroupedPattern.search(line)
+    if matchTest == None:
+        return "noTime"
+    fields = line[matchTest.end():].strip().lstrip(",").split(",")
+    if len(fields) != 4:                                        # 時刻を除いた値は4つ
+        return "fieldCount"
+    return "badValue"
+
+def scanLog(source, name = None, keepRows = True, blockSize = chunkReader.BLOCK_SIZE):
+    """ ログを1回だけ走査して、正常な行の抽出と品質の集計を同時に行う
+    Args:
+        source:    ファイル名か、ファイルオブジェクト（テキストモード）
+        name:      レポートに付ける名前. 省略するとファイル名
+        keepRows:  Trueなら正常な行をレポートに保持する
+        blockSize: 1回に読み込む文字数
+    Return:
+        LogReport
+    """
+    if name == None:
+        name = source if isinstance(source, str) else getattr(source, "name", "")
+    report = LogReport(name)
+    parser = timeKM.TimeParser()
+    for block in chunkReader.readBlocks(source, blockSize):
+        for line in block.splitlines():
+            report.totalLines += 1
+            matchTest = reDataPattern.search(line)
+            if matchTest == None:
+                report.rejected[_getRejectedReason(line)] += 1
+                continue
+            row = matchTest.group(0)
+            time = parser.parse(row)
+            if time == None:                                    # 13月などの不正な日付
+                report.rejected["noTime"] += 1
+                continue
+            report.healthyLines += 1
+            if keepRows:
+                report.rows.append(row)
+            if report.firstTime == None or time < report.firstTime:
+                report.firstTime = time
+            if report.lastTime == None or time > report.lastTime:
+                report.lastTime = time
+    return report
+
+def scanText(txt, name = "", keepRows = True):
+    """ 文字列に対してscanLogを実行する """
+    return scanLog(io.StringIO(txt), name, keepRows)
 
 def getHealthyRate(txt):
     """ ファイルの正常なデータ割合を簡易計測して返す
@@ -84,7 +350,28 @@ def getHealthyRate(txt):
 def getHealthyDataList(txt):
     """ テキストデータの実験ログから正常なデータのみを抽出してリストとして返す
     """
-    return reDataPattern.findall(txt)
+    return list(chunkReader.iterText(txt, reDataPattern))
+
+def iterHealthyData(fname, blockSize = chunkReader.BLOCK_SIZE):
+    """ 実験ログのファイルをブロックごとに読み込みながら、正常なデータのみを1行ずつ返すジェネレータ
+    ファイル全体を読み込まないので、巨大なファイルでもメモリを消費しません。
+    """
+    return chunkReader.iterMatches(fname, reDataPattern, 0, blockSize)
+
+def writeHealthyData(fname, saveName, blockSize = chunkReader.BLOCK_SIZE):
+    """ 実験ログのファイルから正常なデータのみを抽出して、別のファイルへ保存する
+    ブロックごとに処理するので、メモリ使用量はファイルサイズに依存しません。
+    Return:
+        int: 保存した行数
+    """
+    count = 0
+    with open(saveName, 'w') as fw:
+        for block in chunkReader.readBlocks(fname, blockSize):
+            rows = reDataPattern.findall(block)
+            if len(rows) > 0:
+                fw.write("\n".join(rows) + "\n")
+                count += len(rows)
+    return count
 
 def getHealthyDataTxt(txt):
     """ テキストデータの実験ログから正常なデータのみを抽出してテキストデータとして返す
@@ -97,8 +384,8 @@ def getClockDict(txt):
     """
     ans  = {}
     dataList = getHealthyDataList(txt)      # 実験データからリストを作る
-    for one in dataList:                    # リストを走査しながら時刻をキーとした辞書を作成
-        time = timeKM.getTime(one)          # 時刻を取得
+    times = timeKM.getTimes(dataList).tolist()  # 時刻をまとめて取得
+    for time, one in zip(times, dataList):  # リストを走査しながら時刻をキーとした辞書を作成
         ans.update(dict({time:one}))
     return ans
 
@@ -114,7 +401,16 @@ def checkline(line):
 
 
 def main():
-    pass
+    print("セルフテスト")
+    txt = "\n".join(["2013/5/1 0:0:1,20.5,1013.2,21.0,300", "", "garbage", "2013/5/1 0:0:2,20.5,1013.2", "2013/5/1 0:0:3,20.5,abc,21.0,300", "2013/5/1 0:0:4,20.6,1013.3,21.1,301"])
+    report = scanText(txt, "sample")
+    print(report.toString())
+    print(getHealthyDataTxt(txt))
+    log = PressureLog.fromText("\n".join(["2013/5/1 0:0:{0},{1:.1f},{2:.1f},21.0,300".format(i, 20.0 + i * 0.1, 1013.0 + i) for i in range(60)]))
+    print(len(log), log.slice(datetime.datetime(2013, 5, 1, 0, 0, 10), datetime.datetime(2013, 5, 1, 0, 0, 20)).SCP1000_Pressure)
+    resampled = log.resample(15)
+    print(resampled.time, resampled.SCP1000_Pressure, resampled.count)
+    print(log.rolling(5)[:6, 1], log.rolling(5, "std")[:6, 1])
 
 if __name__ == '__main__':
     main()
@@ -26,11 +26,15 @@
 #               2014/2/10   ライセンスをnew BSDからMITへ変更
 #                           GPS関係の演算を別のモジュールへ切り出した。
 #               2014/2/12   TIME_A_WEEKを追加
+#               2026/10/19  ユリウス日・修正ユリウス日・年間通算日・曜日を配列でまとめて求める関数を追加した。
+#                           結果は対応するスカラー版の関数と完全に一致します。
+#                           時刻の書式を一度だけ検出して大量の行から時刻を高速に取り出すTimeParserクラスとgetTimes()を追加した。
 #-------------------------------------------------------------------------------
 #!/usr/bin/env python
 
 import re
 import datetime
+import numpy as np
 
 # 正規表現パターン
 # [yyyy/MM/dd hh:mm:ss]または[yyyy-MM-dd hh:mm:ss]にヒットする。(/|-)で、/か-で区切られた日付にヒットする。また、?:を付けるとグループ化されない
@@ -98,6 +102,153 @@ def getTimeSecondIgnored(oneDataStr):
         return None
     return
 
+_digitTable = str.maketrans("0123456789", "dddddddddd")    # 数字を'd'に置き換えて書式のひな形を作るための変換表
+
+class TimeParser:
+    """ 大量の行から時刻を高速に取り出すためのクラス
+    最初に時刻を含む行から時刻の書式（行内の位置・桁数・区切り文字）を一度だけ調べ、
+    以降は正規表現を使わずに文字列の切り出しで時刻を取り出します。
+    書式の異なる行はgetTime()（正規表現）で処理するので、結果はgetTime()と同じです。
+    ただし、日付として不正な値（13月など）はgetTime()のように例外を投げず、時刻が得られなかったものとして扱います。
+    """
+    def __init__(self):
+        self._offset = None                 # 行頭から時刻までの文字数
+        self._template = None               # 時刻の書式のひな形. e.g. "dddd/dd/dd dd:dd:dd"
+        self._length = 0
+        self._spans = []                    # ひな形の中の年・月・日・時・分・秒（・秒の小数部）の桁の位置
+        self._fraction = False              # 秒に小数部があるかどうか
+        return
+
+    @property
+    def isDetected(self):
+        """ 書式を検出済みかどうか """
+        return self._template != None
+
+    def detect(self, line):
+        """ 文字列から時刻の書式を検出する
+        Return:
+            bool: 検出できればTrue
+        """
+        matchTest = reDateGroupedPattern.search(line)
+        if matchTest == None:
+            return False
+        self._offset = matchTest.start('time')
+        self._template = matchTest.group('time').translate(_digitTable)
+        self._length = len(self._template)
+        self._spans = self._fields()
+        self._fraction = matchTest.group('microsecond') != None
+        return True
+
+    def _slice(self, line):
+        """ 書式に合えば時刻部分の文字列を、合わなければNoneを返す """
+        end = self._offset + self._length
+        t = line[self._offset:end]
+        if t.translate(_digitTable) != self._template:
+            return None
+        follow = line[end:end + 2]          # 正規表現ならさらに桁が続くような行は除く
+        if follow[:1].isdigit() or (self._fraction == False and follow[:1] == "." and follow[1:2].isdigit()):
+            return None
+        return t
+
+    def parse(self, line):
+        """ 文字列から時刻を抽出して、時刻オブジェクトを返す
+        Return:
+            datetime.datetime: 時刻オブジェクト
+            None:              文字列が不正
+        """
+        if self._template == None and self.detect(line) == False:
+            return None
+        t = self._slice(line)
+        if t == None:
+            return getTime(line)
+        values = [int(t[a:b]) for a, b in self._spans]
+        if self._fraction:
+            _microsecond = t[self._spans[6][0]:self._spans[6][1]]
+            values[6] = int(int(_microsecond) * 10**(6 - len(_microsecond)))
+        try:
+            return datetime.datetime(*values)
+        except ValueError:
+            return None
+
+    def _fields(self):
+        """ ひな形から年・月・日・時・分・秒（・秒の小数部）の桁の位置を返す """
+        fields = []
+        start = None
+        for k, c in enumerate(self._template + " "):
+            if c == "d" and start == None:
+                start = k
+            elif c != "d" and start != None:
+                fields.append((start, k))
+                start = None
+        return fields
+
+    def parseLines(self, lines):
+        """ 各行から時刻を抽出して、datetime64[us]の配列で返す
+        時刻が得られなかった行はNaTとなります。
+        時刻部分を文字コードの2次元配列にして、各桁をまとめて数値に変換します。
+        Args:
+            lines: <list<str>> 文字列のリスト
+        """
+        n = len(lines)
+        ans = np.full(n, np.datetime64("NaT"), dtype="datetime64[us]")
+        if self._template == None:
+            for line in lines:
+                if self.detect(line):
+                    break
+            else:
+                return ans
+        if n == 0:
+            return ans
+        width = self._length + 2                                    # 後続の2文字も桁が続いていないかの確認に使う
+        start = self._offset
+        chars = np.array([line[start:start + width] for line in lines], dtype="U%d" % width)
+        codes = chars.view(np.uint32).reshape(n, width).astype(np.int64)
+        isDigit = (codes >= 48) & (codes <= 57)
+        pattern = np.array([ord(c) for c in self._template], dtype=np.int64)
+        body = codes[:, :self._length]
+        mask = np.where(pattern == ord("d"), isDigit[:, :self._length], body == pattern).all(axis=1)
+        mask &= ~isDigit[:, self._length]
+        if self._fraction == False:
+            mask &= ~((codes[:, self._length] == ord(".")) & isDigit[:, self._length + 1])
+        digits = codes - 48
+        values = []
+        for a, b in self._spans:
+            v = np.zeros(n, dtype=np.int64)
+            for k in range(a, b):
+                v = v * 10 + digits[:, k]
+            values.append((v, b - a))
+        year, month, day, hour, minute, sec = [v for v, _ in values[:6]]
+        if self._fraction:
+            frac, length = values[6]
+            if length <= 6:
+                microsecond = frac * 10**(6 - length)
+            else:
+                microsecond = frac // 10**(length - 6)
+        else:
+            microsecond = np.zeros(n, dtype=np.int64)
+        mask &= (month >= 1) & (month <= 12) & (day >= 1) & (hour < 24) & (minute < 60) & (sec < 60) & (year >= 1)
+        months = ((year - 1970) * 12 + month - 1)[mask].astype("datetime64[M]")
+        days = months.astype("datetime64[D]") + (day[mask] - 1)
+        ok = days.astype("datetime64[M]") == months                 # 月末を超える日（2月30日など）は不正
+        us = (hour[mask] * 3600 + minute[mask] * 60 + sec[mask]) * 1000000 + microsecond[mask]
+        parsed = days.astype("datetime64[us]") + us.astype("timedelta64[us]")
+        parsed[~ok] = np.datetime64("NaT")
+        ans[mask] = parsed
+        for k in np.flatnonzero(~mask):                                            # 書式の異なる行は正規表現で処理する
+            try:
+                time = getTime(lines[k])
+            except ValueError:
+                time = None
+            if time != None:
+                ans[k] = time
+        return ans
+
+def getTimes(lines):
+    """ 各行から時刻を抽出して、datetime64[us]の配列で返す
+    getTime()を多数の行に対して高速に実行するための関数です。時刻が得られなかった行はNaTとなります。
+    """
+    return TimeParser().parseLines(lines)
+
 def getDatetimeFrom_yyyyMMdd(date = "19800106"):
     """ "yyyymmdd"形式の年月日(数値もしくは文字列)をPythonの時刻オブジェクトへ変換する.
 
@@ -286,6 +437,89 @@ def get_DayOfWeek_From_yyyyMMdd(date = "20100530"):
             _week = WEEK_ERROR              # もしものエラー回避
     return _week
 
+def _split_datetime64(t):
+    """ datetime64（の配列）を年・月・日・0時からの経過時間[s]に分解する
+    """
+    t = np.asarray(t, dtype="datetime64[ns]")
+    d = t.astype("datetime64[D]")
+    m = d.astype("datetime64[M]")
+    year = d.astype("datetime64[Y]").astype(np.int64) + 1970
+    month = m.astype(np.int64) % 12 + 1
+    day = (d - m).astype(np.int64) + 1
+    ssssss = (t - d) / np.timedelta64(1, "s")
+    return (year, month, day, ssssss)
+
+def get_JulianDate_From_Arrays(year, month, day, ssssss = 0.0):
+    """ 年・月・日の配列から、ユリウス日の配列を返す.
+
+    get_JulianDate_From_Arrayed_yyyyMMdd2()の配列版です。演算の順序も同じにしてあるので、結果は完全に一致します。
+    Argv:
+        year, month, day: <ndarray<int>> 年・月・日（ブロードキャスト可）
+        ssssss:           <ndarray<float>> 時間[s]
+    """
+    year = np.asarray(year, dtype=np.int64)
+    month = np.asarray(month, dtype=np.int64)
+    day = np.asarray(day, dtype=np.int64)
+    if np.any((month < 1) | (month > 12)):
+        raise ValueError("月の指定に誤りがあります。0以下であったり13以上になっていないか確認してください。")
+    early = month <= 2
+    y = np.where(early, year - 1, year)
+    m = np.where(early, month + 12, month)
+    gregorian = (year > 1582) | ((year == 1582) & ((month > 10) | ((month == 10) & (day >= 15))))  # 1582年10月15日以降
+    A = np.trunc(y / 100).astype(np.int64)              # int()と同じく0方向へ切り捨てる
+    B = np.where(gregorian, 2 - A + np.trunc(A / 4).astype(np.int64), 0)
+    _fractional_part = np.asarray(ssssss, dtype=np.float64) / TIME_A_DAY
+    jd = np.trunc(365.25 * y).astype(np.int64) + np.trunc(30.6001 * (m + 1)).astype(np.int64) + day
+    return (jd + _fractional_part + 1720994.5 + B)[()]
+
+def get_JulianDate_From_datetime64(t):
+    """ datetime64（の配列）からユリウス日を返す.
+    """
+    return get_JulianDate_From_Arrays(*_split_datetime64(t))
+
+def get_ModifiedJulianDate_From_JulianDates(jd):
+    """ ユリウス日の配列を修正ユリウス日の配列に変換する.
+    """
+    return (np.asarray(jd, dtype=np.float64) - 2400000.5)[()]
+
+def get_ModifiedJulianDate_From_datetime64(t):
+    """ datetime64（の配列）から修正ユリウス日を返す.
+    """
+    return get_ModifiedJulianDate_From_JulianDates(get_JulianDate_From_datetime64(t))
+
+def get_DayOfYear_From_Arrays(year, month, day):
+    """ 年・月・日の配列から、その年の元旦から数えて何日目なのかを配列で返す.
+
+    get_DayOfYear_From_DelimitedDate()の配列版です。
+    """
+    _julius_day = get_JulianDate_From_Arrays(year, month, day)
+    _julius_day_1m1d = get_JulianDate_From_Arrays(year, 1, 1)
+    return np.trunc(_julius_day - _julius_day_1m1d + 1).astype(np.int64)[()]
+
+def get_DayOfYear_From_datetime64(t):
+    """ datetime64（の配列）から年間通算日を返す.
+    """
+    year, month, day, ssssss = _split_datetime64(t)
+    return get_DayOfYear_From_Arrays(year, month, day)
+
+def get_DayOfWeek_From_yyyyMMdd_Array(date):
+    """ 日付yyyyMMdd(数値)の配列から曜日の配列を得る.
+
+    get_DayOfWeek_From_yyyyMMdd()の配列版です。計算できない日付にはWEEK_ERRORが入ります。
+    """
+    _date = np.asarray(date, dtype=np.int64)
+    year = _date // 10000
+    m = (_date % 10000) // 100
+    q = _date % 100
+    last_day = np.array([0] + [dictOfLastDayOfMonth[name] for name in listOfMonthName[1:]])
+    valid = (_date < 20991231) & (_date > 19010101) & (m >= 1) & (m <= 12)
+    valid &= (q >= 1) & (q <= last_day[np.clip(m, 0, 12)])
+    early = (m == 1) | (m == 2)
+    m = np.where(early, m + 12, m)                          # 1,2月は前の年の13,14月として扱う
+    year = np.where(early, year - 1, year)
+    _week = (year + year // 4 - year // 100 + year // 400 + (13 * m + 8) // 5 + q) % 7
+    return np.where(valid, _week, WEEK_ERROR)[()]
+
 def get_ssssss_From_hhmmss(time = "134059"):
     """ 時刻hhmmssから、0時からの経過時間ssssss[s]を計算する.
 
@@ -442,6 +676,8 @@ def main():
     print(" \"MM/dd/yyyy\"形式の日付を\"yyyy/MM/dd\"形式へ変換するテスト \"5/25/2012\": " + str(get_Delimited_yyyyMMdd_From_Delimited_MMddyyyy("5/25/2012")))
     print(" \"dd/MM/yyyy\"形式の日付を\"yyyy/MM/dd\"形式へ変換するテスト \"25/5/2012\": " + str(get_Delimited_yyyyMMdd_From_Delimited_ddMMyyyy("25/5/2012")))
     print("デリミタの無い日付と通算秒からMicrosoft Office Excel時刻を計算するテスト 19000101（1900年1月1日）: " + str(get_ExcelTime_From_yyyyMMdd_and_ssssss(19000101)) + ", 20000101（2000年1月1日）: " + str(get_ExcelTime_From_yyyyMMdd_and_ssssss(20000101)))
+    print("配列版のテスト 2000/1/1, 2014/3/1: JD " + str(get_JulianDate_From_Arrays([2000, 2014], [1, 3], [1, 1])) + ", MJD " + str(get_ModifiedJulianDate_From_datetime64(["2000-01-01", "2014-03-01"])) + ", 通算日 " + str(get_DayOfYear_From_Arrays([2000, 2014], [1, 3], [1, 1])) + ", 曜日 " + str(get_DayOfWeek_From_yyyyMMdd_Array([20000101, 20140301])))
+    print("時刻の一括抽出のテスト: " + str(getTimes(["2012/12/29 06:48:03,1.0", "2012/12/29 06:48:05,1.1", "2012/12/29 6:48:7.5,1.2", "no time"])))
     hoge = getTime("2012/12/29 6:48:3.5")
     hoge2 = getTime("2012/12/29 6:48:3")
     print(reDateGroupedPattern.pattern)